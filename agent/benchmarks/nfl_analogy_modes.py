@@ -0,0 +1,138 @@
+"""
+Compares the single-call and two-step NFL analogy modes.
+
+Runs every sample commentary through both modes (response caches disabled) and
+prints latency percentiles plus output parity checks: analogy sentence count,
+broadcast word count, and word overlap between the two modes' analogies.
+
+A single-mode call whose structured output is unusable falls back to two_step in
+the service. Those runs are counted and reported as fallbacks. They are left out
+of the single-mode timings, parity counts and overlap, so that "single" only
+measures calls that were actually answered in one round trip.
+
+Usage (from agent/):
+    python -m benchmarks.nfl_analogy_modes [--runs 3] [--file commentary.txt]
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from services.nfl_analogy_service import NFLAnalogyService
+
+
+SAMPLES = [
+    "Real Madrid press high, forcing the keeper to go long.",
+    "Quick counter-attack down the left, the winger beats his man and crosses into the box.",
+    "A stunning save from the goalkeeper, tipping the shot over the bar.",
+    "Barcelona keep possession in midfield, probing for a gap in a compact back four.",
+    "The striker times his run perfectly and slots it into the bottom corner. Goal!",
+    "Long ball over the top, the center back is caught flat-footed.",
+]
+
+
+def _sentences(text: str) -> int:
+    return len([s for s in re.split(r"[.!?]+", text) if s.strip()])
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"[a-z']+", text.lower()))
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1) + 0.5))]
+
+
+async def run(samples, runs: int) -> None:
+    service = NFLAnalogyService()
+    if not service.model:
+        print("GEMINI_API_KEY not set - nothing to benchmark")
+        return
+
+    latencies = {mode: [] for mode in NFLAnalogyService.MODES}
+    # One (single, two_step) pair per sample run; single is None when it fell back
+    pairs = []
+    fallbacks = []
+    errors = 0
+
+    for _ in range(runs):
+        for commentary in samples:
+            # Call the single path directly: generate_nfl_analogy() would hide a
+            # fallback's two_step round trips inside the "single" timing
+            started = time.perf_counter()
+            try:
+                single = await service._generate_single(commentary)
+            except Exception as e:
+                print(f"single call failed: {e}")
+                errors += 1
+                single = None
+            else:
+                if single is None:
+                    fallbacks.append(time.perf_counter() - started)
+                else:
+                    latencies["single"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            two_step = await service.generate_nfl_analogy(commentary, mode="two_step", use_cache=False)
+            latencies["two_step"].append(time.perf_counter() - started)
+            pairs.append((single, two_step))
+
+    outputs = {
+        "single": [single for single, _ in pairs if single is not None],
+        "two_step": [two_step for _, two_step in pairs],
+    }
+
+    print(f"{'mode':<10} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8}  analogy 2-4 sent.  commentary 15-35 words")
+    for mode in NFLAnalogyService.MODES:
+        values = latencies[mode]
+        if not values:
+            print(f"{mode:<10} {'-':>8} {'-':>8} {'-':>8}  no successful calls")
+            continue
+        analogy_ok = sum(1 for a, _ in outputs[mode] if 2 <= _sentences(a) <= 4)
+        commentary_ok = sum(1 for _, c in outputs[mode] if 15 <= len(c.split()) <= 35)
+        total = len(outputs[mode])
+        print(
+            f"{mode:<10} {_percentile(values, 0.5) * 1000:>8.0f} {_percentile(values, 0.95) * 1000:>8.0f} "
+            f"{statistics.mean(values) * 1000:>8.0f}  {analogy_ok:>7}/{total:<10} {commentary_ok:>7}/{total}"
+        )
+
+    total = len(pairs)
+    wasted = f", {statistics.mean(fallbacks) * 1000:.0f} ms mean before falling back" if fallbacks else ""
+    print(f"\nsingle fallbacks to two_step: {len(fallbacks)}/{total}{wasted}; errors: {errors}/{total}")
+
+    overlaps = []
+    for single, two_step in pairs:
+        if single is None:
+            continue
+        a, b = _words(single[0]), _words(two_step[0])
+        overlaps.append(len(a & b) / len(a | b) if a | b else 1.0)
+    if overlaps:
+        print(f"Analogy word overlap single vs two_step: mean {statistics.mean(overlaps):.2f}, min {min(overlaps):.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="Passes over the sample set")
+    parser.add_argument("--file", help="Text file with one soccer commentary per line")
+    args = parser.parse_args()
+
+    load_dotenv()
+    # Measure real round trips, not cache hits
+    os.environ.setdefault("LLM_CACHE_TTL_NFL_ANALOGY", "0")
+    os.environ.setdefault("LLM_CACHE_TTL_NFL_BROADCAST", "0")
+
+    samples = SAMPLES
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            samples = [line.strip() for line in f if line.strip()]
+
+    asyncio.run(run(samples, args.runs))
+
+
+if __name__ == "__main__":
+    main()
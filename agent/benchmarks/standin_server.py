@@ -0,0 +1,283 @@
+"""
+Local stand-in for the Gemini and ElevenLabs APIs the agent calls.
+
+Serves the Gemini REST endpoints used by google-genai (generateContent,
+streamGenerateContent, cachedContents) and ElevenLabs text-to-speech with
+deterministic canned or schema-templated outputs. Latency is drawn from a
+log-normal distribution; errors and 429 bursts are injected per profile. Point
+the agent at it through the existing keys:
+
+    GEMINI_API_KEY=standin ELEVENLABS_API_KEY=standin python main.py
+    (or standin:http://host:port when not on the default 127.0.0.1:8765)
+
+Usage (from agent/):
+    python -m benchmarks.standin_server [--profile realistic] [--port 8765]
+        [--latency-ms 700] [--sigma 0.6] [--error-rate 0.02]
+        [--burst-every 60] [--burst-seconds 5] [--missing-models m1,m2] [--seed 7]
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+
+# median latency (ms), log-normal sigma, error rate, 429 burst period and length (s)
+PROFILES = {
+    "fast": {"latency_ms": 60, "sigma": 0.3, "error_rate": 0.0, "burst_every": 0, "burst_seconds": 0},
+    "realistic": {"latency_ms": 700, "sigma": 0.6, "error_rate": 0.01, "burst_every": 0, "burst_seconds": 0},
+    "slow": {"latency_ms": 2500, "sigma": 0.8, "error_rate": 0.02, "burst_every": 0, "burst_seconds": 0},
+    "flaky": {"latency_ms": 900, "sigma": 0.9, "error_rate": 0.08, "burst_every": 60, "burst_seconds": 8},
+}
+
+TEXT_REPLIES = [
+    "The midfield is pressing high, forcing hurried passes and winning the ball back in the opponent's half.",
+    "A quick switch of play finds the full-back in space, and the cross is cleared at the near post.",
+    "The defence holds a compact line, stepping up together to catch the striker offside.",
+    "Patient build-up through the centre draws the press before a through ball splits the back four.",
+]
+VISION_REPLIES = [
+    "The ball is on the right wing as the winger drives at the full-back and whips in a low cross.",
+    "Central midfielders press the ball carrier near the halfway line, forcing a pass back to defence.",
+    "A shot from the edge of the box is parried by the goalkeeper, and defenders clear the rebound.",
+    "The attacking team recycles possession across the back line, probing for a gap in a compact block.",
+]
+TRANSCRIPT_REPLIES = [
+    "And he's through on goal, he shoots, and it's saved by the keeper!",
+    "They keep it patiently at the back, looking for a way through the press.",
+    "Free kick in a dangerous area here, the wall is lining up on the edge of the box.",
+]
+
+# One MPEG-1 Layer III frame header (128 kbps, 44.1 kHz) padded to its 417-byte length
+MP3_FRAME = bytes([0xFF, 0xFB, 0x90, 0x64]) + bytes(413)
+
+
+class StandIn:
+    """Shared state: the failure profile, a seeded RNG and request counters."""
+
+    def __init__(self, profile: Dict[str, Any], missing_models: List[str], seed: int):
+        self.profile = profile
+        self.missing_models = set(missing_models)
+        self.rng = random.Random(seed)
+        self.started = time.monotonic()
+        self.requests = Counter()
+        self.errors = Counter()
+
+    def latency(self, scale: float = 1.0) -> float:
+        median = self.profile["latency_ms"] / 1000.0 * scale
+        return median * math.exp(self.rng.gauss(0.0, self.profile["sigma"]))
+
+    def failure(self, model: Optional[str] = None) -> Optional[tuple]:
+        """(status, reason) to fail this request with, or None."""
+        if model and model in self.missing_models:
+            return 404, "NOT_FOUND"
+        every, length = self.profile["burst_every"], self.profile["burst_seconds"]
+        if every and (time.monotonic() - self.started) % every < length:
+            return 429, "RESOURCE_EXHAUSTED"
+        if self.rng.random() < self.profile["error_rate"]:
+            return self.rng.choice([(500, "INTERNAL"), (503, "UNAVAILABLE")])
+        return None
+
+
+def _error(status: int, reason: str) -> JSONResponse:
+    return JSONResponse(status_code=status, content={"error": {"code": status, "message": f"stand-in {reason.lower()}", "status": reason}})
+
+
+def _pick(options: List[str], seed: str) -> str:
+    return options[int(hashlib.sha256(seed.encode()).hexdigest(), 16) % len(options)]
+
+
+def _parts(body: Dict[str, Any]) -> List[Dict[str, Any]]:
+    parts = []
+    for content in body.get("contents") or []:
+        parts.extend(content.get("parts") or [])
+    return parts
+
+
+def _prompt_tokens(parts: List[Dict[str, Any]]) -> int:
+    tokens = 0
+    for part in parts:
+        if "text" in part:
+            tokens += len(part["text"]) // 4 + 1
+            continue
+        inline = part.get("inlineData") or part.get("inline_data") or {}
+        mime_type = inline.get("mimeType") or inline.get("mime_type") or ""
+        if mime_type.startswith("audio/"):
+            # Gemini bills audio at 32 tokens per second; assume 16 kHz 16-bit mono WAV
+            tokens += 32 * max(1, len(base64.b64decode(inline.get("data", ""))) // 32000)
+        else:
+            tokens += 258
+    return tokens
+
+
+def _from_schema(schema: Dict[str, Any], prompt: str, seed: str, name: str = "", label: str = "") -> Any:
+    kind = str(schema.get("type", "STRING")).upper()
+    if kind == "OBJECT":
+        return {
+            key: _from_schema(sub, prompt, f"{seed}:{key}", key, label)
+            for key, sub in (schema.get("properties") or {}).items()
+        }
+    if kind == "ARRAY":
+        items = schema.get("items") or {}
+        # Batched vision calls label clips "C1", "C2"...; answer one entry per clip
+        labels = list(dict.fromkeys(re.findall(r"Clip (C\d+):", prompt))) or [""]
+        return [_from_schema(items, prompt, f"{seed}:{i}", name, clip) for i, clip in enumerate(labels)]
+    if kind in ("INTEGER", "NUMBER"):
+        return 1
+    if kind == "BOOLEAN":
+        return True
+    if schema.get("enum"):
+        return schema["enum"][0]
+    if label and name == "clip":
+        return label
+    return _pick(VISION_REPLIES if "frame" in prompt.lower() else TEXT_REPLIES, seed)
+
+
+def _reply(body: Dict[str, Any]) -> str:
+    parts = _parts(body)
+    prompt = "\n".join(part.get("text", "") for part in parts)
+    seed = hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
+    config = body.get("generationConfig") or {}
+
+    schema = config.get("responseSchema") or config.get("response_schema")
+    if schema:
+        return json.dumps(_from_schema(schema, prompt, seed))
+    if (config.get("responseMimeType") or "") == "application/json":
+        return json.dumps({"text": _pick(TEXT_REPLIES, seed)})
+
+    mime_types = [((p.get("inlineData") or p.get("inline_data") or {}).get("mimeType") or "") for p in parts]
+    if any(m.startswith("audio/") for m in mime_types):
+        return _pick(TRANSCRIPT_REPLIES, seed)
+    if any(mime_types):
+        return _pick(VISION_REPLIES, seed)
+    if prompt.strip() == "ping":
+        return "pong"
+    return _pick(TEXT_REPLIES, seed)
+
+
+def _response(text: str, prompt_tokens: int, final: bool = True) -> Dict[str, Any]:
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if final:
+        candidate["finishReason"] = "STOP"
+    output_tokens = len(text) // 4 + 1
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        },
+    }
+
+
+def create_app(standin: StandIn) -> FastAPI:
+    app = FastAPI(title="Gemini/ElevenLabs stand-in")
+    caches: Dict[str, Dict[str, Any]] = {}
+
+    @app.post("/{version}/models/{model_action}")
+    async def generate(version: str, model_action: str, request: Request):
+        model, _, action = model_action.partition(":")
+        standin.requests[f"gemini:{action}"] += 1
+        body = await request.json()
+        parts = _parts(body)
+        prompt_tokens = _prompt_tokens(parts)
+        if body.get("cachedContent") in caches:
+            prompt_tokens += caches[body["cachedContent"]]["usageMetadata"]["totalTokenCount"]
+
+        # Larger requests take longer, roughly like the real API
+        await asyncio.sleep(standin.latency(1.0 + prompt_tokens / 20000.0))
+        failure = standin.failure(model)
+        if failure:
+            standin.errors[f"gemini:{failure[0]}"] += 1
+            return _error(*failure)
+
+        text = _reply(body)
+        if action != "streamGenerateContent":
+            return _response(text, prompt_tokens)
+
+        words = text.split(" ")
+        step = max(1, len(words) // 3)
+        chunks = [" ".join(words[i:i + step]) + (" " if i + step < len(words) else "") for i in range(0, len(words), step)]
+
+        async def events():
+            for i, chunk in enumerate(chunks):
+                if i:
+                    await asyncio.sleep(standin.latency(0.1))
+                yield f"data: {json.dumps(_response(chunk, prompt_tokens, final=i == len(chunks) - 1))}\r\n\r\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/{version}/cachedContents")
+    async def create_cache(version: str, request: Request):
+        standin.requests["gemini:cachedContents.create"] += 1
+        body = await request.json()
+        tokens = _prompt_tokens(_parts(body)) + len(json.dumps(body.get("systemInstruction") or "")) // 4
+        name = f"cachedContents/{hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()[:16]}"
+        caches[name] = {"name": name, "model": body.get("model"), "usageMetadata": {"totalTokenCount": tokens}}
+        await asyncio.sleep(standin.latency())
+        return caches[name]
+
+    @app.delete("/{version}/cachedContents/{cache_id}")
+    async def delete_cache(version: str, cache_id: str):
+        standin.requests["gemini:cachedContents.delete"] += 1
+        caches.pop(f"cachedContents/{cache_id}", None)
+        return {}
+
+    @app.post("/v1/text-to-speech/{voice_id}")
+    async def text_to_speech(voice_id: str, request: Request):
+        standin.requests["elevenlabs:tts"] += 1
+        body = await request.json()
+        text = body.get("text", "")
+        # Synthesis time grows with the text; the audio is one 26 ms silent frame per character
+        await asyncio.sleep(standin.latency(0.5 + len(text) / 400.0))
+        failure = standin.failure()
+        if failure:
+            standin.errors[f"elevenlabs:{failure[0]}"] += 1
+            return JSONResponse(status_code=failure[0], content={"detail": {"status": failure[1], "message": "stand-in error"}})
+        return Response(content=MP3_FRAME * max(8, len(text)), media_type="audio/mpeg")
+
+    @app.get("/stats")
+    async def stats():
+        return {"profile": standin.profile, "requests": dict(standin.requests), "errors": dict(standin.errors)}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="realistic")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, help="Median latency in ms (overrides the profile)")
+    parser.add_argument("--sigma", type=float, help="Log-normal sigma of the latency; 0 for a fixed latency")
+    parser.add_argument("--error-rate", type=float, help="Share of requests failing with 500/503")
+    parser.add_argument("--burst-every", type=float, help="Seconds between 429 bursts (0 disables)")
+    parser.add_argument("--burst-seconds", type=float, help="Length of each 429 burst")
+    parser.add_argument("--missing-models", default="", help="Comma-separated models answered with 404")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for latency and error draws")
+    args = parser.parse_args()
+
+    profile = dict(PROFILES[args.profile])
+    for key in ("latency_ms", "sigma", "error_rate", "burst_every", "burst_seconds"):
+        value = getattr(args, key)
+        if value is not None:
+            profile[key] = value
+
+    import uvicorn
+
+    missing = [m.strip() for m in args.missing_models.split(",") if m.strip()]
+    print(f"Stand-in on http://{args.host}:{args.port} with {profile}")
+    uvicorn.run(create_app(StandIn(profile, missing, args.seed)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
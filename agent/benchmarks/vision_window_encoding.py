@@ -0,0 +1,187 @@
+"""
+Compares the multi-part and mosaic encodings of frame windows for vision calls.
+
+Sends every frame window through both VISION_WINDOW_ENCODING modes (window
+cache, batching and response cache bypassed) and prints request bytes, input
+tokens and latency percentiles per mode, plus commentary length and word overlap
+between the modes. With --judge, Gemini also sees the original frames and picks
+the more accurate commentary of each pair (order randomized).
+
+Usage (from agent/):
+    python -m benchmarks.vision_window_encoding --frames DIR [--runs 2] [--judge]
+    python -m benchmarks.vision_window_encoding --video VIDEO_ID --times 30,75,120
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import re
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from services.gemini_vision import GeminiVisionAnalyzer, WINDOW_INSTRUCTIONS
+from services.usage_tracker import get_usage_tracker
+
+
+JUDGE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "winner": {"type": "STRING", "enum": ["A", "B", "tie"]},
+        "reason": {"type": "STRING"},
+    },
+    "required": ["winner"],
+}
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"[a-z']+", text.lower()))
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1) + 0.5))]
+
+
+def _load_frame_dir(path: str, window: int = 4, interval: float = 1.5):
+    """Image files sorted by name, grouped into windows of `window` frames."""
+    names = sorted(n for n in os.listdir(path) if n.lower().endswith((".jpg", ".jpeg", ".png")))
+    frames = []
+    for name in names:
+        with open(os.path.join(path, name), "rb") as f:
+            frames.append(base64.b64encode(f.read()).decode("utf-8"))
+    windows = []
+    for start in range(0, len(frames) - window + 1, window):
+        chunk = frames[start:start + window]
+        windows.append([(start * interval + i * interval, b64) for i, b64 in enumerate(chunk)])
+    return windows
+
+
+async def _load_video(video_id: str, times):
+    from services.frame_window_service import FrameWindowService
+
+    service = FrameWindowService()
+    windows = []
+    for t in times:
+        frames, timestamps = await service.get_frame_window(video_id, t)
+        if frames:
+            windows.append(list(zip(timestamps, frames))[:4])
+        else:
+            print(f"No frames extracted at {t}s - skipped")
+    return windows
+
+
+async def _judge(analyzer: GeminiVisionAnalyzer, pair, first: str, second: str) -> str:
+    """Returns which commentary ("first", "second" or "tie") the judge prefers."""
+    swap = random.random() < 0.5
+    a, b = (second, first) if swap else (first, second)
+    _, _, parts = analyzer.build_window_request(pair, encoding="parts")
+    prompt = (
+        "These are consecutive frames from a soccer broadcast. Two commentaries describe them.\n"
+        f"Both were asked to: {WINDOW_INSTRUCTIONS}\n\n"
+        f"A: {a}\nB: {b}\n\n"
+        "Which one describes the frames more accurately (ball location, main action, no invented details)?"
+    )
+    text = await analyzer.gateway.generate(
+        [prompt, *parts],
+        call_site="bench_judge",
+        cache=False,
+        response_mime_type="application/json",
+        response_schema=JUDGE_SCHEMA,
+    )
+    winner = json.loads(text).get("winner", "tie")
+    if winner == "tie":
+        return "tie"
+    return "second" if (winner == "A") == swap else "first"
+
+
+async def run(windows, runs: int, judge: bool) -> None:
+    analyzer = GeminiVisionAnalyzer()
+    if not analyzer.gateway.is_available():
+        print("GEMINI_API_KEY not set - nothing to benchmark")
+        return
+    if not windows:
+        print("No frame windows to benchmark")
+        return
+
+    modes = GeminiVisionAnalyzer.ENCODINGS
+    latencies = {mode: [] for mode in modes}
+    request_bytes = {mode: [] for mode in modes}
+    outputs = {mode: [] for mode in modes}
+    failures = {mode: 0 for mode in modes}
+
+    for _ in range(runs):
+        for pairs in windows:
+            for mode in modes:
+                prompt, _, parts = analyzer.build_window_request(pairs, encoding=mode)
+                request_bytes[mode].append(len(prompt.encode()) + sum(len(p.inline_data.data) for p in parts))
+                started = time.perf_counter()
+                try:
+                    text = await analyzer.gateway.generate([prompt, *parts], call_site=f"bench_{mode}", cache=False)
+                except Exception as e:
+                    print(f"{mode}: call failed: {e}")
+                    failures[mode] += 1
+                    text = None
+                latencies[mode].append(time.perf_counter() - started)
+                outputs[mode].append(text)
+
+    usage = get_usage_tracker().stats()["by_call_site"]
+    print(f"{'mode':<8} {'p50 ms':>8} {'p95 ms':>8} {'mean KB':>8} {'in tok':>8} {'words':>6} {'failed':>7}")
+    for mode in modes:
+        answered = [t for t in outputs[mode] if t]
+        calls = usage.get(f"vision/bench_{mode}", {})
+        upstream = max(1, calls.get("calls", 0) - calls.get("errors", 0))
+        print(
+            f"{mode:<8} {_percentile(latencies[mode], 0.5) * 1000:>8.0f} {_percentile(latencies[mode], 0.95) * 1000:>8.0f} "
+            f"{statistics.mean(request_bytes[mode]) / 1024:>8.1f} {calls.get('input_tokens', 0) / upstream:>8.0f} "
+            f"{statistics.mean(len(t.split()) for t in answered) if answered else 0:>6.1f} {failures[mode]:>7}"
+        )
+
+    pairs_out = [(p, m) for p, m in zip(outputs["parts"], outputs["mosaic"]) if p and m]
+    if pairs_out:
+        overlaps = []
+        for p, m in pairs_out:
+            a, b = _words(p), _words(m)
+            overlaps.append(len(a & b) / len(a | b) if a | b else 1.0)
+        print(f"\nCommentary word overlap parts vs mosaic: mean {statistics.mean(overlaps):.2f}, min {min(overlaps):.2f}")
+
+    if judge and pairs_out:
+        tally = {"first": 0, "second": 0, "tie": 0}
+        window_pairs = [w for _ in range(runs) for w in windows]
+        for pairs, parts_text, mosaic_text in zip(window_pairs, outputs["parts"], outputs["mosaic"]):
+            if not parts_text or not mosaic_text:
+                continue
+            try:
+                tally[await _judge(analyzer, pairs, parts_text, mosaic_text)] += 1
+            except Exception as e:
+                print(f"judge failed: {e}")
+        print(f"Judge preference: parts {tally['first']}, mosaic {tally['second']}, tie {tally['tie']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--frames", help="Directory of frame images, grouped by name order into windows of 4")
+    source.add_argument("--video", help="YouTube video id to extract frame windows from")
+    parser.add_argument("--times", default="30,60,90", help="Comma-separated window end times in seconds (with --video)")
+    parser.add_argument("--runs", type=int, default=1, help="Passes over the windows")
+    parser.add_argument("--judge", action="store_true", help="Ask Gemini which commentary matches the frames better")
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    async def benchmark():
+        if args.frames:
+            windows = _load_frame_dir(args.frames)
+        else:
+            windows = await _load_video(args.video, [float(t) for t in args.times.split(",") if t.strip()])
+        await run(windows, args.runs, args.judge)
+
+    asyncio.run(benchmark())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import Response, JSONResponse, StreamingResponse
 from pydantic import BaseModel
 import os
+import json
 import asyncio
 import logging
+import random
+import time
 from dotenv import load_dotenv
 from pathlib import Path
 from models.schemas import (
@@ -18,10 +21,17 @@ from services.cache_manager import CacheManager
 from services.vision_analyzer import VisionAnalyzer
 from services.youtube_extractor import YouTubeFrameExtractor
 from services.chat_service import ChatService
+from services.chat_context import ChatContextStore
+from services.analysis_upgrades import AnalysisUpgrades
 from services.video_metadata import VideoMetadataExtractor
 from services.commentary_orchestrator import CommentaryOrchestrator
 from services.nfl_analogy_service import NFLAnalogyService
 from services.tts_service import TTSService
+from services.model_warmup import ModelWarmup
+from services.llm_gateway import get_llm_gateway
+from services.circuit_breaker import circuit_stats
+from services.usage_tracker import get_usage_tracker, tag_call
+from starlette.routing import Match
 
 logging.basicConfig(
     level=logging.INFO,
@@ -74,6 +84,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def tag_upstream_usage(request, call_next):
+    # Upstream AI calls made while serving this request are accounted to its route
+    for route in app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            tag_call(endpoint=route.path)
+            break
+    return await call_next(request)
+
+
 ai_provider = (os.getenv("AI_PROVIDER", "stub")).lower()
 api_key = os.getenv("GEMINI_API_KEY")
 
@@ -84,144 +105,226 @@ frame_extractor = YouTubeFrameExtractor()
 cache = CacheManager()
 chat_service = ChatService()
 metadata_extractor = VideoMetadataExtractor()
-commentary_orchestrator = CommentaryOrchestrator()
+commentary_orchestrator = CommentaryOrchestrator(ball_tracker=vision_analyzer)
 nfl_analogy_service = NFLAnalogyService(api_key=api_key)
 tts_service = TTSService()
+model_warmup = ModelWarmup(vision_analyzer)
+chat_context_store = ChatContextStore(metadata_extractor, caption_extractor)
+analysis_upgrades = AnalysisUpgrades()
 
 
-@app.post("/api/analyze", response_model=AnalyzeResponse)
-async def analyze_video(request: AnalyzeRequest):
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.on_event("startup")
+async def start_warmup():
+    # Runs in the background so /health answers immediately; /ready waits for it
+    asyncio.create_task(model_warmup.run())
+
+
+ANALYSIS_STUBS = [
+    "Players are moving into position, creating space for a potential attack.",
+    "The team is building up play from the back, looking for passing options.",
+    "A counter-attack is developing with players sprinting forward.",
+    "Defensive shape is compact, denying space in the central areas.",
+    "The ball is in the final third, with attackers looking for an opening."
+]
+
+
+def _cached_analysis(video_id: str, timestamp: float):
+    base_timestamp = int(timestamp)
+    for offset in (0, -1, 1, -2, 2):
+        cache_key = f"{video_id}:{base_timestamp + offset}"
+        cached = cache.get(cache_key)
+        if cached:
+            print(f"Cache hit for {cache_key}")
+            cached_dict = {k: v for k, v in cached.items() if k != 'cached'}
+            cached_dict['timestamp'] = timestamp
+            cached_dict['cached'] = True
+            return cached_dict
+    return None
+
+
+async def _full_analysis(video_id: str, timestamp: float) -> dict:
+    """Frame extraction, vision, caption fallback and analogy; the result is cached for nearby requests."""
+    print(f"Analyzing {video_id} at {timestamp}s")
+    
+    print(f"[STEP 1] Extracting frame from video at {timestamp}s...")
+    frame_base64 = None
+    frame_extraction_error = None
     try:
-        base_timestamp = int(request.timestamp)
-        cache_keys = [
-            f"{request.videoId}:{base_timestamp}",
-            f"{request.videoId}:{base_timestamp - 1}",
-            f"{request.videoId}:{base_timestamp + 1}",
-            f"{request.videoId}:{base_timestamp - 2}",
-            f"{request.videoId}:{base_timestamp + 2}",
-        ]
-        
-        for cache_key in cache_keys:
-            cached = cache.get(cache_key)
-            if cached:
-                print(f"Cache hit for {cache_key}")
-                cached['timestamp'] = request.timestamp
-                cached_dict = {k: v for k, v in cached.items() if k != 'cached'}
-                cached_dict['cached'] = True
-                return AnalyzeResponse(**cached_dict)
-        
-        print(f"Analyzing {request.videoId} at {request.timestamp}s")
-        
-        print(f"[STEP 1] Extracting frame from video at {request.timestamp}s...")
-        frame_base64 = None
-        frame_extraction_error = None
-        try:
-            frame_base64 = await asyncio.wait_for(
-                frame_extractor.extract_frame(request.videoId, request.timestamp),
-                timeout=10.0
-            )
-            if frame_base64:
-                print(f"[STEP 1] ✓ Frame extracted successfully (size: {len(frame_base64)} chars)")
-            else:
-                print("[STEP 1] ✗ Frame extraction returned None")
-        except asyncio.TimeoutError:
-            frame_extraction_error = "Timeout after 5 seconds"
-            print(f"[STEP 1] ✗ Frame extraction timed out: {frame_extraction_error}")
-        except Exception as e:
-            frame_extraction_error = str(e)
-            print(f"[STEP 1] ✗ Frame extraction error: {frame_extraction_error}")
-            import traceback
-            traceback.print_exc()
-        
-        commentary = None
-        vision_analysis_error = None
+        frame_base64 = await asyncio.wait_for(
+            frame_extractor.extract_frame(video_id, timestamp),
+            timeout=10.0
+        )
         if frame_base64:
-            if not vision_analyzer.model:
-                print("[STEP 2] ✗ Vision analyzer not initialized (no API key)")
-                vision_analysis_error = "Vision analyzer not initialized - GEMINI_API_KEY not set"
-            else:
-                print("[STEP 2] Analyzing frame with vision AI...")
-                try:
-                    commentary = await asyncio.wait_for(
-                        vision_analyzer.analyze_frame(frame_base64),
-                        timeout=15.0
-                    )
-                    if commentary:
-                        print(f"[STEP 2] ✓ Generated commentary from vision: {commentary[:50]}...")
-                    else:
-                        print("[STEP 2] ✗ Vision analysis returned empty commentary")
-                except asyncio.TimeoutError:
-                    vision_analysis_error = "Timeout after 5 seconds"
-                    print(f"[STEP 2] ✗ Vision analysis timed out: {vision_analysis_error}")
-                except Exception as e:
-                    vision_analysis_error = str(e)
-                    print(f"[STEP 2] ✗ Vision analysis error: {vision_analysis_error}")
-                    import traceback
-                    traceback.print_exc()
+            print(f"[STEP 1] ✓ Frame extracted successfully (size: {len(frame_base64)} chars)")
         else:
-            print("[STEP 2] ⏭ Skipping vision analysis - no frame available")
-            vision_analysis_error = frame_extraction_error or "Frame extraction failed"
-        
-        if not commentary:
-            print(f"[STEP 3] Vision analysis failed ({vision_analysis_error}), trying caption extraction...")
+            print("[STEP 1] ✗ Frame extraction returned None")
+    except asyncio.TimeoutError:
+        frame_extraction_error = "Timeout after 5 seconds"
+        print(f"[STEP 1] ✗ Frame extraction timed out: {frame_extraction_error}")
+    except Exception as e:
+        frame_extraction_error = str(e)
+        print(f"[STEP 1] ✗ Frame extraction error: {frame_extraction_error}")
+        import traceback
+        traceback.print_exc()
+    
+    commentary = None
+    vision_analysis_error = None
+    field_diagram = None
+    if frame_base64:
+        if not vision_analyzer.model:
+            print("[STEP 2] ✗ Vision analyzer not initialized (no API key)")
+            vision_analysis_error = "Vision analyzer not initialized - GEMINI_API_KEY not set"
+            # No vision call to share detections with; the diagram needs its own YOLO pass
             try:
-                commentary = await asyncio.wait_for(
-                    caption_extractor.get_caption_at_timestamp(
-                        request.videoId,
-                        request.timestamp
+                field_diagram = await asyncio.wait_for(
+                    vision_analyzer.extract_positions(frame_base64, video_id),
+                    timeout=5.0
+                )
+            except asyncio.TimeoutError:
+                print("[STEP 2] ✗ Position extraction timed out")
+        else:
+            print("[STEP 2] Analyzing frame with vision AI...")
+            try:
+                # The field diagram is built from the detections of the same pass
+                vision_result = await asyncio.wait_for(
+                    vision_analyzer.analyze_frame_detailed(
+                        frame_base64,
+                        deadline=time.monotonic() + 15.0,
+                        video_id=video_id,
+                        with_positions=True
                     ),
-                    timeout=10.0
+                    timeout=15.0
                 )
+                commentary = vision_result['commentary']
+                field_diagram = vision_result.get('positions')
                 if commentary:
-                    print(f"[STEP 3] ✓ Found caption: {commentary[:50]}...")
+                    print(f"[STEP 2] ✓ Generated commentary from vision: {commentary[:50]}...")
                 else:
-                    print("[STEP 3] ✗ No captions available")
+                    print("[STEP 2] ✗ Vision analysis returned empty commentary")
             except asyncio.TimeoutError:
-                print("[STEP 3] ✗ Caption extraction timed out")
+                vision_analysis_error = "Timeout after 5 seconds"
+                print(f"[STEP 2] ✗ Vision analysis timed out: {vision_analysis_error}")
             except Exception as e:
-                print(f"[STEP 3] ✗ Caption extraction error: {e}")
+                vision_analysis_error = str(e)
+                print(f"[STEP 2] ✗ Vision analysis error: {vision_analysis_error}")
                 import traceback
                 traceback.print_exc()
-        
-        if not commentary:
-            print("[STEP 4] Using stub commentary as final fallback")
-            import random
-            stubs = [
-                "Players are moving into position, creating space for a potential attack.",
-                "The team is building up play from the back, looking for passing options.",
-                "A counter-attack is developing with players sprinting forward.",
-                "Defensive shape is compact, denying space in the central areas.",
-                "The ball is in the final third, with attackers looking for an opening."
-            ]
-            commentary = random.choice(stubs)
-            print(f"[STEP 4] ✓ Using stub commentary: {commentary}")
-        
-        print("[STEP 5] Generating NFL analogy...")
-        if not api_key:
-            print("[STEP 5] Using stub analogy (no API key)")
+    else:
+        print("[STEP 2] ⏭ Skipping vision analysis - no frame available")
+        vision_analysis_error = frame_extraction_error or "Frame extraction failed"
+    
+    if not commentary:
+        print(f"[STEP 3] Vision analysis failed ({vision_analysis_error}), trying caption extraction...")
+        try:
+            commentary = await asyncio.wait_for(
+                caption_extractor.get_caption_at_timestamp(
+                    video_id,
+                    timestamp
+                ),
+                timeout=10.0
+            )
+            if commentary:
+                print(f"[STEP 3] ✓ Found caption: {commentary[:50]}...")
+            else:
+                print("[STEP 3] ✗ No captions available")
+        except asyncio.TimeoutError:
+            print("[STEP 3] ✗ Caption extraction timed out")
+        except Exception as e:
+            print(f"[STEP 3] ✗ Caption extraction error: {e}")
+            import traceback
+            traceback.print_exc()
+    
+    if not commentary:
+        print("[STEP 4] Using stub commentary as final fallback")
+        commentary = random.choice(ANALYSIS_STUBS)
+        print(f"[STEP 4] ✓ Using stub commentary: {commentary}")
+    
+    if field_diagram:
+        print(f"[STEP 4] ✓ Field diagram: {len(field_diagram['attackers'])} attackers, {len(field_diagram['defenders'])} defenders")
+    
+    print("[STEP 5] Generating NFL analogy...")
+    if not api_key:
+        print("[STEP 5] Using stub analogy (no API key)")
+        analogy = analogy_generator._generate_stub_analogy(commentary)
+    else:
+        print("[STEP 5] Using AI to generate analogy...")
+        try:
+            analogy = await analogy_generator.generate(commentary)
+            print(f"[STEP 5] ✓ Generated analogy: {analogy[:50]}...")
+        except Exception as e:
+            print(f"[STEP 5] ✗ Analogy generation error: {e}, using stub")
             analogy = analogy_generator._generate_stub_analogy(commentary)
-        else:
-            print("[STEP 5] Using AI to generate analogy...")
-            try:
-                analogy = await analogy_generator.generate(commentary)
-                print(f"[STEP 5] ✓ Generated analogy: {analogy[:50]}...")
-            except Exception as e:
-                print(f"[STEP 5] ✗ Analogy generation error: {e}, using stub")
-                analogy = analogy_generator._generate_stub_analogy(commentary)
-        
-        response_data = {
-            "originalCommentary": commentary,
-            "nflAnalogy": analogy,
-            "timestamp": request.timestamp,
-            "cached": False
-        }
-        
-        primary_cache_key = f"{request.videoId}:{base_timestamp}"
-        cache.set(primary_cache_key, response_data, expire=600)
-        
-        print(f"[COMPLETE] Analysis complete: {commentary[:50]}...")
-        print(f"[SUMMARY] Commentary source: {'Vision AI' if frame_base64 and vision_analyzer.model else 'Captions' if commentary and not any(phrase in commentary for phrase in ['Players are moving', 'The team is building']) else 'Stub'}")
-        return AnalyzeResponse(**response_data)
+    
+    response_data = {
+        "originalCommentary": commentary,
+        "nflAnalogy": analogy,
+        "fieldDiagram": field_diagram,
+        "timestamp": timestamp,
+        "cached": False
+    }
+    
+    primary_cache_key = f"{video_id}:{int(timestamp)}"
+    cache.set(primary_cache_key, response_data, expire=600)
+    
+    print(f"[COMPLETE] Analysis complete: {commentary[:50]}...")
+    print(f"[SUMMARY] Commentary source: {'Vision AI' if frame_base64 and vision_analyzer.model else 'Captions' if commentary and not any(phrase in commentary for phrase in ['Players are moving', 'The team is building']) else 'Stub'}")
+    return response_data
+
+
+async def _provisional_analysis(video_id: str, timestamp: float) -> AnalyzeResponse:
+    """
+    Answers at once with the caption at the timestamp (if it is ready within
+    ANALYZE_PROVISIONAL_BUDGET) or a stub, while the full analysis runs in the
+    background under the returned upgrade token.
+    """
+    token = analysis_upgrades.start(f"{video_id}:{int(timestamp)}", lambda: _full_analysis(video_id, timestamp))
+
+    commentary = None
+    try:
+        # Shielded: a caption fetch cut off here keeps going and fills the cache for the full analysis
+        commentary = await asyncio.wait_for(
+            asyncio.shield(caption_extractor.get_caption_at_timestamp(video_id, timestamp, use_speech_fallback=False)),
+            timeout=float(os.getenv("ANALYZE_PROVISIONAL_BUDGET", "0.3")),
+        )
+    except asyncio.TimeoutError:
+        print("[PROVISIONAL] Captions not ready yet - using stub")
+    except Exception as e:
+        print(f"[PROVISIONAL] Caption lookup error: {e}")
+
+    if not commentary:
+        commentary = random.choice(ANALYSIS_STUBS)
+    analogy = analogy_generator.semantic_cache.lookup(commentary) or analogy_generator._generate_stub_analogy(commentary)
+
+    print(f"[PROVISIONAL] Answered {video_id} at {timestamp}s, upgrade {token[:8]} running")
+    return AnalyzeResponse(
+        originalCommentary=commentary,
+        nflAnalogy=analogy,
+        timestamp=timestamp,
+        cached=False,
+        provisional=True,
+        upgradeToken=token,
+    )
+
+
+@app.post("/api/analyze", response_model=AnalyzeResponse)
+async def analyze_video(request: AnalyzeRequest):
+    tag_call(video_id=request.videoId)
+    try:
+        cached = _cached_analysis(request.videoId, request.timestamp)
+        if cached:
+            return AnalyzeResponse(**cached)
+
+        if request.provisional:
+            return await _provisional_analysis(request.videoId, request.timestamp)
+
+        return AnalyzeResponse(**await _full_analysis(request.videoId, request.timestamp))
         
     except HTTPException:
         raise
@@ -232,8 +335,36 @@ async def analyze_video(request: AnalyzeRequest):
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 
+@app.get("/api/analyze/upgrade/{token}")
+async def analyze_upgrade(token: str, wait: float = Query(0.0, ge=0.0, le=30.0)):
+    """
+    Status of a provisional answer's background analysis: `pending`, `done` with
+    the full `result`, or `failed`. `wait` long-polls up to that many seconds.
+    """
+    status = await analysis_upgrades.wait(token, timeout=wait)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired upgrade token")
+    return status
+
+
+@app.get("/api/analyze/upgrade/{token}/stream")
+async def analyze_upgrade_stream(token: str):
+    """Server-sent events: one `done` event with the full result, or `error`."""
+    async def events():
+        status = await analysis_upgrades.wait(token, timeout=60.0)
+        if status is None:
+            yield _sse("error", {"detail": "Unknown or expired upgrade token"})
+        elif status["status"] == "done":
+            yield _sse("done", status["result"])
+        else:
+            yield _sse("error", {"detail": status.get("error", "Analysis still running after 60s")})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 @app.get("/api/captions/{video_id:path}")
 async def get_captions(video_id: str, timestamp: float = Query(None), audio_fallback: bool = Query(False)):
+    tag_call(video_id=video_id)
     try:
         if timestamp is not None and audio_fallback:
             caption_text = await caption_extractor.get_caption_at_timestamp(video_id, timestamp, use_speech_fallback=True)
@@ -287,43 +418,47 @@ async def generate_analogy_from_text(request: dict):
         return {"nflAnalogy": "This is like a well-designed offensive scheme — every player has a role, creating space and options."}
 
 
+async def _chat_inputs(request: ChatRequest) -> dict:
+    tag_call(video_id=request.videoId)
+    print(f"Chat request for {request.videoId} at {request.timestamp}s: {request.userMessage[:50]}...")
+    if request.context:
+        print(f"[CHAT] Context provided - commentary: {request.context.get('commentary', 'N/A')[:60]}...")
+        print(f"[CHAT] Context provided - nflAnalogy: {request.context.get('nflAnalogy', 'N/A')[:60]}...")
+    
+    # Metadata, formatted captions and the context cache are reused across turns for the same video
+    chat_context = await chat_context_store.get(request.videoId, request.videoMetadata)
+    video_metadata = chat_context.metadata
+    
+    caption_text = None
+    try:
+        caption_text = await caption_extractor.get_caption_at_timestamp(request.videoId, request.timestamp)
+        if caption_text:
+            print(f"[CHAT] Got caption at {request.timestamp}s: {caption_text[:60]}...")
+    except Exception as e:
+        print(f"[CHAT] Could not get caption: {e}")
+    
+    enhanced_context = request.context.copy() if request.context else {}
+    if caption_text:
+        enhanced_context['caption'] = caption_text
+    
+    return {
+        "user_message": request.userMessage,
+        "video_id": request.videoId,
+        "current_time": request.timestamp,
+        "context": enhanced_context,
+        "video_metadata": video_metadata,
+        "caption_extractor": caption_extractor,
+        # Chat vision shares live commentary's frame windows and window analysis cache
+        "frame_extractor": commentary_orchestrator.frame_service,
+        "vision_analyzer": commentary_orchestrator.vision_analyzer,
+        "chat_context": chat_context,
+    }
+
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     try:
-        print(f"Chat request for {request.videoId} at {request.timestamp}s: {request.userMessage[:50]}...")
-        if request.context:
-            print(f"[CHAT] Context provided - commentary: {request.context.get('commentary', 'N/A')[:60]}...")
-            print(f"[CHAT] Context provided - nflAnalogy: {request.context.get('nflAnalogy', 'N/A')[:60]}...")
-        
-        video_metadata = request.videoMetadata
-        if not video_metadata:
-            print(f"[CHAT] Fetching video metadata...")
-            video_metadata = await metadata_extractor.get_metadata(request.videoId)
-            if video_metadata:
-                print(f"[CHAT] Got metadata: {video_metadata.get('title', 'N/A')[:50]}...")
-        
-        caption_text = None
-        try:
-            caption_text = await caption_extractor.get_caption_at_timestamp(request.videoId, request.timestamp)
-            if caption_text:
-                print(f"[CHAT] Got caption at {request.timestamp}s: {caption_text[:60]}...")
-        except Exception as e:
-            print(f"[CHAT] Could not get caption: {e}")
-        
-        enhanced_context = request.context.copy() if request.context else {}
-        if caption_text:
-            enhanced_context['caption'] = caption_text
-        
-        response_text = await chat_service.chat(
-            user_message=request.userMessage,
-            video_id=request.videoId,
-            current_time=request.timestamp,
-            context=enhanced_context,
-            video_metadata=video_metadata,
-            caption_extractor=caption_extractor,
-            frame_extractor=frame_extractor,
-            vision_analyzer=vision_analyzer
-        )
+        response_text = await chat_service.chat(**await _chat_inputs(request))
         
         return ChatResponse(
             response=response_text,
@@ -337,8 +472,28 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
 
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Same answer as /api/chat, streamed as server-sent events: `token` events with
+    {"text": ...} as Gemini generates, then a `done` event with the full response,
+    the resolved timestamp, the caption window used and the answer source.
+    """
+    async def events():
+        try:
+            inputs = await _chat_inputs(request)
+            async for event in chat_service.chat_stream(**inputs):
+                yield _sse(event.pop("type"), event)
+        except Exception as e:
+            print(f"Chat stream error: {e}")
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 @app.post("/api/live-commentary", response_model=LiveCommentaryResponse)
 async def generate_live_commentary(request: LiveCommentaryRequest):
+    tag_call(video_id=request.videoId)
     try:
         logger = logging.getLogger(__name__)
         logger.info(f"[LIVE COMMENTARY] Generating commentary for {request.videoId} at {request.timestamp}s")
@@ -350,7 +505,8 @@ async def generate_live_commentary(request: LiveCommentaryRequest):
             commentary_orchestrator.generate_live_commentary(
                 video_url=request.videoId,
                 current_time=request.timestamp,
-                window_size=request.windowSize
+                window_size=request.windowSize,
+                deadline=time.monotonic() + timeout_seconds
             ),
             timeout=timeout_seconds
         )
@@ -401,6 +557,26 @@ async def generate_nfl_analogy(request: NFLAnalogyRequest):
         raise HTTPException(status_code=500, detail=f"NFL analogy generation failed: {str(e)}")
 
 
+@app.post("/api/nfl-analogy/stream")
+async def stream_nfl_analogy(request: NFLAnalogyRequest):
+    """
+    Same conversion as /api/nfl-analogy, streamed as server-sent events:
+    `analogy` events carry text deltas as they are generated; a `reset` event means
+    the deltas so far are void (the streamed answer failed and a fallback follows as
+    new deltas); a final `done` event carries the complete nfl_analogy /
+    nfl_commentary and the mode that produced them.
+    """
+    async def events():
+        try:
+            async for event in nfl_analogy_service.stream_nfl_analogy(request.soccer_commentary):
+                yield _sse(event.pop("type"), event)
+        except Exception as e:
+            logging.getLogger(__name__).error(f"[NFL-ANALOGY] Stream error: {e}", exc_info=True)
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 @app.post("/api/tts")
 async def text_to_speech(request: TTSRequest):
     """
@@ -421,6 +597,8 @@ async def text_to_speech(request: TTSRequest):
         audio_bytes = await tts_service.synthesize(request.text)
 
         if audio_bytes is None:
+            if tts_service.breaker.state != "closed":
+                raise HTTPException(status_code=503, detail="TTS temporarily unavailable")
             raise HTTPException(status_code=500, detail="Failed to generate audio")
 
         logger.info(f"[TTS] Generated {len(audio_bytes)} bytes of audio")
@@ -434,6 +612,13 @@ async def text_to_speech(request: TTSRequest):
         raise HTTPException(status_code=500, detail=f"TTS generation failed: {str(e)}")
 
 
+@app.on_event("shutdown")
+async def persist_caches():
+    vision_analyzer.frame_cache.save()
+    commentary_orchestrator.vision_analyzer.window_cache.save()
+    await get_llm_gateway().aclose()
+
+
 @app.get("/health")
 async def health_check():
     api_key_set = bool(os.getenv("GEMINI_API_KEY"))
@@ -454,6 +639,34 @@ async def health_check():
     }
 
 
+@app.get("/api/metrics")
+async def metrics():
+    return {
+        "llm_scheduler": get_llm_gateway().scheduler.stats(),
+        "llm_cache": get_llm_gateway().cache.stats(),
+        "llm_models": get_llm_gateway().router.stats(),
+        "llm_hedging": get_llm_gateway().hedging.stats(),
+        "circuits": circuit_stats(),
+        "analysis_upgrades": analysis_upgrades.stats(),
+        "upstream_usage": get_usage_tracker().stats(),
+        "chat_context": chat_context_store.stats(),
+        "caption_store": caption_extractor.store.stats(),
+        "vision_frame_cache": vision_analyzer.frame_cache.stats(),
+        "vision_window_cache": commentary_orchestrator.vision_analyzer.window_cache.stats(),
+        "vision_batching": commentary_orchestrator.vision_analyzer.batcher.stats(),
+        "analogy_semantic_cache": analogy_generator.semantic_cache.stats(),
+        "nfl_analogy_semantic_cache": nfl_analogy_service.semantic_cache.stats(),
+    }
+
+
+@app.get("/ready")
+async def readiness_check():
+    status = model_warmup.status()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content={"status": "warming_up", **status})
+    return {"status": "ready", **status}
+
+
 @app.get("/")
 async def root():
     return {
@@ -461,11 +674,15 @@ async def root():
         "version": "1.1.0",
         "endpoints": {
             "analyze": "/api/analyze",
+            "analyze-upgrade": "/api/analyze/upgrade/{token}",
             "chat": "/api/chat",
+            "chat-stream": "/api/chat/stream",
             "live-commentary": "/api/live-commentary",
             "nfl-analogy": "/api/nfl-analogy",
+            "nfl-analogy-stream": "/api/nfl-analogy/stream",
             "tts": "/api/tts",
             "health": "/health",
+            "ready": "/ready",
             "docs": "/docs"
         },
         "ai_provider": ai_provider,
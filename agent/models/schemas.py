@@ -5,6 +5,7 @@ from typing import Optional, Dict, Any
 class AnalyzeRequest(BaseModel):
     videoId: str = Field(..., description="Video URL (any site) or YouTube video ID (for backward compatibility)")
     timestamp: float = Field(..., description="Current video timestamp in seconds")
+    provisional: bool = Field(default=False, description="Answer immediately with a provisional result and finish the analysis in the background")
 
 
 class FieldDiagram(BaseModel):
@@ -19,6 +20,9 @@ class AnalyzeResponse(BaseModel):
     nflAnalogy: str = Field(..., description="NFL analogy explanation")
     timestamp: float = Field(..., description="Timestamp used for analysis")
     cached: bool = Field(default=False, description="Whether result was from cache")
+    fieldDiagram: Optional[FieldDiagram] = Field(default=None, description="Player and ball positions from the analyzed frame")
+    provisional: bool = Field(default=False, description="Whether this is a provisional (caption or stub) result")
+    upgradeToken: Optional[str] = Field(default=None, description="Token for /api/analyze/upgrade/{token} when provisional")
 
 
 class ChatRequest(BaseModel):
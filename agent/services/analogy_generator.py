@@ -1,20 +1,23 @@
-import os
-import asyncio
 from typing import Optional
 
-from google import genai
+from services.llm_gateway import get_llm_gateway
+from services.semantic_cache import SemanticCache
 
 
 class AnalogyGenerator:
     def __init__(self, api_key: Optional[str] = None):
-        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
-        self.model_name = (os.getenv("GEMINI_MODEL") or "gemini-2.0-flash").strip()
-        self.client = genai.Client(api_key=self.api_key) if self.api_key else None
+        self.gateway = get_llm_gateway()
+        self.model_name = self.gateway.default_model
+        self.semantic_cache = SemanticCache("analogy")
 
     async def generate(self, commentary: str) -> str:
-        if not self.client:
+        if not self.gateway.is_available():
             return self._generate_stub_analogy(commentary)
 
+        cached = self.semantic_cache.lookup(commentary)
+        if cached is not None:
+            return cached
+
         prompt = (
             "You are a sports analyst who explains soccer plays using NFL analogies for American football fans. "
             "Convert this soccer commentary into an NFL analogy that American football fans would understand:\n\n"
@@ -28,23 +31,17 @@ class AnalogyGenerator:
             "Respond with ONLY the NFL analogy, no preamble."
         )
 
-        loop = asyncio.get_event_loop()
-        model_try = [self.model_name, "gemini-2.0-flash", "gemini-1.5-pro"]
-
-        last_err = None
-        for m in model_try:
-            try:
-                resp = await loop.run_in_executor(
-                    None, lambda: self.client.models.generate_content(model=m, contents=prompt)
-                )
-                text = (getattr(resp, "text", "") or "").strip()
-                if text:
-                    return text
-                raise RuntimeError("Empty Gemini text response.")
-            except Exception as e:
-                last_err = e
+        try:
+            analogy = await self.gateway.generate(
+                prompt,
+                call_site="analogy",
+                model=self.model_name,
+            )
+        except Exception:
+            return self._generate_stub_analogy(commentary)
 
-        return self._generate_stub_analogy(commentary)
+        self.semantic_cache.add(commentary, analogy)
+        return analogy
 
     def _generate_stub_analogy(self, commentary: str) -> str:
         commentary_lower = commentary.lower()
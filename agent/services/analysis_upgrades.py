@@ -0,0 +1,105 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Upgrade:
+    __slots__ = ("key", "task", "created_at", "finished_at")
+
+    def __init__(self, key: str, task: asyncio.Task):
+        self.key = key
+        self.task = task
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+
+class AnalysisUpgrades:
+    """
+    Background full analyses behind provisional /api/analyze answers.
+
+    - start() runs the pipeline as a task and returns an upgrade token; a request for
+      the same key (video + second) while one is running gets the running task's token
+    - Results are kept for ANALYZE_UPGRADE_TTL seconds after finishing (bounded count)
+      so clients can poll or subscribe late
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.ttl = float(os.getenv("ANALYZE_UPGRADE_TTL", "300"))
+        self.max_entries = max_entries
+        self._upgrades: "OrderedDict[str, _Upgrade]" = OrderedDict()
+        self._running: Dict[str, str] = {}
+
+        self.started = 0
+        self.deduplicated = 0
+        self.failed = 0
+
+    def start(self, key: str, pipeline: Callable[[], Awaitable[Dict[str, Any]]]) -> str:
+        token = self._running.get(key)
+        if token is not None:
+            self.deduplicated += 1
+            return token
+
+        self._evict()
+        token = uuid.uuid4().hex
+        task = asyncio.get_running_loop().create_task(pipeline())
+        self._upgrades[token] = _Upgrade(key, task)
+        self._running[key] = token
+        task.add_done_callback(lambda t, token=token: self._finished(token, t))
+        self.started += 1
+        return token
+
+    async def wait(self, token: str, timeout: float = 0.0) -> Optional[Dict[str, Any]]:
+        """
+        Returns {"status": "pending" | "done" | "failed", ...} after waiting up to
+        `timeout` seconds for the upgrade, or None for an unknown or expired token.
+        """
+        upgrade = self._upgrades.get(token)
+        if upgrade is None:
+            return None
+        if timeout > 0 and not upgrade.task.done():
+            await asyncio.wait({upgrade.task}, timeout=timeout)
+
+        if not upgrade.task.done():
+            return {"status": "pending", "elapsed": round(time.time() - upgrade.created_at, 2)}
+        if upgrade.task.cancelled() or upgrade.task.exception() is not None:
+            error = "cancelled" if upgrade.task.cancelled() else str(upgrade.task.exception())
+            return {"status": "failed", "error": error}
+        return {"status": "done", "result": upgrade.task.result()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": len(self._running),
+            "kept": len(self._upgrades),
+            "started": self.started,
+            "deduplicated": self.deduplicated,
+            "failed": self.failed,
+        }
+
+    def _finished(self, token: str, task: asyncio.Task) -> None:
+        upgrade = self._upgrades.get(token)
+        if upgrade is not None:
+            upgrade.finished_at = time.time()
+            if self._running.get(upgrade.key) == token:
+                del self._running[upgrade.key]
+        if task.cancelled() or task.exception() is not None:
+            self.failed += 1
+            logger.warning(f"[ANALYZE] Upgrade {token[:8]} failed: {'cancelled' if task.cancelled() else task.exception()}")
+
+    def _evict(self) -> None:
+        now = time.time()
+        for token in list(self._upgrades):
+            upgrade = self._upgrades[token]
+            if upgrade.finished_at is not None and now - upgrade.finished_at > self.ttl:
+                del self._upgrades[token]
+        # Over the bound, drop the oldest finished upgrades; running ones stay pollable
+        for token in list(self._upgrades):
+            if len(self._upgrades) < self.max_entries:
+                break
+            if self._upgrades[token].finished_at is not None:
+                del self._upgrades[token]
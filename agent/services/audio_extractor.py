@@ -7,6 +7,8 @@ import tempfile
 from typing import Optional, Dict, Any
 import logging
 
+from services.circuit_breaker import get_circuit_breaker
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,6 +22,7 @@ class AudioExtractor:
             'no_warnings': True,
             'extract_flat': False,
         }
+        self.breaker = get_circuit_breaker("youtube")
 
         try:
             from services.gemini_audio_transcriber import GeminiAudioTranscriber
@@ -35,6 +38,10 @@ class AudioExtractor:
         return f"https://www.youtube.com/watch?v={video_url_or_id}"
     
     async def extract_audio_segment(self, video_url_or_id: str, start_time: float, end_time: float) -> Optional[str]:
+
+        if not self.breaker.allow():
+            logger.warning("YouTube circuit open - skipping audio extraction")
+            return None
         
         try:
             video_url = self._get_video_url(video_url_or_id)
@@ -47,7 +54,7 @@ class AudioExtractor:
             
 
             loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
+            extracted = await loop.run_in_executor(
                 None,
                 self._extract_audio_sync,
                 video_url,
@@ -55,6 +62,10 @@ class AudioExtractor:
                 duration,
                 temp_audio_path
             )
+            if extracted:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
             
             return temp_audio_path
             
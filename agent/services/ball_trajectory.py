@@ -0,0 +1,154 @@
+import numpy as np
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BallTrajectoryFilter:
+    """
+    Fuses per-frame ball detections across a frame window.
+
+    - Constant-velocity Kalman filter over (x, y, vx, vy) with per-frame dt
+    - Rauch-Tung-Striebel smoothing fills frames where the detector missed the ball
+    - Reports start/end position, speed and heading for the prompt
+    """
+
+    DIRECTIONS = ["right", "down-right", "down", "down-left", "left", "up-left", "up", "up-right"]
+
+    def __init__(self, process_noise: float = 400.0, measurement_noise: float = 25.0, min_confidence: float = 0.1):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.min_confidence = min_confidence
+
+    def track(self, timestamps: List[float], detections: List[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        if not timestamps or len(timestamps) != len(detections):
+            return None
+
+        order = np.argsort(timestamps)
+        times = np.asarray(timestamps, dtype=np.float64)[order]
+        observations = [self._ball_center(detections[i]) for i in order]
+
+        observed = np.array([obs is not None for obs in observations])
+        if not observed.any():
+            return None
+
+        states, covariances = self._smooth(times, observations)
+        positions = states[:, :2]
+
+        first = int(np.argmax(observed))
+        last = len(observed) - 1 - int(np.argmax(observed[::-1]))
+        start = positions[first]
+        end = positions[last]
+        elapsed = times[last] - times[first]
+
+        speed = None
+        direction = None
+        if elapsed > 0 and observed.sum() >= 2:
+            displacement = end - start
+            speed = float(np.hypot(*displacement) / elapsed)
+            direction = self._direction(displacement)
+
+        return {
+            'positions': [
+                {'timestamp': float(t), 'x': float(x), 'y': float(y), 'observed': bool(o)}
+                for t, (x, y), o in zip(times, positions, observed)
+            ],
+            'start': [float(start[0]), float(start[1])],
+            'end': [float(end[0]), float(end[1])],
+            'speed': speed,
+            'direction': direction,
+            'observed_frames': int(observed.sum()),
+            'interpolated_frames': int((~observed).sum()),
+        }
+
+    def describe(self, trajectory: Optional[Dict[str, Any]]) -> Optional[str]:
+        if not trajectory:
+            return None
+
+        sx, sy = trajectory['start']
+        ex, ey = trajectory['end']
+        coverage = f"seen in {trajectory['observed_frames']}/{trajectory['observed_frames'] + trajectory['interpolated_frames']} frames"
+
+        if trajectory['speed'] is None:
+            return f"Ball at ({sx:.0f}, {sy:.0f}) ({coverage})"
+        if trajectory['speed'] < 20:
+            return f"Ball roughly stationary near ({ex:.0f}, {ey:.0f}) ({coverage})"
+        return (
+            f"Ball moved from ({sx:.0f}, {sy:.0f}) to ({ex:.0f}, {ey:.0f}) "
+            f"at ~{trajectory['speed']:.0f} px/s heading {trajectory['direction']} ({coverage})"
+        )
+
+    def _smooth(self, times: np.ndarray, observations: List[Optional[np.ndarray]]):
+        n = len(times)
+        H = np.array([[1, 0, 0, 0], [0, 1, 0, 0]], dtype=np.float64)
+
+        first_obs = next(obs for obs in observations if obs is not None)
+        x = np.array([first_obs[0], first_obs[1], 0.0, 0.0])
+        P = np.diag([self.measurement_noise, self.measurement_noise, 1e4, 1e4])
+
+        filtered_x = np.zeros((n, 4))
+        filtered_P = np.zeros((n, 4, 4))
+        predicted_x = np.zeros((n, 4))
+        predicted_P = np.zeros((n, 4, 4))
+        transitions = np.zeros((n, 4, 4))
+
+        for k in range(n):
+            dt = times[k] - times[k - 1] if k > 0 else 0.0
+            F = self._transition(dt)
+            Q = self._process_covariance(dt)
+
+            x = F @ x
+            P = F @ P @ F.T + Q
+            predicted_x[k], predicted_P[k], transitions[k] = x, P, F
+
+            obs = observations[k]
+            if obs is not None:
+                R = np.eye(2) * (self.measurement_noise / max(obs[2], self.min_confidence))
+                S = H @ P @ H.T + R
+                K = P @ H.T @ np.linalg.inv(S)
+                x = x + K @ (obs[:2] - H @ x)
+                P = (np.eye(4) - K @ H) @ P
+
+            filtered_x[k], filtered_P[k] = x, P
+
+        smoothed_x = filtered_x.copy()
+        smoothed_P = filtered_P.copy()
+        for k in range(n - 2, -1, -1):
+            F = transitions[k + 1]
+            C = filtered_P[k] @ F.T @ np.linalg.pinv(predicted_P[k + 1])
+            smoothed_x[k] = filtered_x[k] + C @ (smoothed_x[k + 1] - predicted_x[k + 1])
+            smoothed_P[k] = filtered_P[k] + C @ (smoothed_P[k + 1] - predicted_P[k + 1]) @ C.T
+
+        return smoothed_x, smoothed_P
+
+    @staticmethod
+    def _transition(dt: float) -> np.ndarray:
+        F = np.eye(4)
+        F[0, 2] = dt
+        F[1, 3] = dt
+        return F
+
+    def _process_covariance(self, dt: float) -> np.ndarray:
+        q = self.process_noise
+        dt2, dt3, dt4 = dt ** 2, dt ** 3, dt ** 4
+        return q * np.array([
+            [dt4 / 4, 0, dt3 / 2, 0],
+            [0, dt4 / 4, 0, dt3 / 2],
+            [dt3 / 2, 0, dt2, 0],
+            [0, dt3 / 2, 0, dt2],
+        ])
+
+    def _ball_center(self, detection: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        if not detection or not detection.get('ball'):
+            return None
+        ball = detection['ball']
+        if ball.get('confidence', 0) < self.min_confidence:
+            return None
+        bbox = ball['bbox']
+        return np.array([bbox['center_x'], bbox['center_y'], ball.get('confidence', 1.0)], dtype=np.float64)
+
+    def _direction(self, displacement: np.ndarray) -> str:
+        # Image y grows downwards, so a positive dy is "down"
+        angle = np.degrees(np.arctan2(displacement[1], displacement[0])) % 360
+        return self.DIRECTIONS[int(((angle + 22.5) % 360) // 45)]
@@ -1,10 +1,14 @@
 
 import yt_dlp
 import asyncio
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 import logging
 import os
 
+from services.caption_index import CaptionIndex
+from services.caption_store import CaptionStore
+from services.circuit_breaker import get_circuit_breaker
+
 logger = logging.getLogger(__name__)
 
 
@@ -13,6 +17,9 @@ class YouTubeCaptionExtractor:
     
     def __init__(self):
         self.caption_cache: Dict[str, List[Dict]] = {}
+        self.caption_index: Dict[str, CaptionIndex] = {}
+        self._memory_versions: Dict[str, Tuple[List[Dict], Tuple]] = {}
+        self.store = CaptionStore()
         self.ydl_opts = {
             'quiet': True,
             'no_warnings': True,
@@ -20,6 +27,7 @@ class YouTubeCaptionExtractor:
             'writesubtitles': True,
             'writeautomaticsub': True,
         }
+        self.breaker = get_circuit_breaker("youtube")
         
         self.audio_extractor = None
         try:
@@ -40,37 +48,29 @@ class YouTubeCaptionExtractor:
         
         try:
 
-            captions = await self.fetch_captions(video_url_or_id)
-            
-            if not captions:
-                if use_speech_fallback and self.audio_extractor:
-                    logger.info(f"[CAPTION EXTRACTOR] No YouTube captions found, trying Gemini audio transcription at {timestamp}s...")
-                    return await self._get_caption_from_speech(video_url_or_id, timestamp)
-                return None
-            
-
-            for caption in captions:
-                start = float(caption.get('start', 0))
-                duration = float(caption.get('duration', 0))
-                end = start + duration
+            cache_key = self._get_cache_key(video_url_or_id)
+            if self._read_from_store(cache_key):
+                text = self.store.cue_at(cache_key, timestamp, grace=3.0, max_distance=5.0)
+            else:
+                captions = await self.fetch_captions(video_url_or_id)
+                
+                if not captions:
+                    if use_speech_fallback and self.audio_extractor:
+                        logger.info(f"[CAPTION EXTRACTOR] No YouTube captions found, trying Gemini audio transcription at {timestamp}s...")
+                        return await self._get_caption_from_speech(video_url_or_id, timestamp)
+                    return None
                 
 
-                if start <= timestamp <= end + 3:
-                    return caption.get('text', '').strip()
-            
+                index = self._index_for(video_url_or_id, captions)
 
-            nearest = None
-            min_diff = 5.0
-            
-            for caption in captions:
-                start = float(caption.get('start', 0))
-                diff = abs(timestamp - start)
-                if diff < min_diff:
-                    min_diff = diff
-                    nearest = caption
+                # First caption covering the timestamp (3s grace after it ends), else the nearest start within 5s
+                i = index.covering(timestamp, grace=3.0)
+                if i is None:
+                    i = index.nearest(timestamp, max_distance=5.0)
+                text = index.text(i) if i is not None else None
             
-            if nearest:
-                return nearest.get('text', '').strip()
+            if text is not None:
+                return text
             
             if use_speech_fallback and self.audio_extractor:
                 logger.info(f"[CAPTION EXTRACTOR] No caption at {timestamp}s, trying Gemini audio transcription...")
@@ -92,6 +92,12 @@ class YouTubeCaptionExtractor:
         try:
             start_time = max(0.0, timestamp - window_size / 2)
             end_time = timestamp + window_size / 2
+            cache_key = self._get_cache_key(video_url_or_id)
+            
+            transcript = self.store.transcript(cache_key, start_time, end_time)
+            if transcript:
+                logger.info(f"[CAPTION EXTRACTOR] ✓ Stored Gemini audio transcription for {start_time:.1f}s-{end_time:.1f}s")
+                return transcript
             
             transcript = await self.audio_extractor.extract_and_transcribe(
                 video_url_or_id,
@@ -101,6 +107,7 @@ class YouTubeCaptionExtractor:
             
             if transcript:
                 logger.info(f"[CAPTION EXTRACTOR] ✓ Gemini audio transcription: {transcript[:60]}...")
+                self.store.save_transcript(cache_key, start_time, end_time, transcript.strip())
                 return transcript.strip()
             else:
                 logger.warning(f"[CAPTION EXTRACTOR] Gemini audio transcription returned no transcript")
@@ -114,31 +121,27 @@ class YouTubeCaptionExtractor:
         
         try:
 
-            captions = await self.fetch_captions(video_url_or_id)
-            
-            if not captions:
-                if use_speech_fallback and self.audio_extractor:
-                    logger.info(f"[CAPTION EXTRACTOR] No YouTube captions found, generating Gemini audio transcription for range {start_time}s-{end_time}s...")
-                    speech_caption = await self._get_caption_from_speech(video_url_or_id, (start_time + end_time) / 2, window_size=end_time - start_time)
-                    if speech_caption:
-                        return [{
-                            'start': start_time,
-                            'duration': end_time - start_time,
-                            'text': speech_caption,
-                            'source': 'gemini-audio'
-                        }]
-                return []
-            
-
-            captions_in_range = []
-            for caption in captions:
-                start = float(caption.get('start', 0))
-                duration = float(caption.get('duration', 0))
-                end = start + duration
+            cache_key = self._get_cache_key(video_url_or_id)
+            if self._read_from_store(cache_key):
+                captions_in_range = self.store.cues_in_range(cache_key, start_time, end_time)
+            else:
+                captions = await self.fetch_captions(video_url_or_id)
+                
+                if not captions:
+                    if use_speech_fallback and self.audio_extractor:
+                        logger.info(f"[CAPTION EXTRACTOR] No YouTube captions found, generating Gemini audio transcription for range {start_time}s-{end_time}s...")
+                        speech_caption = await self._get_caption_from_speech(video_url_or_id, (start_time + end_time) / 2, window_size=end_time - start_time)
+                        if speech_caption:
+                            return [{
+                                'start': start_time,
+                                'duration': end_time - start_time,
+                                'text': speech_caption,
+                                'source': 'gemini-audio'
+                            }]
+                    return []
                 
 
-                if not (end < start_time or start > end_time):
-                    captions_in_range.append(caption)
+                captions_in_range = self._index_for(video_url_or_id, captions).overlapping(start_time, end_time)
             
             if not captions_in_range and use_speech_fallback and self.audio_extractor:
                 logger.info(f"[CAPTION EXTRACTOR] No captions in range, trying Gemini audio transcription...")
@@ -157,6 +160,41 @@ class YouTubeCaptionExtractor:
             logger.error(f"Error getting captions in range: {e}")
             return []
     
+    def _read_from_store(self, cache_key: str) -> bool:
+        """Point and range lookups go straight to the store while the track isn't loaded in this worker."""
+        return cache_key not in self.caption_cache and self.store.has_cues(cache_key)
+    
+    def _index_for(self, video_url_or_id: str, captions: List[Dict]) -> CaptionIndex:
+        """Sorted interval index over a video's captions, rebuilt when the cached list changes."""
+        cache_key = self._get_cache_key(video_url_or_id)
+        index = self.caption_index.get(cache_key)
+        if index is None or index.source is not captions:
+            index = CaptionIndex(captions)
+            self.caption_index[cache_key] = index
+        return index
+    
+    def track_version(self, video_url_or_id: str) -> Optional[Tuple]:
+        """
+        Stable identity of the video's caption track, without loading it: the store's fetch
+        time and cue count, else a content hash of the in-memory list. None when no track
+        has been fetched yet (or the last fetch failed).
+        """
+        cache_key = self._get_cache_key(video_url_or_id)
+        track = self.store.track(cache_key)
+        if track is not None:
+            return ("store", track['fetched_at'], track['cues'])
+
+        captions = self.caption_cache.get(cache_key)
+        if not captions:
+            return None
+        memo = self._memory_versions.get(cache_key)
+        if memo is None or memo[0] is not captions:
+            # The memo keeps the list alive, so `is` can't be fooled by a reused id
+            content = tuple((c.get('start'), c.get('duration'), c.get('text')) for c in captions)
+            memo = (captions, ("memory", len(captions), hash(content)))
+            self._memory_versions[cache_key] = memo
+        return memo[1]
+    
     async def fetch_captions(self, video_url_or_id: str) -> List[Dict]:
         
         cache_key = self._get_cache_key(video_url_or_id)
@@ -165,18 +203,35 @@ class YouTubeCaptionExtractor:
         if cache_key in self.caption_cache:
             logger.info(f"Using cached captions for {cache_key}")
             return self.caption_cache[cache_key]
+
+        stored = self.store.load_cues(cache_key)
+        if stored is not None:
+            if stored:
+                self.caption_cache[cache_key] = stored
+                logger.info(f"Loaded {len(stored)} stored captions for {cache_key}")
+            else:
+                logger.info(f"Caption store has no captions for {cache_key} - speech-to-text fallback available: {self.audio_extractor is not None}")
+            return stored
+
+        if not self.breaker.allow():
+            logger.warning(f"YouTube circuit open - skipping caption fetch for {video_url_or_id}")
+            return []
         
         try:
 
             loop = asyncio.get_event_loop()
+            track_info: Dict[str, str] = {}
             captions = await asyncio.wait_for(
                 loop.run_in_executor(
                     None,
                     self._fetch_captions_sync,
-                    video_url_or_id
+                    video_url_or_id,
+                    track_info
                 ),
                 timeout=15.0
             )
+            self.breaker.record_success()
+            self.store.save_track(cache_key, captions or [], track_info.get('source'), track_info.get('language'))
             
 
             if captions:
@@ -188,13 +243,17 @@ class YouTubeCaptionExtractor:
             return captions or []
             
         except asyncio.TimeoutError:
+            self.breaker.record_failure()
             logger.warning(f"Caption fetch timeout for {video_url_or_id} - speech-to-text fallback available: {self.audio_extractor is not None}")
             return []
         except Exception as e:
+            self.breaker.record_failure()
             logger.error(f"Error fetching captions: {e} - speech-to-text fallback available: {self.audio_extractor is not None}")
             return []
     
-    def _fetch_captions_sync(self, video_url_or_id: str) -> List[Dict]:
+    def _fetch_captions_sync(self, video_url_or_id: str, track_info: Optional[Dict[str, str]] = None) -> List[Dict]:
+        # `track_info` receives the source and language of the chosen caption track
+        track_info = track_info if track_info is not None else {}
         
         try:
 
@@ -218,16 +277,20 @@ class YouTubeCaptionExtractor:
 
                 if 'en' in subtitles:
                     caption_tracks = subtitles['en']
+                    track_info.update(source='youtube', language='en')
                 elif 'en' in automatic_captions:
                     caption_tracks = automatic_captions['en']
+                    track_info.update(source='youtube-auto', language='en')
                 elif automatic_captions:
 
                     first_lang = list(automatic_captions.keys())[0]
                     caption_tracks = automatic_captions[first_lang]
+                    track_info.update(source='youtube-auto', language=first_lang)
                 elif subtitles:
 
                     first_lang = list(subtitles.keys())[0]
                     caption_tracks = subtitles[first_lang]
+                    track_info.update(source='youtube', language=first_lang)
                 
                 if not caption_tracks:
                     logger.warning(f"No captions available for {video_url} - speech-to-text fallback will be used if configured")
@@ -378,8 +441,9 @@ class YouTubeCaptionExtractor:
                 return captions
                 
         except Exception as e:
+            # Re-raised so fetch_captions can tell a yt-dlp failure from a video without captions
             logger.error(f"Sync caption fetch error: {e}")
-            return []
+            raise
     
     def _vtt_time_to_seconds(self, vtt_time: str) -> float:
         
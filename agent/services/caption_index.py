@@ -0,0 +1,72 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional
+
+
+class CaptionIndex:
+    """
+    One video's captions as sorted parallel arrays for O(log n) lookups.
+
+    - `starts` / `ends` (start + duration) in seconds, sorted by start; captions are
+      kept in that (stable) order in `captions`
+    - `max_ends[i]` is the largest end among captions 0..i, which is non-decreasing, so
+      "the first caption that still covers t" is a bisect as well
+    - caption texts (stripped) are stored back to back in one string, sliced through
+      `text_offsets`
+    """
+
+    def __init__(self, captions: List[Dict]):
+        self.source = captions
+        ordered = sorted(captions, key=lambda c: float(c.get('start', 0)))
+        self.captions = ordered
+        self.starts = array('d')
+        self.ends = array('d')
+        self.max_ends = array('d')
+        self.text_offsets = array('l', [0])
+
+        texts = []
+        running_max = float('-inf')
+        for caption in ordered:
+            start = float(caption.get('start', 0))
+            end = start + float(caption.get('duration', 0))
+            running_max = max(running_max, end)
+            self.starts.append(start)
+            self.ends.append(end)
+            self.max_ends.append(running_max)
+            text = caption.get('text', '').strip()
+            texts.append(text)
+            self.text_offsets.append(self.text_offsets[-1] + len(text))
+        self._text = "".join(texts)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def text(self, i: int) -> str:
+        return self._text[self.text_offsets[i]:self.text_offsets[i + 1]]
+
+    def covering(self, timestamp: float, grace: float = 0.0) -> Optional[int]:
+        """Index of the earliest caption with start <= timestamp <= end + grace."""
+        hi = bisect_right(self.starts, timestamp)
+        i = bisect_left(self.max_ends, timestamp - grace, 0, hi)
+        return i if i < hi else None
+
+    def nearest(self, timestamp: float, max_distance: float) -> Optional[int]:
+        """Index of the caption whose start is closest to timestamp (earlier one on ties), within max_distance."""
+        j = bisect_left(self.starts, timestamp)
+        best = None
+        best_diff = max_distance
+        if j > 0:
+            # First of any captions sharing that start
+            left = bisect_left(self.starts, self.starts[j - 1])
+            diff = timestamp - self.starts[left]
+            if diff < best_diff:
+                best, best_diff = left, diff
+        if j < len(self.starts) and self.starts[j] - timestamp < best_diff:
+            best = j
+        return best
+
+    def overlapping(self, start_time: float, end_time: float) -> List[Dict]:
+        """Captions whose [start, end] intersects [start_time, end_time], in start order."""
+        hi = bisect_right(self.starts, end_time)
+        lo = bisect_left(self.max_ends, start_time, 0, hi)
+        return [self.captions[i] for i in range(lo, hi) if self.ends[i] >= start_time]
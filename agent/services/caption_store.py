@@ -0,0 +1,236 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CaptionStore:
+    """
+    Persistent store for parsed caption tracks and Gemini audio transcripts.
+
+    - One SQLite file (WAL) shared by every worker on the host, so restarts and new
+      workers read tracks from disk instead of re-fetching them through yt-dlp
+    - Tracks keep their source (`youtube`, `youtube-auto`), language and fetch time;
+      cues are rows ordered like CaptionIndex (by start, with a running max of ends), so
+      point and range lookups are indexed queries that never load the whole track
+    - Videos without captions are remembered for CAPTION_STORE_EMPTY_TTL seconds,
+      everything else for CAPTION_STORE_TTL
+    - Transcripts are keyed by video and window (rounded to 0.1s)
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path if path is not None else os.getenv("CAPTION_STORE_PATH", ".cache/captions.sqlite3")
+        self.ttl = float(os.getenv("CAPTION_STORE_TTL", str(7 * 24 * 3600)))
+        self.empty_ttl = float(os.getenv("CAPTION_STORE_EMPTY_TTL", "3600"))
+
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.track_hits = 0
+        self.track_misses = 0
+        self.lookups = 0
+        self.transcript_hits = 0
+        self.transcript_misses = 0
+
+        if self.path and self.ttl > 0:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS tracks ("
+                    "video_key TEXT PRIMARY KEY, source TEXT, language TEXT, cue_count INTEGER, "
+                    "fetched_at REAL, expires_at REAL)"
+                )
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS cues ("
+                    "video_key TEXT, seq INTEGER, start REAL, duration REAL, end REAL, max_end REAL, text TEXT, "
+                    "PRIMARY KEY (video_key, seq))"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS cues_start ON cues (video_key, start, seq)")
+                self._db.execute("CREATE INDEX IF NOT EXISTS cues_max_end ON cues (video_key, max_end, seq)")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS transcripts ("
+                    "video_key TEXT, start REAL, end REAL, language TEXT, text TEXT, fetched_at REAL, expires_at REAL, "
+                    "PRIMARY KEY (video_key, start, end))"
+                )
+                now = time.time()
+                self._db.execute(
+                    "DELETE FROM cues WHERE video_key IN (SELECT video_key FROM tracks WHERE expires_at < ?)", (now,)
+                )
+                self._db.execute("DELETE FROM tracks WHERE expires_at < ?", (now,))
+                self._db.execute("DELETE FROM transcripts WHERE expires_at < ?", (now,))
+            except Exception as e:
+                logger.warning(f"[CAPTION STORE] Disabled ({self.path}): {e}")
+                self._db = None
+
+    def track(self, video_key: str) -> Optional[Dict[str, Any]]:
+        """Source, language, fetch time and cue count of an unexpired track, or None."""
+        row = self._query_one(
+            "SELECT source, language, fetched_at, cue_count FROM tracks WHERE video_key = ? AND expires_at > ?",
+            (video_key, time.time()),
+        )
+        if row is None:
+            return None
+        return {"source": row[0], "language": row[1], "fetched_at": row[2], "cues": row[3]}
+
+    def has_cues(self, video_key: str) -> bool:
+        track = self.track(video_key)
+        return bool(track and track["cues"])
+
+    def load_cues(self, video_key: str) -> Optional[List[Dict]]:
+        """The whole track as caption dicts ([] for a video known to have none), or None when not stored."""
+        track = self.track(video_key)
+        if track is None:
+            self.track_misses += 1
+            return None
+        self.track_hits += 1
+        if not track["cues"]:
+            return []
+        rows = self._query_all(
+            "SELECT start, duration, text FROM cues WHERE video_key = ? ORDER BY seq", (video_key,)
+        )
+        return [{'start': start, 'duration': duration, 'text': text} for start, duration, text in rows]
+
+    def save_track(self, video_key: str, captions: List[Dict], source: Optional[str], language: Optional[str]) -> None:
+        if self._db is None:
+            return
+        ttl = self.ttl if captions else self.empty_ttl
+        if ttl <= 0:
+            return
+
+        rows = []
+        running_max = float('-inf')
+        for seq, caption in enumerate(sorted(captions, key=lambda c: float(c.get('start', 0)))):
+            start = float(caption.get('start', 0))
+            duration = float(caption.get('duration', 0))
+            end = start + duration
+            running_max = max(running_max, end)
+            rows.append((video_key, seq, start, duration, end, running_max, caption.get('text', '')))
+
+        now = time.time()
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._db.execute("DELETE FROM cues WHERE video_key = ?", (video_key,))
+                self._db.executemany(
+                    "INSERT INTO cues (video_key, seq, start, duration, end, max_end, text) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO tracks (video_key, source, language, cue_count, fetched_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (video_key, source, language, len(rows), now, now + ttl),
+                )
+                self._db.execute("COMMIT")
+            except sqlite3.Error as e:
+                logger.warning(f"[CAPTION STORE] Track write failed for {video_key}: {e}")
+                try:
+                    self._db.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+
+    def cue_at(self, video_key: str, timestamp: float, grace: float = 3.0, max_distance: float = 5.0) -> Optional[str]:
+        """
+        Same answer as CaptionIndex.covering() then nearest(): the earliest cue with
+        start <= timestamp <= end + grace, else the cue whose start is nearest (earlier
+        one on ties) and less than max_distance away.
+        """
+        self.lookups += 1
+        row = self._query_one(
+            "SELECT start, text FROM cues WHERE video_key = ? AND max_end >= ? ORDER BY max_end, seq LIMIT 1",
+            (video_key, timestamp - grace),
+        )
+        if row is not None and row[0] <= timestamp:
+            return row[1].strip()
+
+        best = None
+        best_diff = max_distance
+        left = self._query_one(
+            "SELECT start FROM cues WHERE video_key = ? AND start < ? ORDER BY start DESC LIMIT 1",
+            (video_key, timestamp),
+        )
+        if left is not None and timestamp - left[0] < best_diff:
+            # First of any cues sharing that start
+            best = self._query_one(
+                "SELECT start, text FROM cues WHERE video_key = ? AND start = ? ORDER BY seq LIMIT 1",
+                (video_key, left[0]),
+            )
+            best_diff = timestamp - left[0]
+        right = self._query_one(
+            "SELECT start, text FROM cues WHERE video_key = ? AND start >= ? ORDER BY start, seq LIMIT 1",
+            (video_key, timestamp),
+        )
+        if right is not None and right[0] - timestamp < best_diff:
+            best = right
+        return best[1].strip() if best is not None else None
+
+    def cues_in_range(self, video_key: str, start_time: float, end_time: float) -> List[Dict]:
+        """Cues whose [start, end] intersects [start_time, end_time], in start order."""
+        self.lookups += 1
+        rows = self._query_all(
+            "SELECT start, duration, text FROM cues "
+            "WHERE video_key = ? AND max_end >= ? AND start <= ? AND end >= ? ORDER BY seq",
+            (video_key, start_time, end_time, start_time),
+        )
+        return [{'start': start, 'duration': duration, 'text': text} for start, duration, text in rows]
+
+    def transcript(self, video_key: str, start_time: float, end_time: float) -> Optional[str]:
+        row = self._query_one(
+            "SELECT text FROM transcripts WHERE video_key = ? AND start = ? AND end = ? AND expires_at > ?",
+            (video_key, round(start_time, 1), round(end_time, 1), time.time()),
+        )
+        if row is None:
+            self.transcript_misses += 1
+            return None
+        self.transcript_hits += 1
+        return row[0]
+
+    def save_transcript(self, video_key: str, start_time: float, end_time: float, text: str, language: Optional[str] = None) -> None:
+        if self._db is None or not text:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO transcripts (video_key, start, end, language, text, fetched_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (video_key, round(start_time, 1), round(end_time, 1), language, text, now, now + self.ttl),
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"[CAPTION STORE] Transcript write failed for {video_key}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        row = self._query_one("SELECT COUNT(*) FROM tracks WHERE expires_at > ?", (time.time(),))
+        return {
+            "disk_enabled": self._db is not None,
+            "tracks": row[0] if row else 0,
+            "track_hits": self.track_hits,
+            "track_misses": self.track_misses,
+            "lookups": self.lookups,
+            "transcript_hits": self.transcript_hits,
+            "transcript_misses": self.transcript_misses,
+        }
+
+    def _query_one(self, sql: str, params: tuple) -> Optional[tuple]:
+        if self._db is None:
+            return None
+        with self._lock:
+            try:
+                return self._db.execute(sql, params).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"[CAPTION STORE] Read failed: {e}")
+                return None
+
+    def _query_all(self, sql: str, params: tuple) -> List[tuple]:
+        if self._db is None:
+            return []
+        with self._lock:
+            try:
+                return self._db.execute(sql, params).fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"[CAPTION STORE] Read failed: {e}")
+                return []
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from services.llm_gateway import get_llm_gateway
+
+logger = logging.getLogger(__name__)
+
+
+SYSTEM_PROMPT = "You are a knowledgeable soccer analyst helping users understand soccer tactics and plays in videos. Provide clear, concise explanations using soccer terminology. If asked about NFL analogies, use American football comparisons. Be helpful and specific about what's happening in the video."
+
+
+def format_clock(seconds: float) -> str:
+    return f"{int(seconds // 60)}:{int(seconds % 60):02d}"
+
+
+class ChatContext:
+    """
+    The per-video, question-independent part of a chat prompt, built once.
+
+    - `prefix`: system prompt plus video title/description, sent inline when no
+      context cache is in use
+    - caption lines ("At m:ss: text") formatted once for the whole transcript
+    - `cache_name`: handle of a Gemini context cache (or the gateway's local
+      stand-in) holding the prefix plus the full transcript; when set, each turn
+      only sends the question-specific suffix
+    """
+
+    def __init__(self, video_id: str, metadata: Optional[Dict[str, Any]], captions: List[Dict], captions_version: Tuple):
+        self.video_id = video_id
+        self.metadata = metadata
+        self.captions_version = captions_version
+        self.created_at = time.time()
+        self.cache_name: Optional[str] = None
+
+        self.video_title = metadata.get('title', '') if metadata else ''
+        self.video_description = metadata.get('description', '') if metadata else ''
+
+        video_info = ""
+        if metadata:
+            video_info = f"VIDEO INFORMATION:\nTitle: {self.video_title}\n"
+            if self.video_description:
+                video_info += f"Description: {self.video_description[:300]}...\n"
+        self.video_info = video_info
+        self.prefix = f"{SYSTEM_PROMPT}\n\n{video_info}" if video_info else f"{SYSTEM_PROMPT}\n\n"
+
+        self._lines: Dict[Tuple[float, str], str] = {}
+        for caption in captions:
+            line = self._format(caption)
+            if line:
+                self._lines[self._key(caption)] = line
+        self.transcript = "\n".join(self._lines.values())
+
+    def caption_lines(self, captions: List[Dict]) -> List[str]:
+        """Pre-formatted lines for captions from this video; formats others (e.g. audio transcripts) on the fly."""
+        lines = []
+        for caption in captions:
+            line = self._lines.get(self._key(caption)) or self._format(caption)
+            if line:
+                lines.append(line)
+        return lines
+
+    @staticmethod
+    def _key(caption: Dict) -> Tuple[float, str]:
+        # By content: store reads return new dicts for the same cue
+        return float(caption.get('start', 0)), caption.get('text', '')
+
+    @staticmethod
+    def _format(caption: Dict) -> Optional[str]:
+        text = caption.get('text', '').strip()
+        if not text:
+            return None
+        return f"At {format_clock(float(caption.get('start', 0)))}: {text}"
+
+
+class ChatContextStore:
+    """
+    Per-video ChatContext objects (bounded LRU, CHAT_CONTEXT_TTL seconds).
+
+    - Rebuilt when the video's caption track changes; the check uses the extractor's
+      track_version() (store fetch time and cue count), so a turn on an unchanged track
+      never loads the captions
+    - CHAT_CONTEXT_CACHE: "provider" (default) stores prefix + transcript in a
+      Gemini context cache when the transcript is at least CHAT_CONTEXT_CACHE_MIN_TOKENS;
+      "local" uses the gateway's in-memory stand-in (tests, local server); "off" disables
+    """
+
+    def __init__(self, metadata_extractor, caption_extractor, max_entries: int = 256):
+        self.metadata_extractor = metadata_extractor
+        self.caption_extractor = caption_extractor
+        self.gateway = get_llm_gateway()
+        self.max_entries = max_entries
+        self.ttl = float(os.getenv("CHAT_CONTEXT_TTL", "3600"))
+        self.cache_mode = os.getenv("CHAT_CONTEXT_CACHE", "provider")
+        self.cache_min_tokens = int(os.getenv("CHAT_CONTEXT_CACHE_MIN_TOKENS", "4096"))
+
+        self._contexts: "OrderedDict[str, ChatContext]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._tasks = set()
+
+        self.builds = 0
+        self.invalidations = 0
+        self.context_caches = 0
+
+    async def get(self, video_id: str, metadata: Optional[Dict[str, Any]] = None) -> ChatContext:
+        lock = self._locks.setdefault(video_id, asyncio.Lock())
+        async with lock:
+            captions = None
+            version = self.caption_extractor.track_version(video_id)
+            if version is None:
+                # Nothing fetched yet, or the last fetch failed; a failed fetch counts as an empty track
+                captions = await self.caption_extractor.fetch_captions(video_id)
+                version = self.caption_extractor.track_version(video_id) or ()
+
+            context = self._contexts.get(video_id)
+            if context is not None:
+                expired = time.time() - context.created_at > self.ttl
+                if context.captions_version != version or expired or (metadata and metadata != context.metadata):
+                    self.invalidations += 1
+                    self._drop(video_id)
+                    context = None
+                else:
+                    self._contexts.move_to_end(video_id)
+                    return context
+
+            if captions is None:
+                captions = await self.caption_extractor.fetch_captions(video_id)
+                version = self.caption_extractor.track_version(video_id) or ()
+
+            if not metadata:
+                metadata = await self.metadata_extractor.get_metadata(video_id)
+
+            context = ChatContext(video_id, metadata, captions, version)
+            self.builds += 1
+            await self._attach_cache(context)
+
+            self._contexts[video_id] = context
+            while len(self._contexts) > self.max_entries:
+                self._drop(next(iter(self._contexts)))
+            return context
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "contexts": len(self._contexts),
+            "builds": self.builds,
+            "invalidations": self.invalidations,
+            "context_caches_created": self.context_caches,
+            "cache_mode": self.cache_mode,
+        }
+
+    async def _attach_cache(self, context: ChatContext) -> None:
+        if self.cache_mode == "off" or not self.gateway.is_available() or not context.transcript:
+            return
+        local = self.cache_mode == "local"
+        # Rough 4 characters per token, as in the scheduler's estimate
+        if not local and (len(context.video_info) + len(context.transcript)) // 4 < self.cache_min_tokens:
+            return
+
+        context.cache_name = await self.gateway.create_context_cache(
+            SYSTEM_PROMPT,
+            [f"{context.video_info}\nFULL VIDEO TRANSCRIPT (commentary captions):\n{context.transcript}"],
+            ttl_seconds=self.ttl,
+            local=local,
+        )
+        if context.cache_name:
+            self.context_caches += 1
+
+    def _drop(self, video_id: str) -> None:
+        context = self._contexts.pop(video_id, None)
+        if context is None or not context.cache_name:
+            return
+        task = asyncio.get_running_loop().create_task(self.gateway.delete_context_cache(context.cache_name))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
@@ -1,27 +1,27 @@
 
-import os
 import re
+import os
+import time
 import asyncio
-import google.generativeai as genai
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator
+
+from services.llm_gateway import LLMError, get_llm_gateway
+from services.chat_context import ChatContext, format_clock
 
 
 class ChatService:
     
     
     def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        self.model_name = os.getenv("GEMINI_MODEL", "gemini-1.5-flash-latest")
-        self.model = None
-        
-        if self.api_key:
-            try:
-                genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel(self.model_name)
-                print(f"[CHAT] Gemini initialized")
-            except Exception as e:
-                print(f"[CHAT] Warning: Could not initialize Gemini: {e}")
-                self.model = None
+        self.gateway = get_llm_gateway()
+        self.model_name = self.gateway.default_model
+        self.model = self.model_name if self.gateway.is_available() else None
+        # Frame analysis for moments the captions don't cover: auto (no captions in window), always, off
+        self.vision_mode = os.getenv("CHAT_VISION", "auto").lower()
+        self.vision_budget = float(os.getenv("CHAT_VISION_BUDGET", "5.0"))
+        
+        if self.model:
+            print(f"[CHAT] Gemini initialized")
         else:
             print(f"[CHAT] Gemini NOT initialized - GEMINI_API_KEY not set")
     
@@ -121,19 +121,143 @@ class ChatService:
         video_metadata: Optional[Dict[str, Any]] = None,
         caption_extractor=None,
         frame_extractor=None,
-        vision_analyzer=None
+        vision_analyzer=None,
+        chat_context: Optional[ChatContext] = None
     ) -> str:
         
+        prepared = await self._prepare_chat(
+            user_message, video_id, current_time, context, video_metadata,
+            caption_extractor, frame_extractor, vision_analyzer, chat_context
+        )
+        if "reply" in prepared:
+            return prepared["reply"]
+
+        try:
+            ai_response = None
+            if prepared["cache_name"]:
+                try:
+                    ai_response = await self.gateway.generate(
+                        prepared["suffix"],
+                        call_site="chat",
+                        model=self.model_name,
+                        temperature=0.7,
+                        max_output_tokens=500,
+                        cached_content=prepared["cache_name"],
+                    )
+                except LLMError as e:
+                    print(f"[CHAT] Context cache call failed ({e}) - retrying with inline prompt")
+            if ai_response is None:
+                ai_response = await self.gateway.generate(
+                    prepared["prompt"],
+                    call_site="chat",
+                    model=self.model_name,
+                    temperature=0.7,
+                    max_output_tokens=500,
+                )
+            print(f"[CHAT] ✓ Got AI response: {ai_response[:100]}...")
+            return ai_response
+        except Exception as e:
+            print(f"[CHAT] ✗ Chat service error: {e}")
+            import traceback
+            traceback.print_exc()
+            return self._generate_stub_response(user_message, current_time, context)
+
+    async def chat_stream(
+        self,
+        user_message: str,
+        video_id: str,
+        current_time: float,
+        context: Optional[Dict[str, Any]] = None,
+        video_metadata: Optional[Dict[str, Any]] = None,
+        caption_extractor=None,
+        frame_extractor=None,
+        vision_analyzer=None,
+        chat_context: Optional[ChatContext] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of chat(). Yields {"type": "token", "text": ...} events as
+        Gemini produces them, then one {"type": "done", ...} event with the full
+        response, the resolved timestamp, the caption window used and the source
+        ("gemini", "stub" or "prompt" for replies that need no model call).
+        """
+        prepared = await self._prepare_chat(
+            user_message, video_id, current_time, context, video_metadata,
+            caption_extractor, frame_extractor, vision_analyzer, chat_context
+        )
+
+        if "reply" in prepared:
+            yield {"type": "token", "text": prepared["reply"]}
+            yield {"type": "done", "response": prepared["reply"], **prepared["metadata"]}
+            return
+
+        chunks = []
+        source = "gemini"
+        attempts = [(prepared["prompt"], None)]
+        if prepared["cache_name"]:
+            attempts.insert(0, (prepared["suffix"], prepared["cache_name"]))
+        try:
+            for i, (contents, cache_name) in enumerate(attempts):
+                try:
+                    async for text in self.gateway.generate_stream(
+                        contents,
+                        call_site="chat",
+                        model=self.model_name,
+                        temperature=0.7,
+                        max_output_tokens=500,
+                        cached_content=cache_name,
+                    ):
+                        chunks.append(text)
+                        yield {"type": "token", "text": text}
+                    break
+                except LLMError as e:
+                    # An expired or rejected context cache is retried inline, as long as nothing was sent yet
+                    if chunks or i == len(attempts) - 1:
+                        raise
+                    print(f"[CHAT] Context cache stream failed ({e}) - retrying with inline prompt")
+        except Exception as e:
+            print(f"[CHAT] ✗ Chat stream error: {e}")
+            if not chunks:
+                stub = self._generate_stub_response(user_message, current_time, context)
+                chunks = [stub]
+                source = "stub"
+                yield {"type": "token", "text": stub}
+            else:
+                source = "gemini_partial"
+
+        yield {"type": "done", "response": "".join(chunks).strip(), **prepared["metadata"], "source": source}
+
+    async def _prepare_chat(
+        self,
+        user_message: str,
+        video_id: str,
+        current_time: float,
+        context: Optional[Dict[str, Any]] = None,
+        video_metadata: Optional[Dict[str, Any]] = None,
+        caption_extractor=None,
+        frame_extractor=None,
+        vision_analyzer=None,
+        chat_context: Optional[ChatContext] = None
+    ) -> Dict[str, Any]:
+        """
+        Resolves the timestamp, gathers captions and builds the Gemini prompt.
+        Returns {"prompt", "suffix", "cache_name", "metadata"}, or {"reply", "metadata"}
+        when the answer needs no model call (stub mode, missing timestamp).
+        `prompt` is the full inline prompt; `suffix` is the per-question part to send
+        after the context cache `cache_name` when the video has one.
+        """
         if not self._is_available():
             print(f"[CHAT] Gemini not available - using stub response")
-            return self._generate_stub_response(user_message, current_time, context)
+            return {
+                "reply": self._generate_stub_response(user_message, current_time, context),
+                "metadata": {"timestamp": current_time, "caption_window": None, "captions_used": 0, "source": "stub"},
+            }
         
         print(f"[CHAT] Calling Gemini")
         
-        system_prompt = "You are a knowledgeable soccer analyst helping users understand soccer tactics and plays in videos. Provide clear, concise explanations using soccer terminology. If asked about NFL analogies, use American football comparisons. Be helpful and specific about what's happening in the video."
-
-        video_title = video_metadata.get('title', '') if video_metadata else ''
-        video_description = video_metadata.get('description', '') if video_metadata else ''
+        # Question-independent prompt parts (system prompt, video info, caption lines) are built once per video
+        if chat_context is None:
+            chat_context = ChatContext(video_id, video_metadata, [], ())
+        video_title = chat_context.video_title
         
         minutes = int(current_time // 60)
         seconds = int(current_time % 60)
@@ -142,14 +266,6 @@ class ChatService:
         user_prompt = f"USER QUESTION: {user_message}\n\nCURRENT VIDEO TIME: {timestamp_str}\n\n"
         
 
-        if video_metadata:
-            user_prompt += f"VIDEO INFORMATION:\n"
-            user_prompt += f"Title: {video_title}\n"
-            if video_description:
-                user_prompt += f"Description: {video_description[:300]}...\n"
-            user_prompt += f"\n"
-        
-
         is_generic_context = False
         if context:
             commentary = context.get('commentary', '')
@@ -204,7 +320,10 @@ class ChatService:
                 print(f"[CHAT] User asked 'now' - video is playing at {target_timestamp}s")
             else:
 
-                return "Please play the video first, then ask 'what's happening now' or 'what happened now' while the video is playing."
+                return {
+                    "reply": "Please play the video first, then ask 'what's happening now' or 'what happened now' while the video is playing.",
+                    "metadata": {"timestamp": current_time, "caption_window": None, "captions_used": 0, "source": "prompt"},
+                }
         else:
 
             if current_time > 0:
@@ -212,7 +331,10 @@ class ChatService:
                 print(f"[CHAT] No timestamp specified, using current playback time: {target_timestamp}s")
             else:
 
-                return "Please specify a timestamp (e.g., 'what happened at 23 seconds' or 'explain 1:27') or play the video and ask 'what's happening now'."
+                return {
+                    "reply": "Please specify a timestamp (e.g., 'what happened at 23 seconds' or 'explain 1:27') or play the video and ask 'what's happening now'.",
+                    "metadata": {"timestamp": current_time, "caption_window": None, "captions_used": 0, "source": "prompt"},
+                }
         
 
         minutes = int(target_timestamp // 60)
@@ -223,7 +345,7 @@ class ChatService:
 
         window_start = max(0, target_timestamp - 5)
         window_end = target_timestamp + 5
-        print(f"[CHAT] CAPTIONS-ONLY MODE: Using fast window {window_start}s - {window_end}s (skipping vision and audio for speed)")
+        print(f"[CHAT] Using caption window {window_start}s - {window_end}s")
         
         captions_in_window = []
         
@@ -246,117 +368,8 @@ class ChatService:
         
 
 
-        if False and frame_extractor and vision_analyzer:
-            try:
-                target_min = int(target_timestamp // 60)
-                target_sec = int(target_timestamp % 60)
-                target_str = f"{target_min}:{target_sec:02d}"
-                
-                start_min = int(window_start // 60)
-                start_sec = int(window_start % 60)
-                end_min = int(window_end // 60)
-                end_sec = int(window_end % 60)
-                window_str = f"{start_min}:{start_sec:02d} - {end_min}:{end_sec:02d}"
-                
-                print(f"[CHAT] Analyzing optimized window around {target_str} ({window_str})...")
-                
-
-
-
-                frame_times = [
-                    max(0, target_timestamp - 2),
-                    max(0, target_timestamp - 1),
-                    target_timestamp,
-                    target_timestamp + 1,
-                    target_timestamp + 2,
-                    target_timestamp + 3,
-                    target_timestamp + 4,
-                    target_timestamp + 5,
-                    target_timestamp + 6,
-                    target_timestamp + 7
-                ]
-                
-
-                async def extract_single_frame(t):
-                    try:
-                        frame = await asyncio.wait_for(
-                            frame_extractor.extract_frame(video_id, t),
-                            timeout=8.0
-                        )
-                        return (t, frame) if frame else (t, None)
-                    except asyncio.TimeoutError:
-                        print(f"[CHAT] ✗ Frame extraction timeout at {t}s")
-                        return (t, None)
-                    except Exception as e:
-                        print(f"[CHAT] ✗ Frame extraction error at {t}s: {e}")
-                        return (t, None)
-                
-                frame_results = await asyncio.gather(*[extract_single_frame(t) for t in frame_times])
-                frames = [(t, f) for t, f in frame_results if f]
-                frames.sort(key=lambda x: x[0])
-                print(f"[CHAT] ✓ Extracted {len(frames)}/10 frames (GOAL-DETECTION MODE: 2s before + 7s after, 2 frames before + target + 7 frames after - focusing on AFTER frames)")
-                
-                if frames:
-                    print(f"[CHAT] ✓ Extracted {len(frames)} frames, analyzing with Vision AI in parallel...")
-                    
-
-                    async def analyze_single_frame(frame_time: float, frame_base64: str) -> Optional[str]:
-                        frame_min = int(frame_time // 60)
-                        frame_sec = int(frame_time % 60)
-                        frame_str = f"{frame_min}:{frame_sec:02d}"
-                        vision_context = f"Video title: {video_title}. Analyzing frame at {frame_str} (part of sequence from {window_str})."
-                        try:
-                            print(f"[CHAT] Analyzing frame at {frame_str}...")
-
-                            analysis = await asyncio.wait_for(
-                                vision_analyzer.analyze_frame(frame_base64, context=vision_context),
-                                timeout=10.0
-                            )
-                            if analysis and analysis.strip():
-                                print(f"[CHAT] ✓ Frame {frame_str} analyzed: {analysis[:60]}...")
-                                return f"At {frame_str}: {analysis}"
-                            else:
-                                print(f"[CHAT] ✗ Frame {frame_str} returned empty analysis")
-                        except asyncio.TimeoutError:
-                            print(f"[CHAT] ✗ Frame {frame_str} analysis timeout (10s)")
-                            return None
-                        except Exception as e:
-                            print(f"[CHAT] ✗ Error analyzing frame at {frame_str}: {e}")
-                            import traceback
-                            traceback.print_exc()
-                        return None
-                    
-
-
-                    analysis_results = []
-                    
-                    print(f"[CHAT] Starting SEQUENTIAL analysis of {len(frames)} frames (1 at a time with 10s delays to avoid rate limits)...")
-                    for idx, (frame_time, frame_base64) in enumerate(frames):
-                        result = await analyze_single_frame(frame_time, frame_base64)
-                        analysis_results.append(result)
-                        
-
-
-
-                        if idx < len(frames) - 1:
-                            await asyncio.sleep(10.0)
-                    
-
-                    analyses = [
-                        result for result in analysis_results
-                        if result and not isinstance(result, Exception)
-                    ]
-                    
-                    if analyses:
-                        visual_analysis = "\n".join(analyses)
-                        print(f"[CHAT] ✓ Vision AI successfully analyzed {len(analyses)}/{len(frames)} frames")
-                    else:
-                        print(f"[CHAT] ✗ WARNING: No frames were successfully analyzed! All {len(frames)} frames failed.")
-                        visual_analysis = None
-            except Exception as e:
-                print(f"[CHAT] Could not extract/analyze frames: {e}")
-                import traceback
-                traceback.print_exc()
+        if frame_extractor and vision_analyzer and (self.vision_mode == "always" or (self.vision_mode == "auto" and not captions_in_window)):
+            visual_analysis = await self._analyze_frames(video_id, target_timestamp, frame_extractor, vision_analyzer)
         
 
 
@@ -372,14 +385,7 @@ class ChatService:
         window_str = f"{window_start_min}:{window_start_sec:02d} - {window_end_min}:{window_end_sec:02d}"
         
         if captions_in_window:
-            caption_texts = []
-            for cap in captions_in_window:
-                cap_start = float(cap.get('start', 0))
-                cap_min = int(cap_start // 60)
-                cap_sec = int(cap_start % 60)
-                cap_text = cap.get('text', '').strip()
-                if cap_text:
-                    caption_texts.append(f"At {cap_min}:{cap_sec:02d}: {cap_text}")
+            caption_texts = chat_context.caption_lines(captions_in_window)
             
             if caption_texts:
                 user_prompt += f"USER IS ASKING ABOUT TIMESTAMP {target_str} (analyzing captions from {window_str} - 5 seconds before and 5 seconds after):\n\n"
@@ -396,33 +402,14 @@ class ChatService:
         else:
             user_prompt += f"USER IS ASKING ABOUT TIMESTAMP {target_str}:\n\n"
             user_prompt += "No captions available for this timestamp. Answer based on video metadata and context provided.\n\n"
-        
-
 
-        if False and not visual_analysis and captions_in_window:
-            try:
-                target_min = int(target_timestamp // 60)
-                target_sec = int(target_timestamp % 60)
-                target_str = f"{target_min}:{target_sec:02d}"
-                
-                caption_texts = []
-                for cap in captions_in_window:
-                    cap_start = float(cap.get('start', 0))
-                    cap_min = int(cap_start // 60)
-                    cap_sec = int(cap_start % 60)
-                    cap_text = cap.get('text', '').strip()
-                    if cap_text:
-                        caption_texts.append(f"At {cap_min}:{cap_sec:02d}: {cap_text}")
-                
-                if caption_texts:
-                    user_prompt += f"USER IS ASKING ABOUT TIMESTAMP {target_str} (analyzing window: 2s before + 7s after = {window_str}, focusing on AFTER frames for goal detection):\n"
-                    user_prompt += f"VIDEO CAPTIONS/COMMENTARY:\n" + "\n".join(caption_texts) + "\n"
-                    user_prompt += "This is what the commentators said during this time period. Use this to answer the question.\n\n"
-                    print(f"[CHAT] Using captions for {target_str}: {len(caption_texts)} captions found")
-            except Exception as e:
-                print(f"[CHAT] Could not format captions: {e}")
+        if visual_analysis:
+            user_prompt += "=== VISUAL ANALYSIS OF THE VIDEO FRAMES ===\n"
+            user_prompt += visual_analysis + "\n"
+            user_prompt += f"This describes the broadcast frames around {target_str}. Use it as a source alongside any captions.\n\n"
         
 
+
         if context and context.get('caption'):
             user_prompt += f"CURRENT VIDEO CAPTION/COMMENTARY AT {timestamp_str}: {context['caption']}\n"
             user_prompt += "This is the actual commentary from the video at the current playback time.\n\n"
@@ -457,6 +444,11 @@ class ChatService:
                         user_prompt += f"The video is titled '{video_title}' - use this for team names and context. "
                     user_prompt += "Be SPECIFIC - mention goals, shots, saves, player actions, and key moments mentioned in the captions. "
                     user_prompt += "If captions mention 'GOAL', 'scored', 'celebrates', or similar, state it clearly!"
+                elif visual_analysis:
+                    user_prompt += "Use the VISUAL ANALYSIS provided above as your PRIMARY source - it describes what the frames show. "
+                    if video_title:
+                        user_prompt += f"The video is titled '{video_title}' - use this for team names and context. "
+                    user_prompt += "Be SPECIFIC about the action it describes, without inventing details it doesn't mention."
                 else:
                     user_prompt += "Answer based on the video metadata and context provided. "
                     if video_title:
@@ -481,30 +473,54 @@ class ChatService:
 
         
 
+        return {
+            "prompt": f"{chat_context.prefix}\n{user_prompt}",
+            "suffix": user_prompt,
+            "cache_name": chat_context.cache_name,
+            "metadata": {
+                "timestamp": target_timestamp,
+                "caption_window": [window_start, window_end],
+                "captions_used": len(captions_in_window),
+                "vision_used": visual_analysis is not None,
+                "source": "gemini",
+            },
+        }
+    
+    async def _analyze_frames(self, video_id: str, target_timestamp: float, frame_service, vision_analyzer) -> Optional[str]:
+        """
+        Pulls one frame window (2s before to 3s after the moment) through the frame
+        window service and describes it with a single multi-image vision call. The
+        window analysis cache is shared with live commentary, so moments that were
+        already watched are answered without a Gemini call. Returns None when the
+        CHAT_VISION_BUDGET runs out or nothing could be extracted.
+        """
+        deadline = time.monotonic() + self.vision_budget
         try:
-            full_prompt = f"{system_prompt}\n\n{user_prompt}"
-            
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: self.model.generate_content(
-                    full_prompt,
-                    generation_config={
-                        "temperature": 0.7,
-                        "max_output_tokens": 500,
-                    }
-                )
+            frames, timestamps = await asyncio.wait_for(
+                frame_service.get_frame_window(video_id, target_timestamp + 3.0, window_size=5.0),
+                timeout=self.vision_budget,
             )
-            
-            ai_response = response.text.strip()
-            print(f"[CHAT] ✓ Got AI response: {ai_response[:100]}...")
-            return ai_response
+            if not frames:
+                print(f"[CHAT] No frames extracted around {target_timestamp}s")
+                return None
+
+            analysis = await asyncio.wait_for(
+                vision_analyzer.analyze_frame_window(frames, timestamps, deadline=deadline, call_site="chat_vision"),
+                timeout=max(0.1, deadline - time.monotonic()),
+            )
+        except asyncio.TimeoutError:
+            print(f"[CHAT] Frame analysis exceeded the {self.vision_budget:.0f}s budget - answering without it")
+            return None
         except Exception as e:
-            print(f"[CHAT] ✗ Chat service error: {e}")
-            import traceback
-            traceback.print_exc()
-            return self._generate_stub_response(user_message, current_time, context)
-    
+            print(f"[CHAT] Could not extract/analyze frames: {e}")
+            return None
+
+        if not analysis or not analysis.strip():
+            return None
+        span = f"{format_clock(timestamps[0])} - {format_clock(timestamps[-1])}"
+        print(f"[CHAT] ✓ Analyzed {len(frames)} frames ({span}): {analysis[:60]}...")
+        return f"Frames {span}: {analysis.strip()}"
+
     def _generate_stub_response(self, user_message: str, current_time: float, context: Optional[Dict[str, Any]] = None) -> str:
         
         print(f"[CHAT] Generating stub response (Gemini not available)")
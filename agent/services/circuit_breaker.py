@@ -0,0 +1,138 @@
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Per-upstream circuit breaker (Gemini text, Gemini vision, ElevenLabs, YouTube).
+
+    - closed: calls go through; outcomes are kept for the last CIRCUIT_WINDOW seconds
+    - opens when the window holds at least CIRCUIT_MIN_CALLS calls with an error rate of
+      CIRCUIT_ERROR_RATE or more, or after CIRCUIT_CONSECUTIVE_FAILURES failures in a row
+    - open: allow() is False for CIRCUIT_OPEN_SECONDS (doubling on each failed probe),
+      so callers go straight to their fallback
+    - half-open: one probe call at a time; a success closes the circuit
+    - release(): the call ended without an answer from the upstream (the caller gave up or
+      the request was dropped before it was sent); counts as neither outcome
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str):
+        self.name = name
+        self.window = float(os.getenv("CIRCUIT_WINDOW", "60"))
+        self.min_calls = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+        self.error_rate = float(os.getenv("CIRCUIT_ERROR_RATE", "0.5"))
+        self.consecutive_threshold = int(os.getenv("CIRCUIT_CONSECUTIVE_FAILURES", "5"))
+        self.base_open_seconds = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+
+        self.state = self.CLOSED
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._consecutive_failures = 0
+        self._open_seconds = self.base_open_seconds
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+
+        self.short_circuited = 0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """Returns False when the caller should skip the upstream and use its fallback."""
+        now = time.monotonic()
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN:
+            if now - self._opened_at < self._open_seconds:
+                self.short_circuited += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_started = None
+
+        # Half-open: admit one probe; a probe that never reports back frees the slot after a while
+        if self._probe_started is None or now - self._probe_started > self.base_open_seconds:
+            self._probe_started = now
+            return True
+        self.short_circuited += 1
+        return False
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            # Start the window fresh so the outage's failures don't reopen it at once
+            self._outcomes.clear()
+            logger.info(f"[CIRCUIT] {self.name} closed")
+        self.state = self.CLOSED
+        self._consecutive_failures = 0
+        self._open_seconds = self.base_open_seconds
+        self._probe_started = None
+        self._record(True)
+
+    def release(self) -> None:
+        if self.state == self.HALF_OPEN:
+            self._probe_started = None
+
+    def record_failure(self) -> None:
+        self._consecutive_failures += 1
+        self._record(False)
+
+        if self.state == self.HALF_OPEN:
+            self._open(min(600.0, self._open_seconds * 2))
+            return
+
+        if self.state == self.CLOSED:
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            calls = len(self._outcomes)
+            if self._consecutive_failures >= self.consecutive_threshold or (
+                calls >= self.min_calls and failures / calls >= self.error_rate
+            ):
+                self._open(self.base_open_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        self._trim(time.monotonic())
+        calls = len(self._outcomes)
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        return {
+            "state": self.state,
+            "window_calls": calls,
+            "window_error_rate": round(failures / calls, 3) if calls else 0.0,
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited,
+        }
+
+    def _open(self, seconds: float) -> None:
+        self.state = self.OPEN
+        self._open_seconds = seconds
+        self._opened_at = time.monotonic()
+        self._probe_started = None
+        self.times_opened += 1
+        logger.warning(f"[CIRCUIT] {self.name} open for {seconds:.0f}s")
+
+    def _record(self, ok: bool) -> None:
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def circuit_stats() -> Dict[str, Any]:
+    return {name: breaker.stats() for name, breaker in _breakers.items()}
@@ -9,16 +9,18 @@ logger = logging.getLogger(__name__)
 
 class CommentaryOrchestrator:
     
-    def __init__(self):
+    def __init__(self, ball_tracker=None):
         self.frame_service = FrameWindowService()
         self.vision_analyzer = GeminiVisionAnalyzer()
+        self.ball_tracker = ball_tracker
         self.deduplicators: Dict[str, CommentaryDeduplicator] = {}
     
     async def generate_live_commentary(
         self,
         video_url: str,
         current_time: float,
-        window_size: float = 5.0
+        window_size: float = 5.0,
+        deadline: Optional[float] = None
     ) -> Dict[str, Any]:
         try:
             video_id = self._get_video_id(video_url)
@@ -48,8 +50,18 @@ class CommentaryOrchestrator:
             
             logger.info(f"[ORCHESTRATOR] ✓ Extracted {len(frames)} frames")
             
+            tracking_context = None
+            if self.ball_tracker:
+                try:
+                    trajectory = await self.ball_tracker.track_ball(frames, timestamps, deadline=deadline)
+                    tracking_context = self.ball_tracker.ball_filter.describe(trajectory)
+                    if tracking_context:
+                        logger.info(f"[ORCHESTRATOR] ✓ {tracking_context}")
+                except Exception as e:
+                    logger.warning(f"[ORCHESTRATOR] Ball tracking failed: {e}")
+            
             logger.info("[ORCHESTRATOR] Analyzing with Gemini Vision...")
-            commentary = await self.vision_analyzer.analyze_frame_window(frames, timestamps)
+            commentary = await self.vision_analyzer.analyze_frame_window(frames, timestamps, context=tracking_context, deadline=deadline)
 
             if not commentary or len(commentary.strip()) < 5:
                 raise RuntimeError("Gemini Vision returned empty/invalid commentary")
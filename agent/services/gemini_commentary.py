@@ -1,27 +1,20 @@
-import os
-import google.generativeai as genai
 from typing import Optional
-import asyncio
 import logging
 
+from services.llm_gateway import get_llm_gateway
+
 logger = logging.getLogger(__name__)
 
 
 class GeminiCommentaryEnhancer:
     
     def __init__(self, api_key: Optional[str] = None):
-        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
-        self.model_name = os.getenv("GEMINI_MODEL", "gemini-1.5-flash-latest")
-        self.model = None
+        self.gateway = get_llm_gateway()
+        self.model_name = self.gateway.default_model
+        self.model = self.model_name if self.gateway.is_available() else None
         
-        if self.api_key:
-            try:
-                genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel(self.model_name)
-                logger.info("[GEMINI COMMENTARY] Initialized with gemini-1.5-flash-latest")
-            except Exception as e:
-                logger.error(f"[GEMINI COMMENTARY] Failed to initialize: {e}")
-                self.model = None
+        if self.model:
+            logger.info(f"[GEMINI COMMENTARY] Initialized with {self.model_name}")
         else:
             logger.warning("[GEMINI COMMENTARY] No API key provided - will use stub responses")
     
@@ -54,20 +47,14 @@ Instructions:
 Enhanced Commentary:
 """
 
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: self.model.generate_content(
-                    prompt,
-                    generation_config={
-                        "temperature": 0.7,
-                        "max_output_tokens": 100,
-                    }
-                )
+            commentary = await self.gateway.generate(
+                prompt,
+                call_site="commentary_enhance",
+                model=self.model_name,
+                temperature=0.7,
+                max_output_tokens=100,
             )
             
-            commentary = response.text.strip()
-            
             commentary = commentary.strip('"').strip("'").strip()
             
             logger.info(f"[GEMINI COMMENTARY] Enhanced: {commentary[:60]}...")
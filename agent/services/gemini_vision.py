@@ -1,61 +1,130 @@
-import os
 import base64
-import asyncio
-from typing import List, Optional
+import os
+from typing import Any, List, Optional, Tuple
 
-from google import genai
-from google.genai import types
+from utils.image_processor import compress_image, encode_mosaic
+from utils.perceptual_hash import dhash_base64
+from services.perceptual_cache import PerceptualCache
+from services.llm_gateway import LLMGateway, get_llm_gateway
+from services.vision_batcher import VisionBatcher
+from services.usage_tracker import get_usage_tracker
 
-from utils.image_processor import compress_image
+
+WINDOW_INSTRUCTIONS = (
+    "Describe what's happening in the play.\n"
+    "Mention ball location and main action (press, pass, shot, save, tackle, cross, set piece).\n"
+    "Do not invent player names.\n\n"
+    "Return 1–2 sentences, max 35 words."
+)
 
 
 class GeminiVisionAnalyzer:
+    """
+    Describes short frame windows for live commentary and chat.
+
+    - VISION_WINDOW_ENCODING=parts (default): one JPEG part per frame, up to 512 px
+    - VISION_WINDOW_ENCODING=mosaic: the window is tiled into one labelled 2-column
+      grid image (VISION_MOSAIC_TILE px per tile, VISION_MOSAIC_QUALITY), so a window
+      costs one image part; compare both with benchmarks.vision_window_encoding
+    """
+
+    ENCODINGS = ("parts", "mosaic")
+
     def __init__(self, api_key: Optional[str] = None):
-        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
-        self.model_name = (os.getenv("GEMINI_MODEL") or "gemini-2.0-flash").strip()
-        self.client = genai.Client(api_key=self.api_key) if self.api_key else None
+        self.gateway = get_llm_gateway()
+        self.model_name = self.gateway.default_model
+        self.window_cache = PerceptualCache("vision_window")
+        self.batcher = VisionBatcher(self.gateway, WINDOW_INSTRUCTIONS)
+        self.usage = get_usage_tracker()
+        self.encoding = os.getenv("VISION_WINDOW_ENCODING", "parts").lower()
+        if self.encoding not in self.ENCODINGS:
+            self.encoding = "parts"
+        self.mosaic_tile = int(os.getenv("VISION_MOSAIC_TILE", "384"))
+        self.mosaic_quality = int(os.getenv("VISION_MOSAIC_QUALITY", "60"))
 
-    async def analyze_frame_window(self, frames: List[str], timestamps: List[float]) -> str:
-        if not self.client:
+    async def analyze_frame_window(
+        self,
+        frames: List[str],
+        timestamps: List[float],
+        context: Optional[str] = None,
+        deadline: Optional[float] = None,
+        call_site: Optional[str] = None,
+    ) -> str:
+        """
+        Live windows go through the batcher as `live_vision`; another `call_site` (e.g.
+        chat_vision) is sent on its own so it keeps its own priority class and accounting.
+        """
+        if not self.gateway.is_available():
             raise RuntimeError("Gemini Vision not initialized. Set GEMINI_API_KEY.")
 
         pairs = list(zip(timestamps, frames))[:4]
-        parts = []
 
-        ts_list = []
-        for ts, b64 in pairs:
-            compressed = compress_image(b64, max_size=512, quality=55)
-            img_bytes = base64.b64decode(compressed)
-            ts_list.append(f"{ts:.1f}s")
-            parts.append(types.Part.from_bytes(data=img_bytes, mime_type="image/jpeg"))
+        # Replays and repeated polls produce near-identical windows at other timestamps.
+        # Tracking context is derived from the same frames, so the frames alone are the key.
+        window_hashes = tuple(dhash_base64(b64) for _, b64 in pairs)
+        if None in window_hashes:
+            window_hashes = ()
+        call_site = call_site or self.batcher.call_site
+        cached = self.window_cache.get(window_hashes)
+        if cached:
+            self.usage.record("vision", call_site, cache="hit")
+            return cached
 
-        ts_line = ", ".join(ts_list)
+        budget = self.usage.over_budget()
+        if budget:
+            self.usage.record_downgrade("vision_prompt")
+        prompt, description, parts = self.build_window_request(pairs, context, budget=budget)
 
-        prompt = (
-            "You are analyzing a soccer broadcast using a short sequence of frames.\n"
-            f"Frame timestamps: {ts_line}\n\n"
-            "Describe what's happening in the play.\n"
-            "Mention ball location and main action (press, pass, shot, save, tackle, cross, set piece).\n"
-            "Do not invent player names.\n\n"
-            "Return 1–2 sentences, max 35 words."
-        )
+        try:
+            if call_site == self.batcher.call_site:
+                # Concurrent windows from other viewers may share this Gemini call
+                text = await self.batcher.submit(prompt, description, parts, deadline=deadline)
+            else:
+                text = await self.gateway.generate([prompt, *parts], call_site=call_site, deadline=deadline)
+        except Exception as e:
+            raise RuntimeError(f"Gemini vision failed: {e}")
 
-        contents = [prompt, *parts]
+        self.window_cache.set(window_hashes, text)
+        return text
 
-        loop = asyncio.get_event_loop()
-        model_try = [self.model_name, "gemini-2.0-flash", "gemini-1.5-pro"]
+    def build_window_request(
+        self,
+        pairs: List[Tuple[float, str]],
+        context: Optional[str] = None,
+        encoding: Optional[str] = None,
+        budget: bool = False,
+    ) -> Tuple[str, str, List[Any]]:
+        """
+        Returns (prompt, per-clip description, image parts) for (timestamp, base64 frame)
+        pairs. `budget` sends smaller, lower-quality images (endpoint over its token budget).
+        """
+        encoding = encoding or self.encoding
+        ts_line = ", ".join(f"{ts:.1f}s" for ts, _ in pairs)
+        tracking_line = f"Tracking data (local detector, pixel coordinates): {context}\n" if context else ""
 
-        last_err = None
-        for m in model_try:
-            try:
-                resp = await loop.run_in_executor(
-                    None, lambda: self.client.models.generate_content(model=m, contents=contents)
+        parts: List[Any] = []
+        layout_line = ""
+        if encoding == "mosaic":
+            tile = self.mosaic_tile * 3 // 4 if budget else self.mosaic_tile
+            labels = [f"{i + 1} @ {ts:.1f}s" for i, (ts, _) in enumerate(pairs)]
+            mosaic = encode_mosaic([b64 for _, b64 in pairs], labels, tile_size=tile, quality=self.mosaic_quality)
+            if mosaic:
+                parts = [LLMGateway.image_part(mosaic)]
+                layout_line = (
+                    "The frames are tiled into one image in time order (left to right, top to bottom), "
+                    "each labelled with its number and timestamp"
+                    f"{'; tracking coordinates refer to the original full frames' if context else ''}.\n"
                 )
-                text = (getattr(resp, "text", "") or "").strip()
-                if not text:
-                    raise RuntimeError("Empty Gemini vision response.")
-                return text
-            except Exception as e:
-                last_err = e
-
-        raise RuntimeError(f"Gemini vision failed: {last_err}")
+
+        if not parts:
+            max_size, quality = (384, 45) if budget else (512, 55)
+            for _, b64 in pairs:
+                parts.append(LLMGateway.image_part(base64.b64decode(compress_image(b64, max_size=max_size, quality=quality))))
+
+        description = f"Frame timestamps: {ts_line}\n{layout_line}{tracking_line}"
+        prompt = (
+            "You are analyzing a soccer broadcast using a short sequence of frames.\n"
+            f"{description}\n"
+            f"{WINDOW_INSTRUCTIONS}"
+        )
+        return prompt, description, parts
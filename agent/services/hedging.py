@@ -0,0 +1,74 @@
+import os
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+
+class HedgePolicy:
+    """
+    Decides when a duplicate ("hedged") Gemini request may be fired.
+
+    - Trigger: the observed p90 latency of the call site (recent successful attempts)
+    - Only call sites in LLM_HEDGE_CALL_SITES hedge, and only after LLM_HEDGE_MIN_SAMPLES
+    - Budget per call site: every request earns LLM_HEDGE_RATIO (LLM_HEDGE_RATIO_<CALL_SITE>
+      overrides) of a hedge, so hedging adds at most that fraction of extra load
+    """
+
+    WINDOW = 200
+    MAX_CREDIT = 3.0
+
+    def __init__(self):
+        self.call_sites = {
+            s.strip() for s in os.getenv("LLM_HEDGE_CALL_SITES", "live_vision,chat_vision,commentary_enhance,chat").split(",") if s.strip()
+        }
+        self.default_ratio = float(os.getenv("LLM_HEDGE_RATIO", "0.1"))
+        self.min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._credit: Dict[str, float] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def ratio_for(self, call_site: str) -> float:
+        override = os.getenv(f"LLM_HEDGE_RATIO_{call_site.upper()}")
+        if override is not None:
+            return float(override)
+        return self.default_ratio if call_site in self.call_sites else 0.0
+
+    def observe(self, call_site: str, latency: float) -> None:
+        self._latencies.setdefault(call_site, deque(maxlen=self.WINDOW)).append(latency)
+
+    def delay_for(self, call_site: str) -> Optional[float]:
+        """
+        Returns how long to wait for the first attempt before hedging, or None when
+        this request may not hedge. Also credits the call site's hedge budget.
+        """
+        ratio = self.ratio_for(call_site)
+        if ratio <= 0:
+            return None
+        self._credit[call_site] = min(self.MAX_CREDIT, self._credit.get(call_site, 0.0) + ratio)
+        self._stats.setdefault(call_site, {"requests": 0, "hedged": 0, "hedge_wins": 0})["requests"] += 1
+
+        samples = self._latencies.get(call_site)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[int(0.9 * (len(ordered) - 1))]
+
+    def try_spend(self, call_site: str) -> bool:
+        if self._credit.get(call_site, 0.0) < 1.0:
+            return False
+        self._credit[call_site] -= 1.0
+        self._stats[call_site]["hedged"] += 1
+        return True
+
+    def record_win(self, call_site: str) -> None:
+        self._stats[call_site]["hedge_wins"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        result = {}
+        for call_site, s in self._stats.items():
+            samples = sorted(self._latencies.get(call_site, ()))
+            result[call_site] = {
+                **s,
+                "p90_ms": round(samples[int(0.9 * (len(samples) - 1))] * 1000.0) if samples else None,
+            }
+        return result
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache for LLM responses.
+
+    - Key: (model, whitespace-normalized prompt text, SHA-256 of every image/audio
+      part, generation config)
+    - In-memory LRU in front of a SQLite file that survives restarts and is
+      shared by every worker on the host
+    - TTL per call site (LLM_CACHE_TTL_<CALL_SITE> overrides, 0 disables)
+    """
+
+    DEFAULT_TTLS = {
+        "analogy": 7 * 24 * 3600,
+        "nfl_analogy": 7 * 24 * 3600,
+        "nfl_broadcast": 7 * 24 * 3600,
+        "audio_transcription": 7 * 24 * 3600,
+        "commentary_enhance": 24 * 3600,
+        "analyze_vision": 24 * 3600,
+        "live_vision": 600,
+        "chat_vision": 600,
+        # "chat" is not cached: answers are sampled at temperature 0.7 and depend on the
+        # conversation, so a cached reply would be frozen and could reach another session
+    }
+
+    def __init__(self, path: Optional[str] = None, memory_entries: Optional[int] = None):
+        self.path = path if path is not None else os.getenv("LLM_CACHE_PATH", ".cache/llm_responses.sqlite3")
+        self.memory_entries = memory_entries or int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "2000"))
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+        if self.path:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, call_site TEXT, model TEXT, response TEXT, "
+                    "created_at REAL, expires_at REAL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS responses_expiry ON responses (expires_at)")
+                self._db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            except Exception as e:
+                logger.warning(f"[LLM CACHE] Disk tier disabled ({self.path}): {e}")
+                self._db = None
+
+    def ttl_for(self, call_site: str) -> float:
+        override = os.getenv(f"LLM_CACHE_TTL_{call_site.upper()}")
+        if override is not None:
+            return float(override)
+        return float(self.DEFAULT_TTLS.get(call_site, 0))
+
+    @staticmethod
+    def make_key(model: str, contents: Any, config: Dict[str, Any]) -> str:
+        digest = hashlib.sha256()
+        digest.update(model.encode("utf-8"))
+        for item in contents if isinstance(contents, list) else [contents]:
+            if isinstance(item, str):
+                digest.update(b"T")
+                digest.update(re.sub(r"\s+", " ", item).strip().encode("utf-8"))
+            else:
+                inline = getattr(item, "inline_data", None)
+                data = getattr(inline, "data", None)
+                mime_type = getattr(inline, "mime_type", None) or ""
+                digest.update(b"M")
+                digest.update(mime_type.encode("utf-8"))
+                digest.update(hashlib.sha256(data).digest() if data else repr(item).encode("utf-8"))
+        digest.update(json.dumps(config, sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str, call_site: str) -> Optional[str]:
+        now = time.time()
+        stats = self._stats.setdefault(call_site, {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, text = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    stats["memory_hits"] += 1
+                    return text
+                del self._memory[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT response, expires_at FROM responses WHERE key = ? AND expires_at > ?",
+                        (key, now),
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning(f"[LLM CACHE] Disk read failed: {e}")
+                    row = None
+                if row:
+                    self._remember(key, row[1], row[0])
+                    stats["disk_hits"] += 1
+                    return row[0]
+
+        stats["misses"] += 1
+        return None
+
+    def set(self, key: str, call_site: str, model: str, text: str) -> None:
+        ttl = self.ttl_for(call_site)
+        if ttl <= 0 or not text:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._remember(key, now + ttl, text)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO responses (key, call_site, model, response, created_at, expires_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, call_site, model, text, now, now + ttl),
+                    )
+                except sqlite3.Error as e:
+                    logger.warning(f"[LLM CACHE] Disk write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        per_site = {}
+        for call_site, s in self._stats.items():
+            hits = s["memory_hits"] + s["disk_hits"]
+            total = hits + s["misses"]
+            per_site[call_site] = {**s, "hit_rate": round(hits / total, 3) if total else 0.0}
+        return {"memory_entries": len(self._memory), "disk_enabled": self._db is not None, "call_sites": per_site}
+
+    def _remember(self, key: str, expires_at: float, text: str) -> None:
+        self._memory[key] = (expires_at, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
@@ -0,0 +1,593 @@
+import asyncio
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+import logging
+
+from google import genai
+from google.genai import types
+
+from services.rate_limiter import DeadlineExceeded, GeminiScheduler
+from services.llm_cache import LLMResponseCache
+from services.model_router import ModelRouter
+from services.hedging import HedgePolicy
+from services.circuit_breaker import get_circuit_breaker
+from services.usage_tracker import get_usage_tracker
+from utils.standin import standin_base_url
+
+logger = logging.getLogger(__name__)
+
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+LOCAL_CONTEXT_PREFIX = "local-context/"
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+class LLMGateway:
+    """
+    Single entry point for every Gemini call in the agent.
+
+    - One configuration point: GEMINI_API_KEY, GEMINI_MODEL, LLM_TIMEOUT, LLM_MAX_RETRIES;
+      GEMINI_API_KEY=standin[:<url>] points the client at the local stand-in server
+    - One shared google-genai client, so every service reuses the same pooled
+      keep-alive HTTP connections
+    - Native async calls (client.aio) instead of blocking calls on executor threads
+    - Per-attempt timeout, retries with jittered backoff on transient errors
+    - Fallback models are ordered by the shared ModelRouter, which skips models
+      that are cooling down after 404/429/repeated errors
+    - Slow attempts on latency-sensitive call sites are hedged once the call site's
+      p90 has passed (HedgePolicy); the first answer wins
+    - Every attempt is admitted by the shared GeminiScheduler (rate limits + priorities)
+    - Separate circuit breakers for text and vision calls; while one is open calls
+      fail immediately so callers drop straight to their stubs
+    - Context caches for long static prompt prefixes: Gemini cached content, or an
+      in-memory stand-in with the same handle-based interface
+    - Responses are cached per call site in LLMResponseCache (memory + SQLite)
+    - Every upstream attempt and cache hit is recorded in the UsageTracker; endpoints
+      over their token budget are routed to GEMINI_BUDGET_MODEL first
+    """
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self.default_model = (os.getenv("GEMINI_MODEL") or "gemini-2.0-flash").strip()
+        self.timeout = float(os.getenv("LLM_TIMEOUT", "20.0"))
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "2"))
+        self.scheduler = GeminiScheduler()
+        self.cache = LLMResponseCache()
+        self.router = ModelRouter(prober=self._probe)
+        self.hedging = HedgePolicy()
+        self.usage = get_usage_tracker()
+        self.budget_model = (os.getenv("GEMINI_BUDGET_MODEL") or "gemini-2.0-flash-lite").strip()
+        # context cache handle -> (model, expires_at); local handles also keep their contents
+        self._context_caches: Dict[str, tuple] = {}
+        self._local_contexts: Dict[str, tuple] = {}
+        self.client = None
+
+        if self.api_key:
+            try:
+                base_url = standin_base_url(self.api_key)
+                http_options = types.HttpOptions(timeout=int(self.timeout * 1000))
+                if base_url:
+                    http_options = types.HttpOptions(timeout=int(self.timeout * 1000), base_url=base_url)
+                    logger.info(f"[LLM] Using Gemini stand-in at {base_url}")
+                self.client = genai.Client(api_key=self.api_key, http_options=http_options)
+                logger.info(f"[LLM] Gemini gateway initialized (default model: {self.default_model})")
+            except Exception as e:
+                logger.error(f"[LLM] Could not initialize Gemini client: {e}")
+                self.client = None
+        else:
+            logger.warning("[LLM] GEMINI_API_KEY not set - Gemini calls disabled")
+
+    def is_available(self) -> bool:
+        return self.client is not None
+
+    @staticmethod
+    def image_part(data: bytes, mime_type: str = "image/jpeg") -> types.Part:
+        return types.Part.from_bytes(data=data, mime_type=mime_type)
+
+    @staticmethod
+    def audio_part(data: bytes, mime_type: str = "audio/wav") -> types.Part:
+        return types.Part.from_bytes(data=data, mime_type=mime_type)
+
+    async def generate(
+        self,
+        contents: Any,
+        *,
+        call_site: str = "default",
+        model: Optional[str] = None,
+        models: Optional[List[str]] = None,
+        temperature: Optional[float] = None,
+        max_output_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        priority: Optional[str] = None,
+        deadline: Optional[float] = None,
+        cache: bool = True,
+        response_mime_type: Optional[str] = None,
+        response_schema: Optional[Dict[str, Any]] = None,
+        cached_content: Optional[str] = None,
+    ) -> str:
+        """
+        Generates text and returns it stripped. `models` is an explicit preference
+        list; when omitted `model` (or the default model) is preferred and
+        GEMINI_FALLBACK_MODELS follow. The router decides the actual order. `priority` overrides
+        the scheduler class derived from `call_site`; `deadline` is an absolute
+        time.monotonic() value after which the call is abandoned. `cache=False`
+        bypasses the response cache. `response_mime_type="application/json"` with a
+        `response_schema` asks for schema-constrained JSON. `cached_content` is a
+        handle from create_context_cache() whose contents precede `contents`.
+        Raises LLMError when every attempt fails.
+        """
+        if not self.client:
+            raise LLMError("Gemini not initialized. Set GEMINI_API_KEY.")
+
+        preferred = self._dedupe(models or self._budget_tier([model or self.default_model, *self.router.fallback_models]))
+        contents, preferred, cached_content = self._resolve_context(cached_content, contents, preferred)
+        candidates = self.router.order(preferred)
+        config, config_key = self._config(temperature, max_output_tokens, response_mime_type, response_schema, cached_content)
+        kind = self._kind(contents)
+
+        cache_key = None
+        if cache and self.cache.ttl_for(call_site) > 0:
+            cache_key = LLMResponseCache.make_key(preferred[0], contents, config_key)
+            cached = self.cache.get(cache_key, call_site)
+            if cached is not None:
+                logger.info(f"[LLM] {call_site}: cache hit")
+                self.usage.record(kind, call_site, model=preferred[0], bytes_down=len(cached.encode()), cache="hit")
+                return cached
+
+        breaker = get_circuit_breaker("gemini_vision" if self._has_media(contents) else "gemini_text")
+        if not breaker.allow():
+            raise LLMError(f"{call_site} skipped: {breaker.name} circuit open")
+
+        request = {
+            "call_site": call_site,
+            "kind": kind,
+            "priority": self.scheduler.priority_for(call_site, priority),
+            "tokens": GeminiScheduler.estimate_tokens(contents, max_output_tokens),
+            "deadline": deadline,
+        }
+
+        last_err: Optional[Exception] = None
+        try:
+            for i, candidate in enumerate(candidates):
+                # A hedge goes to the next healthy model, or duplicates this one
+                request["hedge_model"] = next((m for m in candidates[i + 1:] if self.router.is_healthy(m)), candidate)
+                try:
+                    text = await self._generate_with_retries(candidate, contents, config, timeout or self.timeout, request)
+                    breaker.record_success()
+                    if cache_key:
+                        self.cache.set(cache_key, call_site, candidate, text)
+                    return text
+                except DeadlineExceeded as e:
+                    breaker.release()
+                    raise LLMError(f"{call_site} dropped: {e}")
+                except Exception as e:
+                    last_err = e
+                    self.router.record_failure(candidate, e)
+                    logger.warning(f"[LLM] {call_site}: {candidate} failed: {e}")
+        except asyncio.CancelledError:
+            # The caller gave up (its own budget may have gone on other work); says nothing about Gemini
+            breaker.release()
+            raise
+
+        breaker.record_failure()
+        raise LLMError(f"{call_site} failed on {', '.join(candidates)}: {last_err}")
+
+    async def generate_stream(
+        self,
+        contents: Any,
+        *,
+        call_site: str = "default",
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_output_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        priority: Optional[str] = None,
+        deadline: Optional[float] = None,
+        cache: bool = True,
+        response_mime_type: Optional[str] = None,
+        response_schema: Optional[Dict[str, Any]] = None,
+        cached_content: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Streams text chunks as Gemini produces them. Same routing, scheduling, circuit
+        breaker and cache as generate(); `timeout` bounds the wait for each chunk.
+        A model that fails before its first chunk falls back to the next one; once
+        text has been sent there are no retries or hedges and LLMError is raised.
+        """
+        if not self.client:
+            raise LLMError("Gemini not initialized. Set GEMINI_API_KEY.")
+
+        preferred = self._dedupe(self._budget_tier([model or self.default_model, *self.router.fallback_models]))
+        contents, preferred, cached_content = self._resolve_context(cached_content, contents, preferred)
+        candidates = self.router.order(preferred)
+        config, config_key = self._config(temperature, max_output_tokens, response_mime_type, response_schema, cached_content)
+        kind = self._kind(contents)
+
+        cache_key = None
+        if cache and self.cache.ttl_for(call_site) > 0:
+            cache_key = LLMResponseCache.make_key(preferred[0], contents, config_key)
+            cached = self.cache.get(cache_key, call_site)
+            if cached is not None:
+                logger.info(f"[LLM] {call_site}: cache hit (stream)")
+                self.usage.record(kind, call_site, model=preferred[0], bytes_down=len(cached.encode()), cache="hit")
+                yield cached
+                return
+
+        breaker = get_circuit_breaker("gemini_vision" if self._has_media(contents) else "gemini_text")
+        if not breaker.allow():
+            raise LLMError(f"{call_site} skipped: {breaker.name} circuit open")
+
+        priority_name = self.scheduler.priority_for(call_site, priority)
+        tokens = GeminiScheduler.estimate_tokens(contents, max_output_tokens)
+        chunk_timeout = timeout or self.timeout
+
+        last_err: Optional[Exception] = None
+        for candidate in candidates:
+            sent: List[str] = []
+            usage = None
+            started = None
+            try:
+                await self.scheduler.acquire(priority_name, tokens, deadline)
+                started = time.monotonic()
+                stream = await asyncio.wait_for(
+                    self.client.aio.models.generate_content_stream(model=candidate, contents=contents, config=config),
+                    timeout=self._remaining(chunk_timeout, deadline),
+                )
+                iterator = stream.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(iterator.__anext__(), timeout=self._remaining(chunk_timeout, deadline))
+                    except StopAsyncIteration:
+                        break
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    text = getattr(chunk, "text", None)
+                    if text:
+                        sent.append(text)
+                        yield text
+
+                full_text = "".join(sent).strip()
+                self._record_usage(kind, call_site, candidate, contents, config, usage, full_text, time.monotonic() - started)
+                if not full_text:
+                    raise LLMError("Empty Gemini response.")
+                self.router.record_success(candidate, time.monotonic() - started)
+                self.scheduler.record_usage(tokens, getattr(usage, "total_token_count", None))
+                breaker.record_success()
+                if cache_key:
+                    self.cache.set(cache_key, call_site, candidate, full_text)
+                return
+            except DeadlineExceeded as e:
+                breaker.release()
+                raise LLMError(f"{call_site} dropped: {e}")
+            except (asyncio.CancelledError, GeneratorExit):
+                # Client went away or the caller stopped reading
+                breaker.release()
+                raise
+            except Exception as e:
+                last_err = e
+                if started is not None and not isinstance(e, LLMError):
+                    self._record_usage(kind, call_site, candidate, contents, config, usage, "".join(sent), time.monotonic() - started, error=True)
+                self.router.record_failure(candidate, e)
+                logger.warning(f"[LLM] {call_site}: {candidate} stream failed: {e}")
+                if sent:
+                    breaker.record_failure()
+                    raise LLMError(f"{call_site} stream interrupted on {candidate}: {e}")
+
+        breaker.record_failure()
+        raise LLMError(f"{call_site} failed on {', '.join(candidates)}: {last_err}")
+
+    async def create_context_cache(
+        self,
+        system_instruction: str,
+        contents: List[Any],
+        *,
+        model: Optional[str] = None,
+        ttl_seconds: float = 3600,
+        local: bool = False,
+    ) -> Optional[str]:
+        """
+        Stores a static prompt prefix and returns a handle for generate(cached_content=...).
+        With `local=True` the prefix stays in memory and is prepended to each request
+        (same interface, no provider-side savings). Returns None when the provider
+        rejects the cache (e.g. prefix below its minimum size).
+        """
+        model = model or self.default_model
+        expires_at = time.time() + ttl_seconds
+        if local:
+            name = f"{LOCAL_CONTEXT_PREFIX}{len(self._local_contexts)}-{int(time.time() * 1000)}"
+            self._local_contexts[name] = (system_instruction, list(contents))
+            self._context_caches[name] = (model, expires_at)
+            return name
+
+        if not self.client:
+            return None
+        try:
+            cache = await self.client.aio.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=system_instruction,
+                    contents=contents,
+                    ttl=f"{int(ttl_seconds)}s",
+                ),
+            )
+        except Exception as e:
+            logger.warning(f"[LLM] Context cache not created: {e}")
+            return None
+        self._context_caches[cache.name] = (model, expires_at)
+        self.usage.record(
+            "llm",
+            "context_cache",
+            model=model,
+            input_tokens=getattr(getattr(cache, "usage_metadata", None), "total_token_count", None) or 0,
+            bytes_up=self._bytes([system_instruction, *contents]),
+        )
+        logger.info(f"[LLM] Context cache {cache.name} created for {model}")
+        return cache.name
+
+    async def delete_context_cache(self, name: str) -> None:
+        self._context_caches.pop(name, None)
+        if self._local_contexts.pop(name, None) is not None or not self.client:
+            return
+        try:
+            await self.client.aio.caches.delete(name=name)
+        except Exception as e:
+            logger.warning(f"[LLM] Could not delete context cache {name}: {e}")
+
+    async def aclose(self) -> None:
+        if self.client is None:
+            return
+        aclose = getattr(self.client.aio, "aclose", None)
+        if aclose:
+            await aclose()
+
+    async def _generate_with_retries(self, model: str, contents: Any, config: types.GenerateContentConfig, timeout: float, request: dict) -> str:
+        attempt = 0
+        deadline = request["deadline"]
+        while True:
+            try:
+                return await self._hedged_attempt(model, contents, config, timeout, request)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    raise
+                delay = min(4.0, 0.5 * (2 ** attempt)) * (0.5 + random.random())
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise
+                attempt += 1
+                logger.info(f"[LLM] {request['call_site']}: retrying {model} in {delay:.2f}s ({e})")
+                await asyncio.sleep(delay)
+
+    async def _hedged_attempt(self, model: str, contents: Any, config: types.GenerateContentConfig, timeout: float, request: dict) -> str:
+        call_site = request["call_site"]
+        delay = self.hedging.delay_for(call_site)
+        if delay is None:
+            return await self._attempt(model, contents, config, timeout, request)
+
+        admitted = asyncio.Event()
+        primary = asyncio.ensure_future(self._attempt(model, contents, config, timeout, request, admitted))
+        pending = {primary}
+        # Whatever ends this call (including the caller being cancelled) cancels the attempts still running
+        try:
+            # The delay counts from admission: a primary still queued in the scheduler gains nothing from a hedge
+            admission = asyncio.ensure_future(admitted.wait())
+            try:
+                await asyncio.wait({primary, admission}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                admission.cancel()
+            if primary.done():
+                return await primary
+
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            deadline = request["deadline"]
+            if done or (deadline is not None and deadline - time.monotonic() < delay) or not self.hedging.try_spend(call_site):
+                return await primary
+
+            hedge_model = request.get("hedge_model") or model
+            logger.info(f"[LLM] {call_site}: no answer after {delay:.2f}s, hedging on {hedge_model}")
+            hedge = asyncio.ensure_future(self._attempt(hedge_model, contents, config, timeout, request))
+            pending = {primary, hedge}
+            first_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        if task is hedge:
+                            self.hedging.record_win(call_site)
+                        return task.result()
+                    if task is hedge and hedge_model != model:
+                        self.router.record_failure(hedge_model, error)
+                    first_error = first_error or error
+            raise first_error
+        finally:
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+
+    async def _attempt(self, model: str, contents: Any, config: types.GenerateContentConfig, timeout: float, request: dict, admitted: Optional[asyncio.Event] = None) -> str:
+        deadline = request["deadline"]
+        await self.scheduler.acquire(request["priority"], request["tokens"], deadline)
+        if admitted is not None:
+            admitted.set()
+        attempt_timeout = self._remaining(timeout, deadline)
+        started = time.monotonic()
+        try:
+            response = await asyncio.wait_for(
+                self.client.aio.models.generate_content(model=model, contents=contents, config=config),
+                timeout=attempt_timeout,
+            )
+        except BaseException:
+            # Failed, timed-out and cancelled (lost hedge) attempts still cost upload and latency
+            self._record_usage(request["kind"], request["call_site"], model, contents, config, None, "", time.monotonic() - started, error=True)
+            raise
+        latency = time.monotonic() - started
+        self.router.record_success(model, latency)
+        self.hedging.observe(request["call_site"], latency)
+        usage = getattr(response, "usage_metadata", None)
+        self.scheduler.record_usage(request["tokens"], getattr(usage, "total_token_count", None))
+        text = (getattr(response, "text", "") or "").strip()
+        self._record_usage(request["kind"], request["call_site"], model, contents, config, usage, text, latency)
+        if not text:
+            raise LLMError("Empty Gemini response.")
+        return text
+
+    async def _probe(self, model: str) -> float:
+        """Minimal call used by the router to check a cooled-down model; returns its latency."""
+        await self.scheduler.acquire("background", 8)
+        started = time.monotonic()
+        response = await asyncio.wait_for(
+            self.client.aio.models.generate_content(
+                model=model,
+                contents="ping",
+                config=types.GenerateContentConfig(max_output_tokens=1),
+            ),
+            timeout=self.timeout,
+        )
+        latency = time.monotonic() - started
+        self._record_usage("llm", "model_probe", model, "ping", None, getattr(response, "usage_metadata", None), "", latency)
+        return latency
+
+    @staticmethod
+    def _config(
+        temperature: Optional[float],
+        max_output_tokens: Optional[int],
+        response_mime_type: Optional[str],
+        response_schema: Optional[Dict[str, Any]],
+        cached_content: Optional[str] = None,
+    ) -> tuple:
+        """Returns the request config and the dict of settings that goes into the cache key."""
+        config_key: Dict[str, Any] = {"temperature": temperature, "max_output_tokens": max_output_tokens}
+        structured: Dict[str, Any] = {}
+        if response_mime_type:
+            structured["response_mime_type"] = response_mime_type
+        if response_schema:
+            structured["response_schema"] = response_schema
+        if cached_content:
+            structured["cached_content"] = cached_content
+        config_key.update(structured)
+        config = types.GenerateContentConfig(
+            temperature=temperature,
+            max_output_tokens=max_output_tokens,
+            **structured,
+        )
+        return config, config_key
+
+    def _resolve_context(self, cached_content: Optional[str], contents: Any, preferred: List[str]) -> tuple:
+        """
+        Returns (contents, models, provider cache name) for a context cache handle.
+        Local handles are expanded inline; provider caches pin the model they were created for.
+        """
+        if not cached_content:
+            return contents, preferred, None
+
+        model, expires_at = self._context_caches.get(cached_content, (None, 0.0))
+        if model is None or expires_at <= time.time():
+            raise LLMError(f"Context cache {cached_content} expired")
+
+        if cached_content.startswith(LOCAL_CONTEXT_PREFIX):
+            system_instruction, prefix = self._local_contexts[cached_content]
+            items = contents if isinstance(contents, list) else [contents]
+            return [f"{system_instruction}\n\n", *prefix, *items], preferred, None
+        return contents, [model], cached_content
+
+    @staticmethod
+    def _remaining(timeout: float, deadline: Optional[float]) -> float:
+        return timeout if deadline is None else min(timeout, max(0.0, deadline - time.monotonic()))
+
+    def _budget_tier(self, models: List[str]) -> List[str]:
+        """Puts the budget model first while the current endpoint is over its token budget."""
+        if self.budget_model and models[0] != self.budget_model and self.usage.over_budget():
+            self.usage.record_downgrade("gemini_model")
+            return [self.budget_model, *models]
+        return models
+
+    def _record_usage(
+        self,
+        kind: str,
+        call_site: str,
+        model: str,
+        contents: Any,
+        config: Optional[types.GenerateContentConfig],
+        usage: Any,
+        text: str,
+        latency: float,
+        error: bool = False,
+    ) -> None:
+        # Without usage metadata (errors, stub clients) fall back to the scheduler's estimate
+        input_tokens = getattr(usage, "prompt_token_count", None)
+        if input_tokens is None:
+            input_tokens = 0 if error else GeminiScheduler.estimate_tokens(contents, 1) - 1
+        output_tokens = getattr(usage, "candidates_token_count", None)
+        if output_tokens is None:
+            output_tokens = len(text) // 4
+        cache_status = "error" if error else ("context" if getattr(config, "cached_content", None) else "miss")
+        self.usage.record(
+            kind,
+            call_site,
+            model=model,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cached_tokens=getattr(usage, "cached_content_token_count", None) or 0,
+            bytes_up=self._bytes(contents),
+            bytes_down=len(text.encode()),
+            latency=latency,
+            cache=cache_status,
+        )
+
+    @staticmethod
+    def _kind(contents: Any) -> str:
+        """llm, vision or transcription, from the media parts in the request."""
+        items = contents if isinstance(contents, list) else [contents]
+        kind = "llm"
+        for item in items:
+            mime_type = getattr(getattr(item, "inline_data", None), "mime_type", None) or ""
+            if mime_type.startswith("audio/"):
+                return "transcription"
+            if not isinstance(item, str):
+                kind = "vision"
+        return kind
+
+    @staticmethod
+    def _bytes(contents: Any) -> int:
+        items = contents if isinstance(contents, list) else [contents]
+        total = 0
+        for item in items:
+            if isinstance(item, str):
+                total += len(item.encode())
+            else:
+                total += len(getattr(getattr(item, "inline_data", None), "data", None) or b"")
+        return total
+
+    @staticmethod
+    def _has_media(contents: Any) -> bool:
+        items = contents if isinstance(contents, list) else [contents]
+        return any(not isinstance(item, str) for item in items)
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, asyncio.TimeoutError):
+            return True
+        return getattr(error, "code", None) in RETRYABLE_STATUS
+
+    @staticmethod
+    def _dedupe(models: List[str]) -> List[str]:
+        seen = []
+        for m in models:
+            if m and m not in seen:
+                seen.append(m)
+        return seen
+
+
+_gateway: Optional[LLMGateway] = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway()
+    return _gateway
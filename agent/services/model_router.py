@@ -0,0 +1,163 @@
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _ModelHealth:
+    __slots__ = (
+        "latency", "successes", "failures", "consecutive_failures", "last_error",
+        "cooldown_until", "needs_probe", "probing",
+    )
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.cooldown_until = 0.0
+        self.needs_probe = False
+        self.probing = False
+
+    def available(self, now: float, probing_enabled: bool) -> bool:
+        if self.cooldown_until > now:
+            return False
+        return not (self.needs_probe and probing_enabled)
+
+
+class ModelRouter:
+    """
+    Shared per-model health for every Gemini call.
+
+    - Failures put a model in cooldown: 404 (retired/misnamed) for MODEL_NOT_FOUND_COOLDOWN,
+      429 for MODEL_THROTTLE_COOLDOWN, anything else backs off exponentially from
+      MODEL_ERROR_COOLDOWN after repeated failures
+    - Cooled-down models are skipped, so a bad model costs one failed request, not one per call
+    - When a cooldown expires the model is probed in the background; live traffic
+      only returns to it once the probe succeeds
+    - Healthy models keep their preference order unless a later one is clearly faster
+    """
+
+    # A later model must be this much faster (EWMA) to be routed ahead of a preferred one
+    FASTER_RATIO = 0.8
+
+    def __init__(self, prober: Optional[Callable[[str], Awaitable[Optional[float]]]] = None):
+        self.prober = prober
+        self.fallback_models = [
+            m.strip() for m in os.getenv("GEMINI_FALLBACK_MODELS", "gemini-2.0-flash,gemini-1.5-pro").split(",") if m.strip()
+        ]
+        self.not_found_cooldown = float(os.getenv("MODEL_NOT_FOUND_COOLDOWN", "3600"))
+        self.throttle_cooldown = float(os.getenv("MODEL_THROTTLE_COOLDOWN", "30"))
+        self.error_cooldown = float(os.getenv("MODEL_ERROR_COOLDOWN", "10"))
+        self.error_threshold = int(os.getenv("MODEL_ERROR_THRESHOLD", "3"))
+        self._health: Dict[str, _ModelHealth] = {}
+        self._probes = set()
+
+    def order(self, models: List[str]) -> List[str]:
+        """
+        Returns `models` reordered for routing: healthy models first, then
+        cooled-down models by soonest recovery so a call is still attempted when
+        nothing is healthy. Cooled-down models whose cooldown has expired get a
+        background probe.
+        """
+        now = time.monotonic()
+        healthy, cooling = [], []
+        for model in models:
+            health = self._health.setdefault(model, _ModelHealth())
+            if health.available(now, self.prober is not None):
+                healthy.append(model)
+            else:
+                cooling.append(model)
+                if health.cooldown_until <= now:
+                    self._probe(model, health)
+
+        if len(healthy) > 1:
+            preferred = healthy[0]
+            preferred_latency = self._health[preferred].latency
+            sampled = [m for m in healthy[1:] if self._health[m].latency is not None]
+            if preferred_latency is not None and sampled:
+                fastest = min(sampled, key=lambda m: self._health[m].latency)
+                if self._health[fastest].latency < preferred_latency * self.FASTER_RATIO:
+                    healthy.remove(fastest)
+                    healthy.insert(0, fastest)
+
+        cooling.sort(key=lambda m: self._health[m].cooldown_until)
+        return healthy + cooling
+
+    def record_success(self, model: str, latency: float) -> None:
+        health = self._health.setdefault(model, _ModelHealth())
+        health.successes += 1
+        health.consecutive_failures = 0
+        health.cooldown_until = 0.0
+        health.needs_probe = False
+        health.latency = latency if health.latency is None else 0.8 * health.latency + 0.2 * latency
+
+    def record_failure(self, model: str, error: Exception, probe: bool = False) -> None:
+        health = self._health.setdefault(model, _ModelHealth())
+        health.failures += 1
+        health.consecutive_failures += 1
+        health.last_error = f"{type(error).__name__}: {error}"[:200]
+
+        code = getattr(error, "code", None)
+        if code == 404:
+            cooldown = self.not_found_cooldown
+        elif code == 429:
+            cooldown = self.throttle_cooldown
+        elif health.consecutive_failures >= self.error_threshold:
+            exponent = health.consecutive_failures - self.error_threshold
+            cooldown = min(600.0, self.error_cooldown * (2 ** exponent))
+        elif probe:
+            cooldown = self.error_cooldown
+        else:
+            return
+
+        health.cooldown_until = time.monotonic() + cooldown
+        health.needs_probe = True
+        logger.warning(f"[MODEL ROUTER] {model} cooling down for {cooldown:.0f}s ({health.last_error})")
+
+    def is_healthy(self, model: str) -> bool:
+        health = self._health.get(model)
+        return health is None or health.available(time.monotonic(), self.prober is not None)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            model: {
+                "healthy": h.available(now, self.prober is not None),
+                "cooldown_remaining_s": round(max(0.0, h.cooldown_until - now), 1),
+                "latency_ms": round(h.latency * 1000.0) if h.latency is not None else None,
+                "successes": h.successes,
+                "failures": h.failures,
+                "last_error": h.last_error,
+            }
+            for model, h in self._health.items()
+        }
+
+    def _probe(self, model: str, health: _ModelHealth) -> None:
+        # The model stays out of live traffic until this cheap background call succeeds
+        if self.prober is None or health.probing:
+            return
+        health.probing = True
+
+        async def probe():
+            started = time.monotonic()
+            try:
+                latency = await self.prober(model)
+                self.record_success(model, latency if latency is not None else time.monotonic() - started)
+                logger.info(f"[MODEL ROUTER] {model} healthy again")
+            except Exception as e:
+                self.record_failure(model, e, probe=True)
+            finally:
+                health.probing = False
+
+        try:
+            task = asyncio.get_running_loop().create_task(probe())
+        except RuntimeError:
+            health.probing = False
+            return
+        self._probes.add(task)
+        task.add_done_callback(self._probes.discard)
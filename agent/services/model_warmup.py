@@ -0,0 +1,113 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+import logging
+
+import numpy as np
+
+from services.llm_gateway import LLMGateway
+from utils.image_processor import encode_jpeg
+from utils.perceptual_hash import dhash
+
+logger = logging.getLogger(__name__)
+
+
+class ModelWarmup:
+    """
+    Pushes dummy frames through every local model before traffic arrives.
+
+    - YOLO: weight loading and first-inference kernel selection
+    - MediaPipe: graph building for every pose tier
+    - Image encoding and hashing
+    - Gemini: one minimal vision request through the shared gateway (WARMUP_GEMINI=0
+      skips it), so the SDK request build and the pooled connection are ready; it is
+      tagged `warmup` in usage and bounded by WARMUP_GEMINI_TIMEOUT
+
+    `ready` flips to True once all stages have run, whether or not a stage failed;
+    failures are reported per stage so a missing optional model never blocks traffic.
+    """
+
+    def __init__(self, vision_analyzer):
+        self.vision_analyzer = vision_analyzer
+        self.ready = False
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.timings: Dict[str, Any] = {}
+        self.errors: Dict[str, str] = {}
+        self.warm_gemini = os.getenv("WARMUP_GEMINI", "1") != "0"
+        self.gemini_timeout = float(os.getenv("WARMUP_GEMINI_TIMEOUT", "5.0"))
+
+    async def run(self) -> None:
+        self.started_at = time.time()
+        frame = self._dummy_frame()
+        loop = asyncio.get_event_loop()
+
+        detector = self.vision_analyzer.object_detector
+        if detector and detector.initialized:
+            await self._stage("detect", loop.run_in_executor(None, detector.detect_objects, frame))
+
+        pose_estimator = self.vision_analyzer.pose_estimator
+        if pose_estimator and pose_estimator.initialized:
+            await self._stage("pose", loop.run_in_executor(None, pose_estimator.warmup, frame), breakdown=True)
+
+        await self._stage("encode", loop.run_in_executor(None, self._warm_encoding, frame))
+        if self.warm_gemini and self.vision_analyzer.gateway.is_available():
+            await self._stage("gemini_request", self._warm_gemini_request(frame))
+
+        self.finished_at = time.time()
+        self.timings["total"] = round((self.finished_at - self.started_at) * 1000.0, 1)
+        self.ready = True
+        logger.info(f"[WARMUP] Complete in {self.timings['total']:.0f} ms: {self.timings}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "timings_ms": self.timings,
+            "errors": self.errors,
+        }
+
+    async def _stage(self, name: str, awaitable, breakdown: bool = False) -> None:
+        started = time.perf_counter()
+        try:
+            result = await awaitable
+            elapsed = round((time.perf_counter() - started) * 1000.0, 1)
+            if breakdown:
+                # Stage timed its own sub-steps (e.g. one entry per pose tier)
+                self.timings[name] = {"total": elapsed, **{k: round(v, 1) for k, v in result.items()}}
+            else:
+                self.timings[name] = elapsed
+        except Exception as e:
+            self.timings[name] = round((time.perf_counter() - started) * 1000.0, 1)
+            self.errors[name] = str(e)
+            logger.warning(f"[WARMUP] {name} failed: {e}")
+
+    def _warm_encoding(self, frame: np.ndarray) -> None:
+        encode_jpeg(frame, max_size=384, quality=50)
+        dhash(frame)
+
+    async def _warm_gemini_request(self, frame: np.ndarray) -> None:
+        # Same prompt build and image part as analyze_vision, with a tiny answer and no response cache
+        context = self.vision_analyzer._build_enhanced_context(
+            self.vision_analyzer.object_detector._empty_detection() if self.vision_analyzer.object_detector else None,
+            None,
+            "warmup"
+        )
+        image_part = LLMGateway.image_part(encode_jpeg(frame, max_size=384, quality=50))
+        await self.vision_analyzer.gateway.generate(
+            [f"{context}\n\nReply with the single word OK.", image_part],
+            call_site="warmup",
+            model=self.vision_analyzer.model,
+            max_output_tokens=8,
+            priority="background",
+            deadline=time.monotonic() + self.gemini_timeout,
+            cache=False,
+        )
+
+    @staticmethod
+    def _dummy_frame() -> np.ndarray:
+        rng = np.random.default_rng(0)
+        frame = np.zeros((360, 640, 3), dtype=np.uint8)
+        frame[:] = (40, 140, 40)
+        noise = rng.integers(0, 20, size=frame.shape, dtype=np.uint8)
+        return frame + noise
@@ -1,38 +1,57 @@
-import google.generativeai as genai
+import json
 import os
-import asyncio
-from typing import Optional, Tuple
+import re
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+import logging
+
+from services.llm_gateway import get_llm_gateway
+from services.semantic_cache import SemanticCache
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "nfl_analogy": {"type": "STRING"},
+        "nfl_commentary": {"type": "STRING"},
+    },
+    "required": ["nfl_analogy", "nfl_commentary"],
+    # The analogy comes first so it can be streamed while the commentary is still pending
+    "property_ordering": ["nfl_analogy", "nfl_commentary"],
+}
 
 
 class NFLAnalogyService:
     """
     Converts soccer commentary to NFL analogies and broadcast-style commentary.
-    Uses two-step Gemini prompting for faithful, energetic output.
+
+    - "single" mode (default, NFL_ANALOGY_MODE): one schema-constrained JSON call
+      returns both fields, so /api/nfl-analogy costs one Gemini round trip
+    - "two_step" mode: tactical analogy first, then broadcast commentary written
+      from it; also the quality fallback when the single call is unusable
     """
 
+    MODES = ("single", "two_step")
+
     def __init__(self, api_key: Optional[str] = None):
-        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
-        self.model_name = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
-        self.model = None
+        self.gateway = get_llm_gateway()
+        self.model_name = self.gateway.default_model
+        self.model = self.model_name if self.gateway.is_available() else None
+        self.semantic_cache = SemanticCache("nfl_analogy")
+        self.mode = os.getenv("NFL_ANALOGY_MODE", "single")
+        if self.mode not in self.MODES:
+            self.mode = "single"
 
-        if self.api_key:
-            try:
-                genai.configure(api_key=self.api_key)
-                try:
-                    self.model = genai.GenerativeModel(self.model_name)
-                except Exception:
-                    self.model_name = "gemini-1.5-pro"
-                    self.model = genai.GenerativeModel(self.model_name)
-                print(f"[NFL-ANALOGY] Gemini initialized with {self.model_name}")
-            except Exception as e:
-                print(f"[NFL-ANALOGY] Warning: Could not initialize Gemini: {e}")
-                self.model = None
+        if self.model:
+            logger.info(f"[NFL-ANALOGY] Gemini initialized with {self.model_name} ({self.mode} mode)")
         else:
-            print("[NFL-ANALOGY] Gemini NOT initialized - GEMINI_API_KEY not set")
+            logger.warning("[NFL-ANALOGY] Gemini NOT initialized - GEMINI_API_KEY not set")
 
-    async def generate_nfl_analogy(self, soccer_commentary: str) -> Tuple[str, str]:
+    async def generate_nfl_analogy(self, soccer_commentary: str, mode: Optional[str] = None, use_cache: bool = True) -> Tuple[str, str]:
         """
         Generate NFL analogy and NFL broadcast commentary from soccer commentary.
+        `mode` overrides NFL_ANALOGY_MODE; `use_cache=False` skips the near-duplicate
+        cache (used by the benchmark).
 
         Returns:
             Tuple of (nfl_analogy, nfl_commentary)
@@ -43,14 +62,137 @@ class NFLAnalogyService:
         if not self.model:
             return self._generate_stub(soccer_commentary)
 
+        if use_cache:
+            cached = self.semantic_cache.lookup(soccer_commentary)
+            if cached is not None:
+                return cached
+
         try:
-            nfl_analogy = await self._step1_soccer_to_analogy(soccer_commentary)
-            nfl_commentary = await self._step2_analogy_to_broadcast(nfl_analogy)
-            return (nfl_analogy, nfl_commentary)
+            result = None
+            if (mode or self.mode) == "single":
+                result = await self._generate_single(soccer_commentary)
+            if result is None:
+                result = await self._generate_two_step(soccer_commentary)
+            self.semantic_cache.add(soccer_commentary, result)
+            return result
         except Exception as e:
-            print(f"[NFL-ANALOGY] Generation error: {e}")
+            logger.error(f"[NFL-ANALOGY] Generation error: {e}")
             return self._generate_stub(soccer_commentary)
 
+    async def stream_nfl_analogy(self, soccer_commentary: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields {"type": "analogy", "delta": ...} events while the analogy is generated,
+        then one {"type": "done", "nfl_analogy", "nfl_commentary", "mode"} event. If the
+        single call fails mid-stream (or its JSON is unusable) after deltas were sent, a
+        {"type": "reset"} event tells the client to discard them before the fallback's
+        analogy arrives as new deltas.
+        """
+        if not soccer_commentary or not soccer_commentary.strip():
+            yield {"type": "done", "nfl_analogy": "", "nfl_commentary": "", "mode": "empty"}
+            return
+
+        result = None
+        mode = "stub"
+        if self.model:
+            cached = self.semantic_cache.lookup(soccer_commentary)
+            if cached is not None:
+                result, mode = cached, "cache"
+                yield {"type": "analogy", "delta": cached[0]}
+
+        streamed = False
+        if result is None and self.model and self.mode == "single":
+            field = _JsonStringField("nfl_analogy")
+            chunks = []
+            try:
+                async for chunk in self.gateway.generate_stream(
+                    self._single_prompt(soccer_commentary),
+                    call_site="nfl_analogy",
+                    model=self.model_name,
+                    temperature=0.7,
+                    max_output_tokens=320,
+                    response_mime_type="application/json",
+                    response_schema=RESPONSE_SCHEMA,
+                ):
+                    chunks.append(chunk)
+                    delta = field.feed(chunk)
+                    if delta:
+                        streamed = True
+                        yield {"type": "analogy", "delta": delta}
+                result = self._parse_single("".join(chunks))
+                mode = "single"
+            except Exception as e:
+                logger.warning(f"[NFL-ANALOGY] Streaming error: {e}")
+
+        if result is None and streamed:
+            yield {"type": "reset"}
+
+        if result is None and self.model:
+            try:
+                result = await self._generate_two_step(soccer_commentary)
+                mode = "two_step"
+                yield {"type": "analogy", "delta": result[0]}
+            except Exception as e:
+                logger.error(f"[NFL-ANALOGY] Generation error: {e}")
+
+        if result is None:
+            result = self._generate_stub(soccer_commentary)
+            mode = "stub"
+            yield {"type": "analogy", "delta": result[0]}
+        elif mode in ("single", "two_step"):
+            self.semantic_cache.add(soccer_commentary, result)
+
+        yield {"type": "done", "nfl_analogy": result[0], "nfl_commentary": result[1], "mode": mode}
+
+    async def _generate_single(self, soccer_commentary: str) -> Optional[Tuple[str, str]]:
+        """One structured call for both fields; None when the output is unusable."""
+        text = await self.gateway.generate(
+            self._single_prompt(soccer_commentary),
+            call_site="nfl_analogy",
+            model=self.model_name,
+            temperature=0.7,
+            max_output_tokens=320,
+            response_mime_type="application/json",
+            response_schema=RESPONSE_SCHEMA,
+        )
+        result = self._parse_single(text)
+        if result is None:
+            logger.warning("[NFL-ANALOGY] Structured response unusable - falling back to two-step")
+        return result
+
+    async def _generate_two_step(self, soccer_commentary: str) -> Tuple[str, str]:
+        nfl_analogy = await self._step1_soccer_to_analogy(soccer_commentary)
+        nfl_commentary = await self._step2_analogy_to_broadcast(nfl_analogy)
+        return (nfl_analogy, nfl_commentary)
+
+    @staticmethod
+    def _parse_single(text: str) -> Optional[Tuple[str, str]]:
+        try:
+            data = json.loads(text)
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(data, dict):
+            return None
+        nfl_analogy = str(data.get("nfl_analogy") or "").strip()
+        nfl_commentary = str(data.get("nfl_commentary") or "").strip()
+        if not nfl_analogy or not nfl_commentary:
+            return None
+        return (nfl_analogy, nfl_commentary)
+
+    def _single_prompt(self, soccer_commentary: str) -> str:
+        return f"""You are a sports analyst and NFL broadcast commentator converting soccer plays for American football fans.
+
+SOCCER COMMENTARY:
+"{soccer_commentary}"
+
+RULES:
+- Stay FAITHFUL to the soccer commentary - do NOT invent events that aren't described
+- Do NOT use real NFL team names, player names, or stadium names
+- Use ONLY generic terms: offense, defense, quarterback, receiver, linebacker, cornerback, safety, drive, snap, red zone, end zone, pocket, blitz, coverage, route, completion, sack, interception, touchdown
+
+Return JSON with two fields:
+- "nfl_analogy": a 2-4 sentence tactical explanation of the play using NFL concepts, precise and matching the energy/stakes of the original soccer play
+- "nfl_commentary": 1-2 sentences (15-35 words) of energetic, professional NFL play-by-play describing that analogy - punchy and dramatic but NOT cringe or over-the-top"""
+
     async def _step1_soccer_to_analogy(self, soccer_commentary: str) -> str:
         """Step 1: Convert soccer commentary to NFL tactical analogy."""
         prompt = f"""You are a sports analyst converting soccer plays to NFL analogies.
@@ -68,18 +210,13 @@ Write a 2-4 sentence tactical explanation using NFL concepts. Be precise and mat
 
 Respond with ONLY the NFL analogy, no preamble or labels."""
 
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: self.model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": 0.7,
-                    "max_output_tokens": 200,
-                }
-            )
+        return await self.gateway.generate(
+            prompt,
+            call_site="nfl_analogy",
+            model=self.model_name,
+            temperature=0.7,
+            max_output_tokens=200,
         )
-        return response.text.strip()
 
     async def _step2_analogy_to_broadcast(self, nfl_analogy: str) -> str:
         """Step 2: Convert NFL analogy to energetic broadcast commentary."""
@@ -97,18 +234,13 @@ RULES:
 
 Respond with ONLY the broadcast commentary, no preamble or labels."""
 
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: self.model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": 0.8,
-                    "max_output_tokens": 100,
-                }
-            )
+        return await self.gateway.generate(
+            prompt,
+            call_site="nfl_broadcast",
+            model=self.model_name,
+            temperature=0.8,
+            max_output_tokens=100,
         )
-        return response.text.strip()
 
     def _generate_stub(self, soccer_commentary: str) -> Tuple[str, str]:
         """Generate stub responses when Gemini is not available."""
@@ -139,3 +271,60 @@ Respond with ONLY the broadcast commentary, no preamble or labels."""
                 "The offense methodically moves the chains, using a balanced attack to keep the defense guessing. Good protection up front gives the quarterback time to work.",
                 "Steady progress on the drive as the offense continues to move the chains efficiently."
             )
+
+
+class _JsonStringField:
+    """Incrementally decodes one string field of a JSON object that arrives in chunks."""
+
+    _ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+    def __init__(self, name: str):
+        self._pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(name))
+        self._buffer = ""
+        self._pos: Optional[int] = None
+        self._done = False
+
+    def feed(self, chunk: str) -> str:
+        """Adds a chunk and returns the newly decoded part of the field's value."""
+        self._buffer += chunk
+        if self._done:
+            return ""
+        if self._pos is None:
+            match = self._pattern.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        buf, i, out = self._buffer, self._pos, []
+        while i < len(buf):
+            c = buf[i]
+            if c == '"':
+                self._done = True
+                i += 1
+                break
+            if c != "\\":
+                out.append(c)
+                i += 1
+                continue
+            if i + 1 >= len(buf):
+                break
+            escape = buf[i + 1]
+            if escape != "u":
+                out.append(self._ESCAPES.get(escape, escape))
+                i += 2
+                continue
+            # \uXXXX, possibly a surrogate pair that needs both halves before decoding
+            if i + 6 > len(buf):
+                break
+            code = int(buf[i + 2:i + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                if i + 12 > len(buf):
+                    break
+                low = int(buf[i + 8:i + 12], 16)
+                out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                i += 12
+            else:
+                out.append(chr(code))
+                i += 6
+        self._pos = i
+        return "".join(out)
@@ -2,7 +2,7 @@
 import cv2
 import numpy as np
 import base64
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 import logging
 from ultralytics import YOLO
 
@@ -30,16 +30,18 @@ class ObjectDetector:
             logger.error(f"[OBJECT_DETECTOR] Failed to initialize YOLOv8: {e}")
             self.initialized = False
     
-    def detect_objects(self, base64_image: str, confidence_threshold: float = 0.25) -> Dict[str, Any]:
+    def detect_objects(self, image_or_base64: Union[str, np.ndarray], confidence_threshold: float = 0.25) -> Dict[str, Any]:
         
         if not self.initialized:
             return self._empty_detection()
         
         try:
-
-            image_bytes = base64.b64decode(base64_image)
-            nparr = np.frombuffer(image_bytes, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            if isinstance(image_or_base64, np.ndarray):
+                image = image_or_base64
+            else:
+                image_bytes = base64.b64decode(image_or_base64)
+                nparr = np.frombuffer(image_bytes, np.uint8)
+                image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
             
             if image is None:
                 logger.error("[OBJECT_DETECTOR] Failed to decode image")
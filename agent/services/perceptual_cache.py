@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from utils.perceptual_hash import hamming_distances
+
+logger = logging.getLogger(__name__)
+
+
+class PerceptualCache:
+    """
+    Content-addressed cache keyed by perceptual hashes of frames.
+
+    - A key is a tuple of 64-bit dHashes (one per frame, so windows work too)
+    - Lookups accept an entry only if every frame is within `max_distance` bits
+      (Hamming); among those the smallest total distance wins
+    - Bounded LRU, persisted to a JSON file so restarts keep warm results; writes
+      happen at most every 30s on a background thread, never on the caller's path
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        max_entries: Optional[int] = None,
+        max_distance: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        persist_dir: Optional[str] = None,
+    ):
+        self.namespace = namespace
+        self.max_entries = max_entries or int(os.getenv("PHASH_CACHE_MAX_ENTRIES", "5000"))
+        self.max_distance = max_distance if max_distance is not None else int(os.getenv("PHASH_CACHE_MAX_DISTANCE", "6"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("PHASH_CACHE_TTL", str(24 * 3600)))
+
+        persist_dir = persist_dir if persist_dir is not None else os.getenv("PHASH_CACHE_DIR", ".cache")
+        self.persist_path = os.path.join(persist_dir, f"phash_{namespace}.json") if persist_dir else None
+        self._save_interval = 30.0
+        self._last_save = 0.0
+        self._dirty = False
+        self._saving = False
+        self._write_lock = threading.Lock()
+
+        # key -> (created_at, value)
+        self._entries: "OrderedDict[Tuple[int, ...], Tuple[float, Any]]" = OrderedDict()
+        self._index: Dict[int, Tuple[List[Tuple[int, ...]], np.ndarray]] = {}
+        self._index_stale = True
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        self._load()
+
+    def get(self, hashes: Tuple[int, ...]) -> Optional[Any]:
+        if not hashes:
+            return None
+
+        with self._lock:
+            if self._index_stale:
+                self._rebuild_index()
+
+            keys, matrix = self._index.get(len(hashes), ([], None))
+            if not keys:
+                self.misses += 1
+                return None
+
+            per_frame = hamming_distances(hashes, matrix)
+            # A window counts only if no single frame is too far off; one changed frame is a different play
+            distances = np.where(per_frame.max(axis=1) <= self.max_distance, per_frame.sum(axis=1), np.iinfo(np.int64).max)
+            best = int(np.argmin(distances))
+            if per_frame[best].max() > self.max_distance:
+                self.misses += 1
+                return None
+
+            key = keys[best]
+            created_at, value = self._entries[key]
+            if time.time() - created_at > self.ttl_seconds:
+                del self._entries[key]
+                self._index_stale = True
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            logger.info(f"[PHASH CACHE] {self.namespace} hit (distance {int(distances[best])})")
+            return value
+
+    def set(self, hashes: Tuple[int, ...], value: Any) -> None:
+        if not hashes:
+            return
+
+        with self._lock:
+            self._entries[tuple(hashes)] = (time.time(), value)
+            self._entries.move_to_end(tuple(hashes))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._index_stale = True
+            self._dirty = True
+
+            if self.persist_path and not self._saving and time.time() - self._last_save >= self._save_interval:
+                self._saving = True
+                self._dirty = False
+                self._last_save = time.time()
+                entries = list(self._entries.items())
+                threading.Thread(target=self._write_in_background, args=(entries,), daemon=True).start()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def save(self) -> None:
+        """Writes pending entries now (used at shutdown)."""
+        with self._lock:
+            if not self.persist_path or not self._dirty:
+                return
+            self._dirty = False
+            entries = list(self._entries.items())
+        if not self._write(entries):
+            self._dirty = True
+
+    def _rebuild_index(self) -> None:
+        grouped: Dict[int, List[Tuple[int, ...]]] = {}
+        for key in self._entries:
+            grouped.setdefault(len(key), []).append(key)
+
+        self._index = {
+            length: (keys, np.array(keys, dtype=np.uint64).reshape(len(keys), length))
+            for length, keys in grouped.items()
+        }
+        self._index_stale = False
+
+    def _write_in_background(self, entries: List[Tuple[Tuple[int, ...], Tuple[float, Any]]]) -> None:
+        try:
+            if not self._write(entries):
+                self._dirty = True
+        finally:
+            self._saving = False
+
+    def _write(self, entries: List[Tuple[Tuple[int, ...], Tuple[float, Any]]]) -> bool:
+        with self._write_lock:
+            try:
+                os.makedirs(os.path.dirname(self.persist_path) or ".", exist_ok=True)
+                payload = [
+                    {"hashes": [str(h) for h in key], "created_at": created_at, "value": value}
+                    for key, (created_at, value) in entries
+                ]
+                tmp_path = f"{self.persist_path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(payload, f)
+                os.replace(tmp_path, self.persist_path)
+                return True
+            except Exception as e:
+                logger.warning(f"[PHASH CACHE] Could not persist {self.namespace}: {e}")
+                return False
+
+    def _load(self) -> None:
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            now = time.time()
+            for item in payload[-self.max_entries:]:
+                if now - item["created_at"] > self.ttl_seconds:
+                    continue
+                key = tuple(int(h) for h in item["hashes"])
+                self._entries[key] = (item["created_at"], item["value"])
+            self._index_stale = True
+            logger.info(f"[PHASH CACHE] Loaded {len(self._entries)} {self.namespace} entries from {self.persist_path}")
+        except Exception as e:
+            logger.warning(f"[PHASH CACHE] Could not load {self.persist_path}: {e}")
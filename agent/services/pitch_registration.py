@@ -0,0 +1,172 @@
+import cv2
+import numpy as np
+import threading
+from collections import OrderedDict
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ShotState:
+    """Homography estimated for the current shot plus the frame signature it was built on."""
+
+    def __init__(self, homography: np.ndarray, signature: np.ndarray):
+        self.homography = homography
+        self.signature = signature
+        self.frames_reused = 0
+
+
+class PitchRegistration:
+    """
+    Maps pixel positions into normalized pitch coordinates.
+
+    - Segments the pitch with a green mask and finds line markings inside it
+    - Builds a homography from the visible pitch quadrilateral (far touchline refined from lines)
+    - Reuses the homography for every frame of the same shot; a colour-histogram
+      drop marks a scene cut and triggers re-estimation
+
+    Output coordinates are 0-1 across the visible pitch: x left to right, y from the
+    far touchline (0) to the near edge of the view (1).
+    """
+
+    def __init__(self, scene_cut_threshold: float = 0.65, min_pitch_fraction: float = 0.2, max_videos: int = 64):
+        self.scene_cut_threshold = scene_cut_threshold
+        self.min_pitch_fraction = min_pitch_fraction
+        self.max_videos = max_videos
+
+        self._shots: "OrderedDict[str, ShotState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_homography(self, image: np.ndarray, video_id: Optional[str] = None) -> Optional[np.ndarray]:
+        signature = self._frame_signature(image)
+
+        if video_id:
+            with self._lock:
+                shot = self._shots.get(video_id)
+            if shot is not None:
+                similarity = cv2.compareHist(shot.signature, signature, cv2.HISTCMP_CORREL)
+                if similarity >= self.scene_cut_threshold:
+                    shot.frames_reused += 1
+                    return shot.homography
+                logger.info(f"[PITCH] Scene cut detected for {video_id} (similarity {similarity:.2f})")
+
+        homography = self.estimate_homography(image)
+        if homography is not None and video_id:
+            with self._lock:
+                self._shots[video_id] = ShotState(homography, signature)
+                self._shots.move_to_end(video_id)
+                while len(self._shots) > self.max_videos:
+                    self._shots.popitem(last=False)
+        return homography
+
+    def estimate_homography(self, image: np.ndarray) -> Optional[np.ndarray]:
+        height, width = image.shape[:2]
+        mask = self._pitch_mask(image)
+        if mask.mean() / 255.0 < self.min_pitch_fraction:
+            return None
+
+        ys, xs = np.nonzero(mask)
+        top = int(ys.min())
+        bottom = int(ys.max())
+
+        far_line = self._far_touchline(image, mask, top, bottom)
+        if far_line is not None:
+            (lx1, ly1), (lx2, ly2) = far_line
+            slope = (ly2 - ly1) / (lx2 - lx1) if lx2 != lx1 else 0.0
+            top_left_y = ly1 - slope * lx1
+            top_right_y = ly1 + slope * (width - 1 - lx1)
+        else:
+            top_left_y = top_right_y = float(top)
+
+        top_y = int(np.clip(round((top_left_y + top_right_y) / 2), 0, height - 1))
+        top_x = self._row_extent(mask, top_y)
+        bottom_x = self._row_extent(mask, bottom)
+        if top_x is None or bottom_x is None:
+            return None
+
+        src = np.float32([
+            [top_x[0], top_left_y],
+            [top_x[1], top_right_y],
+            [bottom_x[1], bottom],
+            [bottom_x[0], bottom],
+        ])
+        dst = np.float32([[0, 0], [1, 0], [1, 1], [0, 1]])
+
+        try:
+            return cv2.getPerspectiveTransform(src, dst)
+        except cv2.error as e:
+            logger.warning(f"[PITCH] Could not estimate homography: {e}")
+            return None
+
+    @staticmethod
+    def to_pitch(points: np.ndarray, homography: np.ndarray) -> np.ndarray:
+        """Projects an (N, 2) array of pixel points in one call and clips to the pitch."""
+        if len(points) == 0:
+            return np.empty((0, 2), dtype=np.float32)
+        projected = cv2.perspectiveTransform(points.reshape(-1, 1, 2).astype(np.float32), homography)
+        return np.clip(projected.reshape(-1, 2), 0.0, 1.0)
+
+    def forget(self, video_id: str) -> None:
+        with self._lock:
+            self._shots.pop(video_id, None)
+
+    @staticmethod
+    def _frame_signature(image: np.ndarray) -> np.ndarray:
+        small = cv2.resize(image, (64, 36), interpolation=cv2.INTER_AREA)
+        hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+        hist = cv2.calcHist([hsv], [0, 1], None, [30, 16], [0, 180, 0, 256])
+        return cv2.normalize(hist, hist).flatten()
+
+    @staticmethod
+    def _pitch_mask(image: np.ndarray) -> np.ndarray:
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv, (35, 40, 40), (85, 255, 255))
+        kernel = np.ones((15, 15), np.uint8)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+
+        # Keep the largest green region only (crowd and ad boards can be green too)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return mask
+        largest = max(contours, key=cv2.contourArea)
+        pitch = np.zeros_like(mask)
+        cv2.drawContours(pitch, [cv2.convexHull(largest)], -1, 255, thickness=cv2.FILLED)
+        return pitch
+
+    @staticmethod
+    def _far_touchline(image: np.ndarray, mask: np.ndarray, top: int, bottom: int):
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        white = cv2.inRange(hsv, (0, 0, 170), (180, 60, 255))
+        markings = cv2.bitwise_and(white, mask)
+
+        lines = cv2.HoughLinesP(
+            markings, 1, np.pi / 180, threshold=60,
+            minLineLength=image.shape[1] // 4, maxLineGap=20
+        )
+        if lines is None:
+            return None
+
+        segments = lines.reshape(-1, 4).astype(np.float32)
+        dx = segments[:, 2] - segments[:, 0]
+        dy = segments[:, 3] - segments[:, 1]
+        angle = np.degrees(np.arctan2(np.abs(dy), np.abs(dx)))
+        mid_y = (segments[:, 1] + segments[:, 3]) / 2
+        length = np.hypot(dx, dy)
+
+        # Far touchline: near-horizontal, in the upper part of the pitch
+        candidates = (angle < 20) & (mid_y < top + 0.4 * (bottom - top))
+        if not candidates.any():
+            return None
+
+        best = segments[candidates][np.argmax(length[candidates])]
+        if best[0] > best[2]:
+            best = best[[2, 3, 0, 1]]
+        return (float(best[0]), float(best[1])), (float(best[2]), float(best[3]))
+
+    @staticmethod
+    def _row_extent(mask: np.ndarray, row: int):
+        cols = np.flatnonzero(mask[row])
+        if cols.size == 0:
+            return None
+        return int(cols[0]), int(cols[-1])
@@ -2,7 +2,10 @@
 import cv2
 import numpy as np
 import base64
-from typing import List, Dict, Any, Optional
+import os
+import threading
+import time
+from typing import List, Dict, Any, Optional, Union
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,13 +20,34 @@ except ImportError:
 
 
 class PoseEstimator:
-    
-    
+    """
+    MediaPipe pose estimation with latency-budgeted model tiers.
+
+    - Keeps lite, full and heavy graphs (model_complexity 0/1/2)
+    - Picks the heaviest tier whose recent latency fits the caller's deadline
+    - Falls back to lighter tiers when a graph is busy or the budget is tight
+    """
+
+    TIERS = ["lite", "full", "heavy"]
+    DEFAULT_LATENCY = {"lite": 0.05, "full": 0.12, "heavy": 0.35}
+
     def __init__(self):
         self.mp_pose = None
         self.pose = None
         self.mp_drawing = None
         self.initialized = False
+
+        max_tier = os.getenv("POSE_MAX_TIER", "heavy").lower()
+        self.max_tier = max_tier if max_tier in self.TIERS else "heavy"
+        self.budget_fraction = float(os.getenv("POSE_BUDGET_FRACTION", "0.25"))
+        self.latency_safety = 1.5
+
+        self.graphs: Dict[str, Any] = {}
+        self._graph_locks: Dict[str, threading.Lock] = {tier: threading.Lock() for tier in self.TIERS}
+        self._stats_lock = threading.Lock()
+        self._latency: Dict[str, float] = dict(self.DEFAULT_LATENCY)
+        self._in_flight: Dict[str, int] = {tier: 0 for tier in self.TIERS}
+
         self._initialize_model()
     
     def _initialize_model(self):
@@ -44,32 +68,96 @@ class PoseEstimator:
                 return
             
 
-            self.pose = self.mp_pose.Pose(
-                static_image_mode=False,
-                model_complexity=2,
-                enable_segmentation=False,
-                min_detection_confidence=0.5,
-                min_tracking_confidence=0.5
-            )
+            for complexity, tier in enumerate(self.TIERS[:self.TIERS.index(self.max_tier) + 1]):
+                try:
+                    self.graphs[tier] = self.mp_pose.Pose(
+                        static_image_mode=False,
+                        model_complexity=complexity,
+                        enable_segmentation=False,
+                        min_detection_confidence=0.5,
+                        min_tracking_confidence=0.5
+                    )
+                except Exception as e:
+                    logger.warning(f"[POSE_ESTIMATOR] Could not build {tier} graph: {e}")
+
+            if not self.graphs:
+                raise RuntimeError("no pose graph could be built")
+
+            self.pose = self.graphs[self.TIERS[max(self.TIERS.index(t) for t in self.graphs)]]
             self.initialized = True
-            logger.info("[POSE_ESTIMATOR] MediaPipe Pose initialized successfully")
+            logger.info(f"[POSE_ESTIMATOR] MediaPipe Pose initialized successfully (tiers: {', '.join(self.graphs)})")
         except Exception as e:
             logger.error(f"[POSE_ESTIMATOR] Failed to initialize MediaPipe: {e}")
             logger.error("[POSE_ESTIMATOR] Try: pip install --upgrade mediapipe")
             import traceback
             traceback.print_exc()
             self.initialized = False
+
+    def select_tier(self, deadline: Optional[float] = None) -> str:
+        """
+        Picks a tier for one request. `deadline` is an absolute time.monotonic() value.
+        """
+        available = [tier for tier in self.TIERS if tier in self.graphs]
+        if not available:
+            return self.TIERS[0]
+
+        budget = None
+        if deadline is not None:
+            budget = max(0.0, deadline - time.monotonic()) * self.budget_fraction
+
+        with self._stats_lock:
+            for tier in reversed(available):
+                # A busy graph means waiting for the previous call on top of our own
+                expected = self._latency[tier] * (1 + self._in_flight[tier]) * self.latency_safety
+                if budget is None and self._in_flight[tier] == 0:
+                    return tier
+                if budget is not None and expected <= budget:
+                    return tier
+
+        return available[0]
+
+    def warmup(self, image: np.ndarray) -> Dict[str, float]:
+        """
+        Runs every graph twice on a dummy frame. The first pass pays for graph
+        building; the second seeds the latency estimate used by select_tier.
+        """
+        timings = {}
+        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        for tier, graph in self.graphs.items():
+            with self._graph_locks[tier]:
+                started = time.monotonic()
+                graph.process(image_rgb)
+                timings[tier] = (time.monotonic() - started) * 1000.0
+
+                started = time.monotonic()
+                graph.process(image_rgb)
+                elapsed = time.monotonic() - started
+            with self._stats_lock:
+                self._latency[tier] = elapsed
+        return timings
+
+    def latency_stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            return {tier: round(self._latency[tier], 4) for tier in self.graphs}
+
+    def _record_latency(self, tier: str, elapsed: float) -> None:
+        with self._stats_lock:
+            self._latency[tier] = 0.8 * self._latency[tier] + 0.2 * elapsed
     
-    def estimate_pose(self, base64_image: str) -> Dict[str, Any]:
+    def estimate_pose(self, image_or_base64: Union[str, np.ndarray], deadline: Optional[float] = None) -> Dict[str, Any]:
         
         if not self.initialized:
             return self._empty_pose()
         
+        tier = self.select_tier(deadline)
+        
         try:
-
-            image_bytes = base64.b64decode(base64_image)
-            nparr = np.frombuffer(image_bytes, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            if isinstance(image_or_base64, np.ndarray):
+                image = image_or_base64
+            else:
+                image_bytes = base64.b64decode(image_or_base64)
+                nparr = np.frombuffer(image_bytes, np.uint8)
+                image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
             
             if image is None:
                 logger.error("[POSE_ESTIMATOR] Failed to decode image")
@@ -79,20 +167,29 @@ class PoseEstimator:
             image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
             
 
+            with self._stats_lock:
+                self._in_flight[tier] += 1
             try:
-                results = self.pose.process(image_rgb)
+                with self._graph_locks[tier]:
+                    started = time.monotonic()
+                    results = self.graphs[tier].process(image_rgb)
+                    self._record_latency(tier, time.monotonic() - started)
             except ValueError as e:
                 if "Packet timestamp mismatch" in str(e) or "CalculatorGraph" in str(e):
 
                     logger.warning(f"[POSE_ESTIMATOR] Timestamp error (non-fatal, parallel processing): {e}")
-                    return self._empty_pose()
+                    return self._empty_pose(tier)
                 else:
                     raise
+            finally:
+                with self._stats_lock:
+                    self._in_flight[tier] -= 1
             
             poses_data = {
                 'poses': [],
                 'actions': [],
-                'summary': ''
+                'summary': '',
+                'model_tier': tier
             }
             
             if results.pose_landmarks:
@@ -131,14 +228,14 @@ class PoseEstimator:
             else:
                 poses_data['summary'] = "No poses detected"
             
-            logger.info(f"[POSE_ESTIMATOR] {poses_data['summary']}")
+            logger.info(f"[POSE_ESTIMATOR] {poses_data['summary']} (tier: {tier})")
             return poses_data
             
         except Exception as e:
             logger.error(f"[POSE_ESTIMATOR] Pose estimation error: {e}")
             import traceback
             traceback.print_exc()
-            return self._empty_pose()
+            return self._empty_pose(tier)
     
     def _detect_action(self, keypoints: Dict[str, Dict[str, float]]) -> Optional[str]:
         
@@ -182,22 +279,23 @@ class PoseEstimator:
             logger.error(f"[POSE_ESTIMATOR] Action detection error: {e}")
             return None
     
-    def estimate_pose_batch(self, base64_images: List[str]) -> List[Dict[str, Any]]:
+    def estimate_pose_batch(self, base64_images: List[str], deadline: Optional[float] = None) -> List[Dict[str, Any]]:
         
         if not self.initialized:
             return [self._empty_pose() for _ in base64_images]
         
         results = []
         for base64_image in base64_images:
-            pose = self.estimate_pose(base64_image)
+            pose = self.estimate_pose(base64_image, deadline)
             results.append(pose)
         
         return results
     
-    def _empty_pose(self) -> Dict[str, Any]:
+    def _empty_pose(self, tier: Optional[str] = None) -> Dict[str, Any]:
         
         return {
             'poses': [],
             'actions': [],
-            'summary': 'No poses detected'
+            'summary': 'No poses detected',
+            'model_tier': tier
         }
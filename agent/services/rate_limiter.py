@@ -0,0 +1,208 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Any, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(RuntimeError):
+    pass
+
+
+class TokenBucket:
+    """Continuous-refill bucket; `capacity` units per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        # Requests larger than the bucket only wait for a full bucket
+        needed = min(amount, self.capacity) - self.level
+        return 0.0 if needed <= 0 else needed / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= amount
+
+    def give(self, amount: float) -> None:
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class _Waiter:
+    __slots__ = ("future", "tokens", "deadline", "priority")
+
+    def __init__(self, future: asyncio.Future, tokens: int, deadline: Optional[float], priority: int):
+        self.future = future
+        self.tokens = tokens
+        self.deadline = deadline
+        self.priority = priority
+
+
+class GeminiScheduler:
+    """
+    Central admission control in front of Gemini.
+
+    - Requests/minute and tokens/minute buckets (GEMINI_RPM, GEMINI_TPM)
+    - Strict priority classes: chat > live > analyze > background
+    - Waiters whose deadline has passed, or whose caller was cancelled by its
+      own timeout, are dropped before they consume quota
+    """
+
+    PRIORITIES = {"chat": 0, "live": 1, "analyze": 2, "background": 3}
+
+    CALL_SITE_PRIORITY = {
+        "chat": "chat",
+        "chat_vision": "chat",
+        "live_vision": "live",
+        "commentary_enhance": "live",
+        "analyze_vision": "analyze",
+        "analogy": "analyze",
+        "nfl_analogy": "analyze",
+        "nfl_broadcast": "analyze",
+        "audio_transcription": "analyze",
+    }
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self.requests = TokenBucket(requests_per_minute or float(os.getenv("GEMINI_RPM", "60")))
+        self.tokens = TokenBucket(tokens_per_minute or float(os.getenv("GEMINI_TPM", "1000000")))
+
+        self._queue = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.admitted = {name: 0 for name in self.PRIORITIES}
+        self.dropped = {name: 0 for name in self.PRIORITIES}
+        self.total_wait = {name: 0.0 for name in self.PRIORITIES}
+
+    def priority_for(self, call_site: str, priority: Optional[str] = None) -> str:
+        if priority in self.PRIORITIES:
+            return priority
+        return self.CALL_SITE_PRIORITY.get(call_site, "background")
+
+    async def acquire(self, priority: str, tokens: int, deadline: Optional[float] = None) -> None:
+        """
+        Waits until the request may be sent. `deadline` is an absolute time.monotonic() value.
+        Raises DeadlineExceeded if the deadline passes while queued.
+        """
+        if deadline is not None and time.monotonic() >= deadline:
+            self.dropped[priority] += 1
+            raise DeadlineExceeded(f"{priority} request expired before scheduling")
+
+        loop = asyncio.get_event_loop()
+        waiter = _Waiter(loop.create_future(), tokens, deadline, self.PRIORITIES[priority])
+        heapq.heappush(self._queue, (waiter.priority, next(self._seq), waiter))
+        enqueued = time.monotonic()
+        self._pump()
+
+        try:
+            if deadline is None:
+                await waiter.future
+            else:
+                await asyncio.wait_for(waiter.future, timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self._abandon(waiter, priority)
+            raise DeadlineExceeded(f"{priority} request expired while queued")
+        except asyncio.CancelledError:
+            # Caller's own timeout fired; _pump skips futures that are already done
+            self._abandon(waiter, priority)
+            raise
+        self.total_wait[priority] += time.monotonic() - enqueued
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        if actual_tokens is not None and actual_tokens > estimated_tokens:
+            self.tokens.take(actual_tokens - estimated_tokens)
+
+    @staticmethod
+    def estimate_tokens(contents: Any, max_output_tokens: Optional[int]) -> int:
+        items = contents if isinstance(contents, list) else [contents]
+        estimate = 0
+        for item in items:
+            if isinstance(item, str):
+                estimate += len(item) // 4 + 1
+            else:
+                # Gemini bills an image part at roughly 258 tokens
+                estimate += 258
+        return estimate + (max_output_tokens or 256)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": sum(1 for _, _, w in self._queue if not w.future.done()),
+            "admitted": dict(self.admitted),
+            "dropped": dict(self.dropped),
+            "avg_wait_ms": {
+                name: round(self.total_wait[name] / self.admitted[name] * 1000.0, 1) if self.admitted[name] else 0.0
+                for name in self.PRIORITIES
+            },
+            "requests_available": round(self.requests.level, 1),
+            "tokens_available": round(self.tokens.level),
+        }
+
+    def _abandon(self, waiter: _Waiter, priority: str) -> None:
+        """
+        Counts a waiter whose caller gave up. If _pump admitted it in the same loop
+        iteration the timeout fired, its quota was already taken: hand it back.
+        """
+        future = waiter.future
+        if future.done() and not future.cancelled() and future.exception() is None:
+            self.requests.give(1)
+            self.tokens.give(waiter.tokens)
+            self.admitted[priority] -= 1
+        self.dropped[priority] += 1
+        self._pump()
+
+    def _pump(self) -> None:
+        while self._queue:
+            _, _, waiter = self._queue[0]
+            name = self._priority_name(waiter.priority)
+
+            if waiter.future.done():
+                heapq.heappop(self._queue)
+                continue
+
+            if waiter.deadline is not None and time.monotonic() >= waiter.deadline:
+                heapq.heappop(self._queue)
+                self.dropped[name] += 1
+                waiter.future.set_exception(DeadlineExceeded(f"{name} request expired while queued"))
+                continue
+
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(waiter.tokens))
+            if wait > 0:
+                self._schedule(wait)
+                return
+
+            heapq.heappop(self._queue)
+            self.requests.take(1)
+            self.tokens.take(waiter.tokens)
+            self.admitted[name] += 1
+            waiter.future.set_result(None)
+
+    def _schedule(self, delay: float) -> None:
+        if self._timer is not None and not self._timer.cancelled():
+            return
+        loop = asyncio.get_event_loop()
+
+        def fire():
+            self._timer = None
+            self._pump()
+
+        self._timer = loop.call_later(delay, fire)
+
+    def _priority_name(self, value: int) -> str:
+        for name, v in self.PRIORITIES.items():
+            if v == value:
+                return name
+        return "background"
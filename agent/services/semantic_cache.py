@@ -0,0 +1,223 @@
+import os
+import re
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_SUFFIXES = ("ing", "ers", "er", "ed", "es", "s")
+# Function words, plus commentary filler that never changes what happened ("up the pitch")
+_STOPWORDS = {
+    "the", "a", "an", "of", "to", "up", "in", "on", "at", "and", "is", "are", "with", "for", "their", "his", "its",
+    "it", "pitch", "field",
+}
+
+# Outcome of the described event; texts only match when they name the same outcomes
+_OUTCOMES = {
+    "concede": re.compile(r"\bconced\w*|\bown goal"),
+    "score": re.compile(r"\bscor(e|es|ed|ing)\b|\bgoals?\b|\bnet(s|ted)?\b|\bequali[sz]\w*"),
+    "save": re.compile(r"\bsav(e|es|ed|ing)\b|\bdenie[sd]\b|\bparr(y|ies|ied)\b"),
+    "miss": re.compile(r"\bmiss(es|ed)?\b|\bwide\b|\bover the bar\b|\b(post|crossbar|woodwork)\b|\boff target\b"),
+    "offside": re.compile(r"\boff-?side\b"),
+    "card": re.compile(r"\b(yellow|red) card\b|\bbooked\b|\bbooking\b|\bsent off\b"),
+}
+
+
+_Words = Tuple[Tuple[str, FrozenSet[str]], ...]
+
+
+class SemanticCache:
+    """
+    Near-duplicate cache for short commentary text, with no external embedding service.
+
+    - Text is normalized (case, punctuation, stopwords, light suffix stripping) into
+      word stems; their character 3-grams feed a MinHash signature
+    - A MinHash LSH index (bands of the signature -> buckets) finds candidates; each
+      bucket keeps its `bucket_size` newest entries and only the `max_candidates`
+      sharing the most bands are scored, so a lookup costs about the same at any size
+    - Candidates are scored by word overlap: the share of the shorter text's stems found
+      in the longer one (precision) and of the longer text's stems found in the shorter
+      one (recall), combined as an F-score weighted towards precision (beta 0.5). Stems
+      match when equal or, from four letters, when most of their 3-grams agree
+      ("keeper" / "goalkeeper"). Added detail ("Real Madrid ... up the pitch") costs
+      little; a swapped word (left/right, one team for another) costs a lot
+    - A hit needs `threshold` and the same outcome (score, concede, save, miss, offside,
+      card) - a wrong cached answer is worse than a miss. The 0.9 default separates the
+      labelled pairs in tests/test_semantic_cache.py
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        threshold: Optional[float] = None,
+        num_perm: int = 64,
+        bands: int = 16,
+        max_entries: Optional[int] = None,
+        bucket_size: int = 64,
+        max_candidates: int = 32,
+    ):
+        self.namespace = namespace
+        self.threshold = threshold if threshold is not None else float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+        self.max_entries = max_entries or int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "200000"))
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.bucket_size = bucket_size
+        self.max_candidates = max_candidates
+
+        rng = np.random.default_rng(1)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        # entry_id -> (stems with their 3-grams, outcomes, band keys, value)
+        self._entries: "OrderedDict[int, Tuple[_Words, FrozenSet[str], List[int], Any]]" = OrderedDict()
+        self._buckets: List[Dict[int, List[int]]] = [dict() for _ in range(bands)]
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, text: str) -> Optional[Any]:
+        words = self._words(text)
+        if not words:
+            return None
+
+        band_keys = self._band_keys(words)
+        outcomes = self.outcomes(text)
+        with self._lock:
+            votes = Counter()
+            for band, key in enumerate(band_keys):
+                votes.update(self._buckets[band].get(key, ()))
+
+            best_id, best_score = None, 0.0
+            for entry_id, _ in votes.most_common(self.max_candidates):
+                entry_words, entry_outcomes, _, _ = self._entries[entry_id]
+                if entry_outcomes != outcomes:
+                    continue
+                score = self.similarity(words, entry_words)
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            logger.info(f"[SEMANTIC CACHE] {self.namespace} hit (similarity {best_score:.2f})")
+            return self._entries[best_id][3]
+
+    def add(self, text: str, value: Any) -> None:
+        words = self._words(text)
+        if not words:
+            return
+
+        band_keys = self._band_keys(words)
+        outcomes = self.outcomes(text)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (words, outcomes, band_keys, value)
+            for band, key in enumerate(band_keys):
+                bucket = self._buckets[band].setdefault(key, [])
+                bucket.append(entry_id)
+                if len(bucket) > self.bucket_size:
+                    del bucket[0]
+
+            while len(self._entries) > self.max_entries:
+                self._evict_oldest()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "threshold": self.threshold,
+        }
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        words = re.sub(r"[^a-z0-9\s]", " ", text.lower()).split()
+        stems = []
+        for word in words:
+            if word in _STOPWORDS:
+                continue
+            for suffix in _SUFFIXES:
+                if len(word) > len(suffix) + 2 and word.endswith(suffix):
+                    word = word[: -len(suffix)]
+                    # "sitting" -> "sit", "stopped" -> "stop"
+                    if suffix != "s" and suffix != "es" and len(word) > 3 and word[-1] == word[-2] and word[-1] not in "aeiou":
+                        word = word[:-1]
+                    break
+            stems.append(word)
+        return " ".join(stems)
+
+    @staticmethod
+    def outcomes(text: str) -> FrozenSet[str]:
+        lowered = text.lower()
+        return frozenset(name for name, pattern in _OUTCOMES.items() if pattern.search(lowered))
+
+    @classmethod
+    def similarity(cls, a: "_Words", b: "_Words") -> float:
+        """Precision-weighted F-score (beta 0.5) of matching stems, precision taken on the shorter text."""
+        if len(a) > len(b):
+            a, b = b, a
+        precision = cls._matched(a, b) / len(a)
+        if not precision:
+            return 0.0
+        recall = cls._matched(b, a) / len(b)
+        return 1.25 * precision * recall / (0.25 * precision + recall)
+
+    @staticmethod
+    def _matched(words: "_Words", others: "_Words") -> int:
+        exact = {other for other, _ in others}
+        fuzzy = [(len(grams), grams) for other, grams in others if len(other) >= 4]
+        count = 0
+        for word, grams in words:
+            if word in exact:
+                count += 1
+            elif len(word) >= 4:
+                size = len(grams)
+                for other_size, other_grams in fuzzy:
+                    if len(grams & other_grams) >= 0.6 * (size if size < other_size else other_size):
+                        count += 1
+                        break
+        return count
+
+    def _words(self, text: str) -> "_Words":
+        words = []
+        for word in dict.fromkeys(self.normalize(text).split()):
+            padded = f" {word} "
+            words.append((word, frozenset(padded[i:i + 3] for i in range(len(padded) - 2))))
+        return tuple(words)
+
+    def _band_keys(self, words: "_Words") -> List[int]:
+        terms = frozenset().union(*(grams for _, grams in words))
+        hashes = np.array([zlib.crc32(t.encode("utf-8")) for t in terms], dtype=np.uint64)
+        # (a * x + b) mod p for every permutation and shingle at once; uint64
+        # wrap-around on the product only reshuffles the hash family
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % np.uint64(_MERSENNE_PRIME)
+        signature = permuted.min(axis=1)
+        return [
+            hash(signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def _evict_oldest(self) -> None:
+        entry_id, (_, _, band_keys, _) = self._entries.popitem(last=False)
+        for band, key in enumerate(band_keys):
+            bucket = self._buckets[band].get(key)
+            if bucket and entry_id in bucket:
+                bucket.remove(entry_id)
+                if not bucket:
+                    del self._buckets[band][key]
@@ -0,0 +1,172 @@
+import cv2
+import numpy as np
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TeamPalette:
+    """Two learned kit colours (histogram centroids) for one video."""
+
+    def __init__(self, centroids: np.ndarray, radius: float):
+        self.centroids = centroids
+        self.radius = radius
+        self.fitted_at = time.time()
+
+
+class TeamClassifier:
+    """
+    Splits detected players into two teams by jersey colour.
+
+    - Samples the torso of each player box and builds a hue/saturation histogram
+    - Learns two kit centroids with k-means once per video, then only assigns
+    - Players far from both centroids (referees, keepers) are reported as outliers
+    """
+
+    OUTLIER = -1
+
+    def __init__(
+        self,
+        hue_bins: int = 16,
+        sat_bins: int = 4,
+        min_players_to_fit: int = 6,
+        outlier_factor: float = 2.5,
+        max_videos: int = 64,
+    ):
+        self.hue_bins = hue_bins
+        self.sat_bins = sat_bins
+        self.min_players_to_fit = min_players_to_fit
+        self.outlier_factor = outlier_factor
+        self.max_videos = max_videos
+
+        self._palettes: "OrderedDict[str, TeamPalette]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def classify(self, image: np.ndarray, players: List[Dict[str, Any]], video_id: Optional[str] = None) -> np.ndarray:
+        """
+        Returns one label per player: 0 or 1 for the two teams, OUTLIER otherwise.
+        """
+        if not players:
+            return np.empty(0, dtype=np.int32)
+
+        features, valid = self._torso_histograms(image, players)
+        labels = np.full(len(players), self.OUTLIER, dtype=np.int32)
+        if not valid.any():
+            return labels
+
+        palette = self._get_palette(video_id)
+        if palette is None:
+            palette = self._fit_palette(features[valid])
+            if palette is None:
+                return labels
+            if video_id and valid.sum() >= self.min_players_to_fit:
+                self._store_palette(video_id, palette)
+
+        assigned, distances = self._assign(features[valid], palette.centroids)
+        assigned[distances > palette.radius] = self.OUTLIER
+        labels[valid] = assigned
+        return labels
+
+    def forget(self, video_id: str) -> None:
+        with self._lock:
+            self._palettes.pop(video_id, None)
+
+    def _get_palette(self, video_id: Optional[str]) -> Optional[TeamPalette]:
+        if not video_id:
+            return None
+        with self._lock:
+            palette = self._palettes.get(video_id)
+            if palette is not None:
+                self._palettes.move_to_end(video_id)
+            return palette
+
+    def _store_palette(self, video_id: str, palette: TeamPalette) -> None:
+        with self._lock:
+            self._palettes[video_id] = palette
+            self._palettes.move_to_end(video_id)
+            while len(self._palettes) > self.max_videos:
+                self._palettes.popitem(last=False)
+        logger.info(f"[TEAM CLASSIFIER] Learned kit palette for {video_id}")
+
+    def _torso_histograms(self, image: np.ndarray, players: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+        height, width = image.shape[:2]
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+
+        n_bins = self.hue_bins * self.sat_bins
+        features = np.zeros((len(players), n_bins), dtype=np.float32)
+        valid = np.zeros(len(players), dtype=bool)
+
+        for i, player in enumerate(players):
+            bbox = player['bbox']
+            w = bbox['x2'] - bbox['x1']
+            h = bbox['y2'] - bbox['y1']
+
+            # Upper-body band, trimmed at the sides to avoid arms and background
+            x1 = int(np.clip(bbox['x1'] + 0.25 * w, 0, width))
+            x2 = int(np.clip(bbox['x2'] - 0.25 * w, 0, width))
+            y1 = int(np.clip(bbox['y1'] + 0.15 * h, 0, height))
+            y2 = int(np.clip(bbox['y1'] + 0.50 * h, 0, height))
+            if x2 - x1 < 2 or y2 - y1 < 2:
+                continue
+
+            crop = hsv[y1:y2, x1:x2].reshape(-1, 3)
+            hue = crop[:, 0].astype(np.int32)
+            sat = crop[:, 1].astype(np.int32)
+
+            # Drop pitch pixels that leak into the crop
+            pitch = (hue >= 35) & (hue <= 85) & (sat > 60)
+            hue = hue[~pitch]
+            sat = sat[~pitch]
+            if hue.size < 8:
+                continue
+
+            idx = (hue * self.hue_bins // 180) * self.sat_bins + (sat * self.sat_bins // 256)
+            hist = np.bincount(idx, minlength=n_bins).astype(np.float32)
+            features[i] = hist / hist.sum()
+            valid[i] = True
+
+        return features, valid
+
+    def _fit_palette(self, features: np.ndarray) -> Optional[TeamPalette]:
+        if len(features) < 2:
+            return None
+
+        centroids = self._kmeans(features, k=2)
+        _, distances = self._assign(features, centroids)
+        radius = float(distances.mean() + self.outlier_factor * distances.std())
+        return TeamPalette(centroids=centroids, radius=max(radius, 1e-3))
+
+    def _kmeans(self, features: np.ndarray, k: int, iterations: int = 20) -> np.ndarray:
+        # Deterministic farthest-point seeding keeps palettes stable between runs
+        first = int(np.argmax(((features - features.mean(axis=0)) ** 2).sum(axis=1)))
+        centroids = [features[first]]
+        for _ in range(1, k):
+            dist = np.min(
+                ((features[:, None, :] - np.asarray(centroids)[None, :, :]) ** 2).sum(axis=2),
+                axis=1,
+            )
+            centroids.append(features[int(np.argmax(dist))])
+        centroids = np.asarray(centroids, dtype=np.float32)
+
+        for _ in range(iterations):
+            labels, _ = self._assign(features, centroids)
+            updated = centroids.copy()
+            for c in range(k):
+                members = features[labels == c]
+                if len(members):
+                    updated[c] = members.mean(axis=0)
+            if np.allclose(updated, centroids, atol=1e-5):
+                break
+            centroids = updated
+
+        return centroids
+
+    @staticmethod
+    def _assign(features: np.ndarray, centroids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        dist = np.sqrt(((features[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2))
+        labels = np.argmin(dist, axis=1).astype(np.int32)
+        return labels, dist[np.arange(len(features)), labels]
@@ -1,8 +1,13 @@
 import os
+import time
 import httpx
 import asyncio
 from typing import Optional
 
+from services.circuit_breaker import get_circuit_breaker
+from services.usage_tracker import get_usage_tracker
+from utils.standin import standin_base_url
+
 
 class TTSService:
     """
@@ -16,6 +21,14 @@ class TTSService:
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or os.getenv("ELEVENLABS_API_KEY")
         self.voice_id = os.getenv("ELEVENLABS_VOICE_ID", self.DEFAULT_VOICE_ID)
+        # ELEVENLABS_API_KEY=standin[:<url>] sends requests to the local stand-in server
+        base_url = standin_base_url(self.api_key)
+        self.api_url = f"{base_url}/v1/text-to-speech" if base_url else self.ELEVENLABS_API_URL
+        self.breaker = get_circuit_breaker("elevenlabs")
+        self.usage = get_usage_tracker()
+        self.model_id = os.getenv("ELEVENLABS_MODEL", "eleven_multilingual_v2")
+        # Used while the endpoint is over its USAGE_BUDGET_* (flash costs half per character)
+        self.budget_model_id = os.getenv("ELEVENLABS_BUDGET_MODEL", "eleven_flash_v2_5")
 
         if self.api_key:
             print("[TTS] ElevenLabs initialized")
@@ -44,7 +57,16 @@ class TTSService:
             print("[TTS] No API key available")
             return None
 
-        url = f"{self.ELEVENLABS_API_URL}/{self.voice_id}"
+        if not self.breaker.allow():
+            print("[TTS] ElevenLabs circuit open - skipping")
+            return None
+
+        url = f"{self.api_url}/{self.voice_id}"
+
+        model_id = self.model_id
+        if self.budget_model_id and self.budget_model_id != self.model_id and self.usage.over_budget():
+            model_id = self.budget_model_id
+            self.usage.record_downgrade("tts_model")
 
         headers = {
             "Accept": "audio/mpeg",
@@ -54,27 +76,48 @@ class TTSService:
 
         payload = {
             "text": text,
-            "model_id": "eleven_multilingual_v2",
+            "model_id": model_id,
             "voice_settings": {
                 "stability": 0.5,
                 "similarity_boost": 0.75
             }
         }
 
+        started = time.monotonic()
         try:
             async with httpx.AsyncClient(timeout=30.0) as client:
                 response = await client.post(url, json=payload, headers=headers)
-
-                if response.status_code == 200:
+                ok = response.status_code == 200
+                self.usage.record(
+                    "tts",
+                    "elevenlabs",
+                    model=payload["model_id"],
+                    input_tokens=len(text) if ok else 0,
+                    bytes_up=len(text.encode()),
+                    bytes_down=len(response.content) if ok else 0,
+                    latency=time.monotonic() - started,
+                    cache="miss" if ok else "error",
+                )
+
+                if ok:
+                    self.breaker.record_success()
                     print(f"[TTS] Successfully synthesized {len(text)} characters")
                     return response.content
                 else:
+                    # A rejected text is our problem, not an ElevenLabs outage
+                    if response.status_code in (400, 422):
+                        self.breaker.record_success()
+                    else:
+                        self.breaker.record_failure()
                     print(f"[TTS] API error: {response.status_code}")
                     return None
 
         except httpx.TimeoutException:
+            self.usage.record("tts", "elevenlabs", model=payload["model_id"], bytes_up=len(text.encode()), latency=time.monotonic() - started, cache="error")
+            self.breaker.record_failure()
             print("[TTS] Request timed out")
             return None
         except Exception as e:
+            self.breaker.record_failure()
             print(f"[TTS] Error: {e}")
             return None
@@ -0,0 +1,196 @@
+import os
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Endpoint and video id of the request being served; set by the HTTP middleware and the handlers
+_call_tags: ContextVar[Dict[str, str]] = ContextVar("usage_call_tags", default={})
+
+
+def tag_call(endpoint: Optional[str] = None, video_id: Optional[str] = None) -> None:
+    """Tags upstream calls made from here on (and in tasks started from here) with the request's endpoint/video."""
+    tags = dict(_call_tags.get())
+    if endpoint:
+        tags["endpoint"] = endpoint
+    if video_id:
+        tags["video_id"] = video_id
+    _call_tags.set(tags)
+
+
+class _Totals:
+    __slots__ = ("calls", "cache_hits", "errors", "input_tokens", "output_tokens", "cached_tokens",
+                 "bytes_up", "bytes_down", "latency_total", "latency_max")
+
+    def __init__(self):
+        self.calls = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cached_tokens = 0
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def add(self, record: Dict[str, Any]) -> None:
+        self.calls += 1
+        if record["cache"] == "hit":
+            self.cache_hits += 1
+        if record["cache"] == "error":
+            self.errors += 1
+        self.input_tokens += record["input_tokens"]
+        self.output_tokens += record["output_tokens"]
+        self.cached_tokens += record["cached_tokens"]
+        self.bytes_up += record["bytes_up"]
+        self.bytes_down += record["bytes_down"]
+        self.latency_total += record["latency"]
+        self.latency_max = max(self.latency_max, record["latency"])
+
+    def as_dict(self) -> Dict[str, Any]:
+        upstream = self.calls - self.cache_hits
+        return {
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "errors": self.errors,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cached_tokens": self.cached_tokens,
+            "bytes_up": self.bytes_up,
+            "bytes_down": self.bytes_down,
+            "avg_latency_ms": round(self.latency_total / upstream * 1000.0, 1) if upstream > 0 else 0.0,
+            "max_latency_ms": round(self.latency_max * 1000.0, 1),
+        }
+
+
+class UsageTracker:
+    """
+    Per-call accounting for upstream AI calls: Gemini text, vision and transcription
+    (recorded by the LLM gateway) and ElevenLabs TTS.
+
+    - Every call records input/output tokens, uploaded/downloaded bytes, latency and
+      cache status (miss, hit, context, error), tagged with the endpoint and video id
+      of the request that caused it
+    - TTS counts characters as input tokens, which is what ElevenLabs bills
+    - Aggregates per endpoint, per kind/call site and for the USAGE_TOP_VIDEOS costliest videos
+    - USAGE_BUDGET_<ENDPOINT> (e.g. USAGE_BUDGET_CHAT_STREAM): tokens per USAGE_BUDGET_WINDOW
+      seconds; while exceeded, over_budget() is True and callers use cheaper tiers.
+      over_budget() only answers; callers report each cheaper tier they actually pick
+      with record_downgrade(), so one request checked in several places counts once per tier
+    """
+
+    def __init__(self):
+        self.window = float(os.getenv("USAGE_BUDGET_WINDOW", "3600"))
+        self.top_videos = int(os.getenv("USAGE_TOP_VIDEOS", "10"))
+        self.max_videos = 1000
+
+        self._by_endpoint: Dict[str, _Totals] = {}
+        self._by_call_site: Dict[Tuple[str, str], _Totals] = {}
+        self._by_video: "OrderedDict[str, _Totals]" = OrderedDict()
+        self._budgets: Dict[str, Optional[int]] = {}
+        self._spend: Dict[str, Deque[Tuple[float, int]]] = {}
+        self.budget_downgrades: Dict[str, int] = {}
+
+    def record(
+        self,
+        kind: str,
+        call_site: str,
+        *,
+        model: Optional[str] = None,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        cached_tokens: int = 0,
+        bytes_up: int = 0,
+        bytes_down: int = 0,
+        latency: float = 0.0,
+        cache: str = "miss",
+    ) -> None:
+        tags = _call_tags.get()
+        endpoint = tags.get("endpoint", "background")
+        record = {
+            "input_tokens": int(input_tokens or 0),
+            "output_tokens": int(output_tokens or 0),
+            "cached_tokens": int(cached_tokens or 0),
+            "bytes_up": int(bytes_up or 0),
+            "bytes_down": int(bytes_down or 0),
+            "latency": latency,
+            "cache": cache,
+        }
+
+        self._by_endpoint.setdefault(endpoint, _Totals()).add(record)
+        self._by_call_site.setdefault((kind, call_site), _Totals()).add(record)
+
+        video_id = tags.get("video_id")
+        if video_id:
+            totals = self._by_video.pop(video_id, None) or _Totals()
+            totals.add(record)
+            self._by_video[video_id] = totals
+            while len(self._by_video) > self.max_videos:
+                self._by_video.popitem(last=False)
+
+        tokens = record["input_tokens"] + record["output_tokens"]
+        if tokens and self._budget_for(endpoint) is not None:
+            self._spend.setdefault(endpoint, deque()).append((time.monotonic(), tokens))
+
+        logger.debug(
+            f"[USAGE] {endpoint} {kind}/{call_site} {model or '-'} {cache}: "
+            f"{record['input_tokens']}+{record['output_tokens']} tokens, {record['bytes_up']}B up, {latency * 1000.0:.0f}ms"
+        )
+
+    def over_budget(self, endpoint: Optional[str] = None) -> bool:
+        """True while the (current request's) endpoint has used more tokens than its budget in the window."""
+        endpoint = endpoint or _call_tags.get().get("endpoint")
+        budget = self._budget_for(endpoint) if endpoint else None
+        if budget is None:
+            return False
+        spend = self._spend.get(endpoint)
+        if not spend:
+            return False
+        cutoff = time.monotonic() - self.window
+        while spend and spend[0][0] < cutoff:
+            spend.popleft()
+        return sum(tokens for _, tokens in spend) > budget
+
+    def record_downgrade(self, tier: str) -> None:
+        """Counts one use of a cheaper tier (e.g. "gemini_model", "tts_model", "vision_prompt")."""
+        self.budget_downgrades[tier] = self.budget_downgrades.get(tier, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        videos = sorted(
+            self._by_video.items(),
+            key=lambda item: item[1].input_tokens + item[1].output_tokens,
+            reverse=True,
+        )[:self.top_videos]
+        return {
+            "by_endpoint": {endpoint: totals.as_dict() for endpoint, totals in self._by_endpoint.items()},
+            "by_call_site": {f"{kind}/{site}": totals.as_dict() for (kind, site), totals in self._by_call_site.items()},
+            "top_videos": {video_id: totals.as_dict() for video_id, totals in videos},
+            "budgets": {
+                endpoint: {"budget": budget, "window_tokens": sum(t for _, t in self._spend.get(endpoint, ()))}
+                for endpoint, budget in self._budgets.items() if budget is not None
+            },
+            "budget_downgrades": dict(self.budget_downgrades),
+        }
+
+    def _budget_for(self, endpoint: str) -> Optional[int]:
+        if endpoint not in self._budgets:
+            # "/api/nfl-analogy/stream" -> USAGE_BUDGET_NFL_ANALOGY_STREAM; path parameters are dropped
+            segments = [seg for seg in endpoint.split("/") if seg and seg != "api" and not seg.startswith("{")]
+            value = os.getenv(f"USAGE_BUDGET_{'_'.join(segments).upper().replace('-', '_')}")
+            self._budgets[endpoint] = int(value) if value else None
+        return self._budgets[endpoint]
+
+
+_tracker: Optional[UsageTracker] = None
+
+
+def get_usage_tracker() -> UsageTracker:
+    global _tracker
+    if _tracker is None:
+        _tracker = UsageTracker()
+    return _tracker
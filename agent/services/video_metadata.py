@@ -4,6 +4,8 @@ import asyncio
 from typing import Optional, Dict, Any
 import logging
 
+from services.circuit_breaker import get_circuit_breaker
+
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -20,6 +22,7 @@ class VideoMetadataExtractor:
             'skip_download': True,
             'extract_flat': False,
         }
+        self.breaker = get_circuit_breaker("youtube")
     
     def _get_cache_key(self, video_url_or_id: str) -> str:
         
@@ -36,6 +39,10 @@ class VideoMetadataExtractor:
         if cache_key in self.metadata_cache:
             logger.info(f"Using cached metadata for {cache_key}")
             return self.metadata_cache[cache_key]
+
+        if not self.breaker.allow():
+            logger.warning(f"YouTube circuit open - skipping metadata for {video_url_or_id}")
+            return None
         
         try:
 
@@ -48,6 +55,10 @@ class VideoMetadataExtractor:
                 ),
                 timeout=10.0
             )
+            if metadata:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
             
 
             if metadata:
@@ -57,9 +68,11 @@ class VideoMetadataExtractor:
             return metadata
             
         except asyncio.TimeoutError:
+            self.breaker.record_failure()
             logger.warning(f"Metadata extraction timeout for {video_url_or_id}")
             return None
         except Exception as e:
+            self.breaker.record_failure()
             logger.error(f"Error extracting metadata: {e}")
             return None
     
@@ -1,17 +1,32 @@
 
-import google.generativeai as genai
 import os
 import httpx
 import base64
 import asyncio
+import time
+import numpy as np
 from typing import Optional, Dict, Any, List
-from utils.image_processor import compress_image
+from utils.image_processor import compress_image, decode_image, encode_jpeg
 from services.object_detector import ObjectDetector
 from services.pose_estimator import PoseEstimator
+from services.team_classifier import TeamClassifier
+from services.pitch_registration import PitchRegistration
+from services.ball_trajectory import BallTrajectoryFilter
+from services.perceptual_cache import PerceptualCache
+from utils.perceptual_hash import dhash_base64
+from services.llm_gateway import LLMGateway, get_llm_gateway
+from services.usage_tracker import get_usage_tracker
 
 
 class VisionAnalyzer:
     
+    STUB_COMMENTARIES = [
+        "Players are moving into position, creating space for a potential attack.",
+        "The team is building up play from the back, looking for passing options.",
+        "A counter-attack is developing with players sprinting forward.",
+        "Defensive shape is compact, denying space in the central areas.",
+        "The ball is in the final third, with attackers looking for an opening."
+    ]
     
     def __init__(self, api_key: Optional[str] = None, use_enhanced: bool = True):
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
@@ -23,6 +38,13 @@ class VisionAnalyzer:
         self.use_enhanced = use_enhanced
         self.object_detector = None
         self.pose_estimator = None
+        self.team_classifier = TeamClassifier()
+        self.pitch_registration = PitchRegistration()
+        self.ball_filter = BallTrajectoryFilter()
+        # Share of the remaining deadline ball tracking may use, and its per-frame YOLO latency (EWMA)
+        self.tracking_budget_fraction = float(os.getenv("BALL_TRACKING_BUDGET_FRACTION", "0.25"))
+        self._detect_latency = 0.08
+        self.frame_cache = PerceptualCache("vision_frame")
         
         if self.use_enhanced:
             try:
@@ -38,16 +60,11 @@ class VisionAnalyzer:
                 print(f"[VISION] Warning: Could not initialize Pose Estimator: {e}")
         
 
-        if self.api_key:
-            try:
-                genai.configure(api_key=self.api_key)
-                model_name = os.getenv("GEMINI_MODEL", "gemini-1.5-flash-latest")
-                self.model = genai.GenerativeModel(model_name)
-                self.provider = "gemini"
-                print(f"[VISION] Initialized Gemini Vision")
-            except Exception as e:
-                print(f"[VISION] Warning: Could not initialize Gemini: {e}")
-                self.model = None
+        self.gateway = get_llm_gateway()
+        if self.gateway.is_available():
+            self.model = self.gateway.default_model
+            self.provider = "gemini"
+            print(f"[VISION] Initialized Gemini Vision")
         
         if not self.model:
             print(f"[VISION] No vision AI provider available - will use stub responses")
@@ -56,46 +73,138 @@ class VisionAnalyzer:
         
         return await self.analyze_frame(base64_image, context)
     
-    async def analyze_frame(self, base64_image: str, context: Optional[str] = None) -> str:
+    async def analyze_frame(self, base64_image: str, context: Optional[str] = None, ball_trajectory: Optional[Dict] = None, deadline: Optional[float] = None) -> str:
         
+        result = await self.analyze_frame_detailed(base64_image, context, ball_trajectory, deadline)
+        return result['commentary']
+    
+    async def analyze_frame_detailed(self, base64_image: str, context: Optional[str] = None, ball_trajectory: Optional[Dict] = None, deadline: Optional[float] = None, video_id: Optional[str] = None, with_positions: bool = False) -> Dict[str, Any]:
+        """
+        With `with_positions`, result['positions'] is the field diagram built from the same
+        decode and YOLO pass the analysis uses (None when no players were found).
+        """
+        timings: Dict[str, float] = {}
+
+        # Only context-free analyses are reusable across timestamps
+        frame_hash = None
+        if context is None and ball_trajectory is None:
+            started = time.perf_counter()
+            frame_hash = dhash_base64(base64_image)
+            cached = self.frame_cache.get((frame_hash,)) if frame_hash is not None else None
+            timings['cache'] = (time.perf_counter() - started) * 1000.0
+            if cached:
+                get_usage_tracker().record("vision", "analyze_vision", cache="hit")
+                positions = await self.extract_positions(base64_image, video_id) if with_positions else None
+                return {'commentary': cached, 'timings': timings, 'cached': True, 'positions': positions}
 
         if self.use_enhanced and (self.object_detector or self.pose_estimator):
-            return await self._analyze_enhanced(base64_image, context)
+            result = await self._analyze_enhanced(base64_image, context, ball_trajectory, deadline, timings, video_id, with_positions)
+        elif self.model:
+            commentary = await self._analyze_with_gemini(base64_image, context, timings=timings, deadline=deadline)
+            result = {'commentary': commentary, 'timings': timings}
+        else:
+            result = {'commentary': self._generate_stub_commentary(), 'timings': timings}
         
-        if self.model:
-            return await self._analyze_with_gemini(base64_image, context)
-        
-        return self._generate_stub_commentary()
+        if frame_hash is not None and result['commentary'] not in self.STUB_COMMENTARIES:
+            self.frame_cache.set((frame_hash,), result['commentary'])
+        result.setdefault('positions', None)
+        result['cached'] = False
+        return result
     
-    async def _analyze_enhanced(self, base64_image: str, context: Optional[str] = None) -> str:
+    async def track_ball(self, frames: List[str], timestamps: List[float], deadline: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        With a `deadline` (absolute time.monotonic()), tracking gets BALL_TRACKING_BUDGET_FRACTION
+        of the remaining time: frames are thinned evenly (keeping the first and last) to what
+        fits at the measured YOLO latency, detection stops when the budget is spent, and
+        tracking is skipped when fewer than two frames fit.
+        """
+        if not (self.object_detector and self.object_detector.initialized) or not frames:
+            return None
+
+        stop_at = None
+        if deadline is not None:
+            budget = max(0.0, deadline - time.monotonic()) * self.tracking_budget_fraction
+            fits = int(budget / (self._detect_latency * 1.5))
+            if fits < 2:
+                print(f"[VISION] Skipping ball tracking: {budget * 1000:.0f}ms budget")
+                return None
+            if fits < len(frames):
+                keep = sorted({round(i * (len(frames) - 1) / (fits - 1)) for i in range(fits)})
+                frames = [frames[i] for i in keep]
+                timestamps = [timestamps[i] for i in keep]
+            stop_at = time.monotonic() + budget
+
+        loop = asyncio.get_event_loop()
+        detections = await loop.run_in_executor(None, self._detect_frames, frames, stop_at)
+        if len(detections) < 2:
+            return None
+        return self.ball_filter.track(timestamps[:len(detections)], detections)
+
+    def _detect_frames(self, frames: List[str], stop_at: Optional[float]) -> List[Dict[str, Any]]:
+        detections = []
+        for frame in frames:
+            if stop_at is not None and time.monotonic() >= stop_at:
+                break
+            started = time.monotonic()
+            detections.append(self.object_detector.detect_objects(frame))
+            self._detect_latency = 0.8 * self._detect_latency + 0.2 * (time.monotonic() - started)
+        return detections
+
+    async def _analyze_enhanced(self, base64_image: str, context: Optional[str] = None, ball_trajectory: Optional[Dict] = None, deadline: Optional[float] = None, timings: Optional[Dict[str, float]] = None, video_id: Optional[str] = None, with_positions: bool = False) -> Dict[str, Any]:
         
+        timings = {} if timings is None else timings
+        image = None
+        detection_result = None
+        pose_result = None
+        positions_task = None
+
         try:
+            loop = asyncio.get_event_loop()
+
+            # Decode once; detector, pose and the Gemini JPEG all read the same buffer
+            image = await loop.run_in_executor(None, self._timed, timings, 'decode', decode_image, base64_image)
+            if image is None:
+                raise ValueError("could not decode frame")
+            image.setflags(write=False)
 
             detection_task = None
             pose_task = None
             
             if self.object_detector and self.object_detector.initialized:
-                loop = asyncio.get_event_loop()
                 detection_task = loop.run_in_executor(
                     None, 
+                    self._timed,
+                    timings,
+                    'detect',
                     self.object_detector.detect_objects, 
-                    base64_image
+                    image
                 )
             
             if self.pose_estimator and self.pose_estimator.initialized:
-                loop = asyncio.get_event_loop()
                 pose_task = loop.run_in_executor(
                     None,
+                    self._timed,
+                    timings,
+                    'pose',
                     self.pose_estimator.estimate_pose,
-                    base64_image
+                    image,
+                    deadline
                 )
             
-
-            detection_result = None
-            pose_result = None
-            
             if detection_task:
                 detection_result = await detection_task
+                if with_positions:
+                    # Team clustering and pitch mapping overlap the Gemini call
+                    positions_task = loop.run_in_executor(
+                        None,
+                        self._timed,
+                        timings,
+                        'positions',
+                        self._positions_from_detections,
+                        image,
+                        detection_result,
+                        video_id
+                    )
             if pose_task:
                 pose_result = await pose_task
             
@@ -103,15 +212,16 @@ class VisionAnalyzer:
             enhanced_context = self._build_enhanced_context(
                 detection_result, 
                 pose_result, 
-                context
+                context,
+                ball_trajectory
             )
             
 
             if self.model:
-                return await self._analyze_with_gemini(base64_image, enhanced_context)
+                commentary = await self._analyze_with_gemini(base64_image, enhanced_context, image=image, timings=timings, deadline=deadline)
             else:
 
-                return self._generate_commentary_from_detections(detection_result, pose_result)
+                commentary = self._generate_commentary_from_detections(detection_result, pose_result)
                 
         except Exception as e:
             print(f"[VISION] ✗ Enhanced analysis error: {e}")
@@ -119,10 +229,36 @@ class VisionAnalyzer:
             traceback.print_exc()
 
             if self.model:
-                return await self._analyze_with_gemini(base64_image, context)
-            return self._generate_stub_commentary()
+                commentary = await self._analyze_with_gemini(base64_image, context, image=image, timings=timings, deadline=deadline)
+            else:
+                commentary = self._generate_stub_commentary()
+
+        positions = None
+        if positions_task is not None:
+            try:
+                positions = await positions_task
+            except Exception as e:
+                print(f"[VISION] ✗ Position extraction error: {e}")
+
+        print(f"[VISION] Stage timings (ms): {', '.join(f'{k}={v:.0f}' for k, v in timings.items())}")
+        return {
+            'commentary': commentary,
+            'timings': timings,
+            'detections': detection_result,
+            'pose': pose_result,
+            'positions': positions
+        }
+
+    @staticmethod
+    def _timed(timings: Dict[str, float], stage: str, fn, *args):
+        
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            timings[stage] = (time.perf_counter() - started) * 1000.0
     
-    def _build_enhanced_context(self, detection_result: Optional[Dict], pose_result: Optional[Dict], original_context: Optional[str]) -> str:
+    def _build_enhanced_context(self, detection_result: Optional[Dict], pose_result: Optional[Dict], original_context: Optional[str], ball_trajectory: Optional[Dict] = None) -> str:
         
         context_parts = []
         
@@ -152,8 +288,13 @@ class VisionAnalyzer:
                 if possession:
                     context_parts.append(f"Ball possession: Player {possession['player_id']+1} (distance: {possession['distance']:.0f}px)")
         
+        trajectory_summary = self.ball_filter.describe(ball_trajectory)
+        if trajectory_summary:
+            context_parts.append("\n=== BALL TRAJECTORY (frame window) ===")
+            context_parts.append(trajectory_summary)
+        
         if pose_result:
-            context_parts.append("\n=== POSE ESTIMATION (MediaPipe) ===")
+            context_parts.append(f"\n=== POSE ESTIMATION (MediaPipe, {pose_result.get('model_tier') or 'default'} model) ===")
             poses = pose_result.get('poses', [])
             actions = pose_result.get('actions', [])
             if poses:
@@ -192,29 +333,34 @@ class VisionAnalyzer:
         
         return self._generate_stub_commentary()
     
-    async def _analyze_with_gemini(self, base64_image: str, context: Optional[str] = None) -> str:
+    async def _analyze_with_gemini(self, base64_image: str, context: Optional[str] = None, image: Optional[np.ndarray] = None, timings: Optional[Dict[str, float]] = None, deadline: Optional[float] = None) -> str:
         
+        timings = {} if timings is None else timings
         try:
-            compressed = compress_image(base64_image, max_size=384, quality=50)
+            started = time.perf_counter()
+            if image is not None:
+                jpeg_bytes = encode_jpeg(image, max_size=384, quality=50)
+            else:
+                jpeg_bytes = base64.b64decode(compress_image(base64_image, max_size=384, quality=50))
+            timings['encode'] = (time.perf_counter() - started) * 1000.0
             
             prompt = "Analyze this soccer frame. Describe the key action happening: player positions, ball location, and what's occurring. Be concise, under 20 words."
             
             if context:
                 prompt = f"CONTEXT: {context}\n\n{prompt}"
             
-            from PIL import Image
-            import io
-            
-            image_data = base64.b64decode(compressed)
-            image = Image.open(io.BytesIO(image_data))
-            
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: self.model.generate_content([prompt, image])
-            )
+            image_part = LLMGateway.image_part(jpeg_bytes)
             
-            commentary = response.text.strip()
+            started = time.perf_counter()
+            try:
+                commentary = await self.gateway.generate(
+                    [prompt, image_part],
+                    call_site="analyze_vision",
+                    model=self.model,
+                    deadline=deadline,
+                )
+            finally:
+                timings['llm'] = (time.perf_counter() - started) * 1000.0
             print(f"[VISION] ✓ Gemini Vision analysis: {commentary[:60]}...")
             return commentary
             
@@ -222,25 +368,79 @@ class VisionAnalyzer:
             print(f"[VISION] ✗ Gemini Vision analysis error: {e}")
             return self._generate_stub_commentary()
     
-    async def extract_positions(self, base64_image: str) -> Dict[str, Any]:
+    async def extract_positions(self, base64_image: str, video_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Field diagram for a frame on its own; None when there is no detector, frame or player."""
+        if not (self.object_detector and self.object_detector.initialized):
+            return None
+
+        try:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(
+                None,
+                self._extract_positions_sync,
+                base64_image,
+                video_id
+            )
+        except Exception as e:
+            print(f"[VISION] ✗ Position extraction error: {e}")
+            return None
+
+    def _extract_positions_sync(self, base64_image: str, video_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        
+        image = decode_image(base64_image)
+        if image is None:
+            return None
+        image.setflags(write=False)
+        return self._positions_from_detections(image, self.object_detector.detect_objects(image), video_id)
+
+    def _positions_from_detections(self, image: np.ndarray, detection: Optional[Dict], video_id: Optional[str]) -> Optional[Dict[str, Any]]:
         
+        players = (detection or {}).get('players', [])
+        if not players:
+            return None
+
+        labels = self.team_classifier.classify(image, players, video_id)
+
+        # Feet (bottom-centre of the box) are the point that touches the pitch
+        pixel_points = np.array(
+            [[p['bbox']['center_x'], p['bbox']['y2']] for p in players],
+            dtype=np.float32
+        )
+        ball_detection = detection.get('ball')
+        if ball_detection:
+            bbox = ball_detection['bbox']
+            pixel_points = np.vstack([pixel_points, [[bbox['center_x'], bbox['center_y']]]])
+
+        homography = self.pitch_registration.get_homography(image, video_id)
+        if homography is not None:
+            pitch_points = PitchRegistration.to_pitch(pixel_points, homography)
+        else:
+            height, width = image.shape[:2]
+            pitch_points = pixel_points / np.array([width, height], dtype=np.float32)
+        pitch_points = np.round(pitch_points.astype(np.float64), 3).tolist()
+
+        points = pitch_points[:len(players)]
+        ball = pitch_points[len(players)] if ball_detection else []
+
+        attacking_team = 0
+        if ball_detection:
+            possession = self.object_detector.find_ball_possession(detection)
+            if possession and labels[possession['player_id']] != TeamClassifier.OUTLIER:
+                attacking_team = int(labels[possession['player_id']])
 
+        attackers = [pt for pt, label in zip(points, labels) if label == attacking_team]
+        defenders = [pt for pt, label in zip(points, labels) if label == 1 - attacking_team]
+        if not attackers and not defenders:
+            return None
 
         return {
-            "attackers": [[0.7, 0.5], [0.6, 0.3], [0.65, 0.4]],
-            "defenders": [[0.3, 0.5], [0.2, 0.7], [0.25, 0.6]],
-            "ball": [0.65, 0.45],
+            "attackers": attackers,
+            "defenders": defenders,
+            "ball": ball,
             "diagramType": "defensive"
         }
     
     def _generate_stub_commentary(self) -> str:
         
         import random
-        stubs = [
-            "Players are moving into position, creating space for a potential attack.",
-            "The team is building up play from the back, looking for passing options.",
-            "A counter-attack is developing with players sprinting forward.",
-            "Defensive shape is compact, denying space in the central areas.",
-            "The ball is in the final third, with attackers looking for an opening."
-        ]
-        return random.choice(stubs)
+        return random.choice(self.STUB_COMMENTARIES)
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Optional
+import logging
+
+from services.llm_gateway import LLMGateway
+
+logger = logging.getLogger(__name__)
+
+
+BATCH_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "clips": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "clip": {"type": "STRING"},
+                    "commentary": {"type": "STRING"},
+                },
+                "required": ["clip", "commentary"],
+            },
+        },
+    },
+    "required": ["clips"],
+}
+
+
+class _Pending:
+    __slots__ = ("prompt", "description", "images", "deadline", "future")
+
+    def __init__(self, prompt: str, description: str, images: List[Any], deadline: Optional[float], future: asyncio.Future):
+        self.prompt = prompt
+        self.description = description
+        self.images = images
+        self.deadline = deadline
+        self.future = future
+
+
+class VisionBatcher:
+    """
+    Micro-batches independent frame-window requests from different viewers into one
+    multimodal Gemini call.
+
+    - Requests arriving within VISION_BATCH_WAIT_MS are packed together, up to
+      VISION_BATCH_MAX windows and VISION_BATCH_MAX_IMAGES images per call
+    - The batched call asks for structured JSON with one labelled answer per clip;
+      answers are split back to each caller
+    - A batched call carries the tightest deadline of its windows, so windows only share
+      a call when their deadlines are within VISION_BATCH_DEADLINE_SLACK_MS of each
+      other; a window with a much tighter deadline is sent on its own
+    - A lone request is sent with its own prompt; windows missing from a batch
+      answer are retried on their own, concurrently. VISION_BATCH_MAX=1 disables batching
+    """
+
+    def __init__(self, gateway: LLMGateway, instructions: str, call_site: str = "live_vision"):
+        self.gateway = gateway
+        self.instructions = instructions
+        self.call_site = call_site
+        self.max_batch = int(os.getenv("VISION_BATCH_MAX", "4"))
+        self.max_images = int(os.getenv("VISION_BATCH_MAX_IMAGES", "16"))
+        self.max_wait = float(os.getenv("VISION_BATCH_WAIT_MS", "40")) / 1000.0
+        self.deadline_slack = float(os.getenv("VISION_BATCH_DEADLINE_SLACK_MS", "500")) / 1000.0
+
+        self._pending: List[_Pending] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+        self.calls = 0
+        self.windows = 0
+        self.split_failures = 0
+
+    async def submit(self, prompt: str, description: str, images: List[Any], deadline: Optional[float] = None) -> str:
+        """
+        `prompt` is the full single-window prompt, `description` the per-clip text
+        (timestamps, tracking) used when the window shares a batched call.
+        """
+        if self.max_batch <= 1:
+            return await self._send_single(prompt, images, deadline)
+
+        loop = asyncio.get_running_loop()
+        item = _Pending(prompt, description, images, deadline, loop.create_future())
+
+        if self._pending and sum(len(p.images) for p in self._pending) + len(images) > self.max_images:
+            self._flush()
+        self._pending.append(item)
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await item.future
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "windows": self.windows,
+            "avg_windows_per_call": round(self.windows / self.calls, 2) if self.calls else 0.0,
+            "split_failures": self.split_failures,
+            "max_batch": self.max_batch,
+            "wait_ms": round(self.max_wait * 1000.0),
+        }
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        # Callers whose own timeout already fired don't need an answer
+        batch = [p for p in batch if not p.future.done()]
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[_Pending]) -> None:
+        await asyncio.gather(*[self._run_group(group) for group in self._group_by_deadline(batch)])
+
+    def _group_by_deadline(self, batch: List[_Pending]) -> List[List[_Pending]]:
+        """Windows within deadline_slack of the tightest deadline in their group; windows without a deadline together."""
+        groups: List[List[_Pending]] = []
+        for item in sorted((p for p in batch if p.deadline is not None), key=lambda p: p.deadline):
+            if groups and item.deadline - groups[-1][0].deadline <= self.deadline_slack:
+                groups[-1].append(item)
+            else:
+                groups.append([item])
+        untimed = [p for p in batch if p.deadline is None]
+        if untimed:
+            groups.append(untimed)
+        return groups
+
+    async def _run_group(self, batch: List[_Pending]) -> None:
+        if len(batch) == 1:
+            await self._resolve(batch[0], self._send_single(batch[0].prompt, batch[0].images, batch[0].deadline))
+            return
+
+        labels = [f"C{i + 1}" for i in range(len(batch))]
+        contents: List[Any] = [
+            "You are analyzing several independent soccer broadcast clips, each a short sequence of frames. "
+            "They come from different matches: analyze each clip only from its own frames.\n"
+            f"For each clip: {self.instructions}\n"
+            f"Return one entry per clip ({', '.join(labels)}) with its label in \"clip\"."
+        ]
+        for label, item in zip(labels, batch):
+            contents.append(f"Clip {label}: {item.description}")
+            contents.extend(item.images)
+
+        deadlines = [p.deadline for p in batch if p.deadline is not None]
+        self.calls += 1
+        self.windows += len(batch)
+        try:
+            text = await self.gateway.generate(
+                contents,
+                call_site=self.call_site,
+                deadline=min(deadlines) if deadlines else None,
+                cache=False,
+                response_mime_type="application/json",
+                response_schema=BATCH_SCHEMA,
+            )
+            answers = self._split(text)
+        except Exception as e:
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        logger.info(f"[VISION BATCH] {len(batch)} windows in one call")
+        missing = []
+        for label, item in zip(labels, batch):
+            answer = answers.get(label)
+            if answer:
+                if not item.future.done():
+                    item.future.set_result(answer)
+            else:
+                self.split_failures += 1
+                missing.append(item)
+        await asyncio.gather(*[
+            self._resolve(item, self._send_single(item.prompt, item.images, item.deadline)) for item in missing
+        ])
+
+    async def _send_single(self, prompt: str, images: List[Any], deadline: Optional[float]) -> str:
+        self.calls += 1
+        self.windows += 1
+        return await self.gateway.generate([prompt, *images], call_site=self.call_site, deadline=deadline)
+
+    @staticmethod
+    async def _resolve(item: _Pending, coro) -> None:
+        try:
+            result = await coro
+        except Exception as e:
+            if not item.future.done():
+                item.future.set_exception(e)
+            return
+        if not item.future.done():
+            item.future.set_result(result)
+
+    @staticmethod
+    def _split(text: str) -> Dict[str, str]:
+        try:
+            clips = json.loads(text).get("clips", [])
+        except (TypeError, ValueError, AttributeError):
+            return {}
+        answers = {}
+        for clip in clips:
+            if isinstance(clip, dict) and clip.get("clip") and clip.get("commentary"):
+                answers[str(clip["clip"]).strip()] = str(clip["commentary"]).strip()
+        return answers
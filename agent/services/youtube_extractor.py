@@ -7,6 +7,8 @@ from typing import Optional, Dict, Tuple
 import logging
 import threading
 
+from services.circuit_breaker import get_circuit_breaker
+
 logger = logging.getLogger(__name__)
 
 
@@ -29,6 +31,7 @@ class YouTubeFrameExtractor:
         self._stream_cache: Dict[str, Tuple[str, float]] = {}
         self._cache_lock = threading.Lock()
         self._default_ttl_seconds = 120  # keep small; stream URLs can expire
+        self.breaker = get_circuit_breaker("youtube")
 
     def _normalize_video_url(self, video_url_or_id: str) -> str:
         if video_url_or_id.startswith("http://") or video_url_or_id.startswith("https://"):
@@ -68,11 +71,23 @@ class YouTubeFrameExtractor:
         if cached:
             return cached
 
+        if not self.breaker.allow():
+            logger.warning("YouTube circuit open - skipping yt-dlp resolve")
+            return None
+
         loop = asyncio.get_event_loop()
-        stream_url = await loop.run_in_executor(None, self._resolve_stream_url_sync, video_url)
+        try:
+            stream_url = await loop.run_in_executor(None, self._resolve_stream_url_sync, video_url)
+        except asyncio.CancelledError:
+            # The caller's budget ran out; not a YouTube failure
+            self.breaker.release()
+            raise
 
         if stream_url:
+            self.breaker.record_success()
             self._set_cached_stream_url(key, stream_url)
+        else:
+            self.breaker.record_failure()
 
         return stream_url
 
@@ -136,7 +151,15 @@ class YouTubeFrameExtractor:
                 video_url,
                 timestamp,
             )
+            if frame:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
             return frame
+        except asyncio.CancelledError:
+            # Caller timed out (possibly on work before the stream was touched); not a YouTube failure
+            self.breaker.release()
+            raise
         except Exception as e:
             logger.error(f"Frame extraction error: {e}")
             return None
@@ -0,0 +1,84 @@
+import asyncio
+
+from services.analysis_upgrades import AnalysisUpgrades
+
+
+def _pipeline(release, result, runs):
+    async def run():
+        runs.append(result)
+        await release.wait()
+        return result
+    return run
+
+
+def test_upgrade_replaces_the_provisional_result():
+    async def run():
+        upgrades = AnalysisUpgrades()
+        release = asyncio.Event()
+        full = {"commentary": "Full analysis", "fieldDiagram": {"players": []}}
+        token = upgrades.start("abc:61", _pipeline(release, full, []))
+
+        provisional = await upgrades.wait(token)
+        release.set()
+        upgraded = await upgrades.wait(token, timeout=1.0)
+        return provisional, upgraded, upgrades.stats()
+
+    provisional, upgraded, stats = asyncio.run(run())
+    assert provisional["status"] == "pending"
+    assert upgraded == {"status": "done", "result": {"commentary": "Full analysis", "fieldDiagram": {"players": []}}}
+    assert stats["running"] == 0 and stats["kept"] == 1
+
+
+def test_same_moment_shares_one_running_upgrade():
+    async def run():
+        upgrades = AnalysisUpgrades()
+        release = asyncio.Event()
+        runs = []
+        first = upgrades.start("abc:61", _pipeline(release, {"n": 1}, runs))
+        second = upgrades.start("abc:61", _pipeline(release, {"n": 2}, runs))
+        other = upgrades.start("abc:75", _pipeline(release, {"n": 3}, runs))
+        release.set()
+        results = [await upgrades.wait(t, timeout=1.0) for t in (first, second, other)]
+
+        # Once finished, the same moment starts a fresh upgrade
+        again = upgrades.start("abc:61", _pipeline(release, {"n": 4}, runs))
+        await upgrades.wait(again, timeout=1.0)
+        return first, second, other, again, results, runs, upgrades.stats()
+
+    first, second, other, again, results, runs, stats = asyncio.run(run())
+    assert first == second and other != first and again != first
+    assert [r["result"] for r in results] == [{"n": 1}, {"n": 1}, {"n": 3}]
+    assert runs == [{"n": 1}, {"n": 3}, {"n": 4}]
+    assert stats["deduplicated"] == 1 and stats["started"] == 3
+
+
+def test_failed_upgrade_is_reported():
+    async def run():
+        upgrades = AnalysisUpgrades()
+
+        async def broken():
+            raise RuntimeError("vision timed out")
+
+        token = upgrades.start("abc:61", broken)
+        return await upgrades.wait(token, timeout=1.0), await upgrades.wait("unknown"), upgrades.stats()
+
+    status, unknown, stats = asyncio.run(run())
+    assert status == {"status": "failed", "error": "vision timed out"}
+    assert unknown is None
+    assert stats["failed"] == 1
+
+
+def test_expired_results_are_evicted(monkeypatch):
+    monkeypatch.setenv("ANALYZE_UPGRADE_TTL", "0")
+
+    async def run():
+        upgrades = AnalysisUpgrades()
+        release = asyncio.Event()
+        release.set()
+        old = upgrades.start("abc:61", _pipeline(release, {"n": 1}, []))
+        await upgrades.wait(old, timeout=1.0)
+        await asyncio.sleep(0.01)
+        upgrades.start("abc:75", _pipeline(release, {"n": 2}, []))
+        return await upgrades.wait(old)
+
+    assert asyncio.run(run()) is None
@@ -0,0 +1,64 @@
+import numpy as np
+
+from services.ball_trajectory import BallTrajectoryFilter
+
+VELOCITY = np.array([300.0, 250.0])
+ORIGIN = np.array([100.0, 200.0])
+
+
+def _ball(x, y, confidence=0.9):
+    return {'ball': {'confidence': confidence, 'bbox': {'center_x': float(x), 'center_y': float(y)}}}
+
+
+def _noisy_track(missing=()):
+    rng = np.random.default_rng(7)
+    times = np.arange(26) / 25.0
+    truth = ORIGIN + times[:, None] * VELOCITY
+    noisy = truth + rng.normal(0.0, 6.0, truth.shape)
+    detections = [None if i in missing else _ball(*noisy[i]) for i in range(len(times))]
+    return list(times), detections, truth, noisy
+
+
+def test_rts_smoothing_beats_raw_detections_on_a_linear_track():
+    times, detections, truth, noisy = _noisy_track()
+    trajectory = BallTrajectoryFilter().track(times, detections)
+
+    smoothed = np.array([[p['x'], p['y']] for p in trajectory['positions']])
+    raw_error = np.sqrt(((noisy - truth) ** 2).sum(axis=1).mean())
+    smoothed_error = np.sqrt(((smoothed - truth) ** 2).sum(axis=1).mean())
+    assert smoothed_error < 0.6 * raw_error
+
+    assert abs(trajectory['speed'] - np.hypot(*VELOCITY)) < 0.1 * np.hypot(*VELOCITY)
+    assert trajectory['direction'] == "down-right"
+
+
+def test_missed_frames_are_filled_along_the_track():
+    missing = {8, 9, 10, 11, 12}
+    times, detections, truth, _ = _noisy_track(missing)
+    trajectory = BallTrajectoryFilter().track(times, detections)
+
+    assert trajectory['observed_frames'] == 21 and trajectory['interpolated_frames'] == 5
+    for i in missing:
+        position = trajectory['positions'][i]
+        assert not position['observed']
+        assert np.hypot(position['x'] - truth[i][0], position['y'] - truth[i][1]) < 15.0
+
+
+def test_frames_are_ordered_by_timestamp():
+    times, detections, _, _ = _noisy_track()
+    shuffled = np.random.default_rng(3).permutation(len(times))
+    trajectory = BallTrajectoryFilter().track([times[i] for i in shuffled], [detections[i] for i in shuffled])
+
+    timestamps = [p['timestamp'] for p in trajectory['positions']]
+    assert timestamps == sorted(timestamps)
+    assert trajectory['direction'] == "down-right"
+
+
+def test_low_confidence_and_missing_balls_give_no_track():
+    ball_filter = BallTrajectoryFilter()
+    assert ball_filter.track([0.0, 0.04], [None, _ball(10, 10, confidence=0.05)]) is None
+    assert ball_filter.describe(None) is None
+
+    single = ball_filter.track([0.0, 0.04], [None, _ball(10, 10)])
+    assert single['speed'] is None
+    assert ball_filter.describe(single) == "Ball at (10, 10) (seen in 1/2 frames)"
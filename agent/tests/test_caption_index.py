@@ -0,0 +1,51 @@
+import random
+
+from services.caption_index import CaptionIndex
+
+
+def _linear_caption_at(captions, t):
+    """The scan get_caption_at_timestamp did before the index."""
+    for caption in captions:
+        start = float(caption['start'])
+        if start <= t <= start + float(caption['duration']) + 3:
+            return caption['text'].strip()
+    nearest, min_diff = None, 5.0
+    for caption in captions:
+        diff = abs(t - float(caption['start']))
+        if diff < min_diff:
+            min_diff, nearest = diff, caption
+    return nearest['text'].strip() if nearest else None
+
+
+def _linear_in_range(captions, start_time, end_time):
+    return [
+        c for c in captions
+        if not (float(c['start']) + float(c['duration']) < start_time or float(c['start']) > end_time)
+    ]
+
+
+def test_matches_linear_scans():
+    rng = random.Random(3)
+    for _ in range(500):
+        captions, t = [], 0.0
+        for k in range(rng.randint(0, 30)):
+            t += rng.choice([0, 0.5, 1, 2, 3, 7, 12])
+            captions.append({'start': t, 'duration': rng.choice([0, 0.5, 1, 2, 4, 9]), 'text': f' cue {k} '})
+        index = CaptionIndex(captions)
+
+        for _ in range(20):
+            q = rng.choice([rng.uniform(-5, t + 15), float(rng.randint(-5, int(t) + 15))])
+            i = index.covering(q, grace=3.0)
+            if i is None:
+                i = index.nearest(q, max_distance=5.0)
+            assert (index.text(i) if i is not None else None) == _linear_caption_at(captions, q)
+
+            end = q + rng.choice([0, 1, 5, 20])
+            # Same dict objects, so callers keyed on id(caption) keep working
+            assert [id(c) for c in index.overlapping(q, end)] == [id(c) for c in _linear_in_range(captions, q, end)]
+
+
+def test_nearest_prefers_the_earlier_caption_on_ties():
+    index = CaptionIndex([{'start': 10.0, 'duration': 0, 'text': 'early'}, {'start': 20.0, 'duration': 0, 'text': 'late'}])
+    assert index.text(index.nearest(15.0, max_distance=5.1)) == 'early'
+    assert index.nearest(15.0, max_distance=5.0) is None
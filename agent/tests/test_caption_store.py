@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from services.caption_index import CaptionIndex
+from services.caption_store import CaptionStore
+
+
+def _random_track(rng: random.Random):
+    captions, t = [], 0.0
+    for k in range(rng.randint(0, 30)):
+        t += rng.choice([0, 0.5, 1, 2, 3, 7, 12])
+        captions.append({'start': t, 'duration': rng.choice([0, 0.5, 1, 2, 4, 9]), 'text': f' cue {k} '})
+    return captions, t
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CaptionStore(str(tmp_path / "captions.sqlite3"))
+
+
+def test_lookups_match_the_in_memory_index(store):
+    rng = random.Random(7)
+    for n in range(200):
+        captions, last = _random_track(rng)
+        store.save_track(f"video-{n}", captions, "youtube", "en")
+        index = CaptionIndex(captions)
+        for _ in range(20):
+            t = rng.choice([rng.uniform(-5, last + 15), float(rng.randint(-5, int(last) + 15))])
+            i = index.covering(t, grace=3.0)
+            if i is None:
+                i = index.nearest(t, max_distance=5.0)
+            assert store.cue_at(f"video-{n}", t) == (index.text(i) if i is not None else None)
+
+            end = t + rng.choice([0, 1, 5, 20])
+            assert [(c['start'], c['text']) for c in store.cues_in_range(f"video-{n}", t, end)] == \
+                [(c['start'], c['text']) for c in index.overlapping(t, end)]
+
+
+def test_tracks_are_shared_between_connections(store):
+    other = CaptionStore(store.path)
+    store.save_track("abc", [{'start': 1.0, 'duration': 2.0, 'text': 'hello'}], "youtube-auto", "es")
+    store.save_track("empty", [], None, None)
+
+    track = other.track("abc")
+    assert (track["source"], track["language"], track["cues"]) == ("youtube-auto", "es", 1)
+    assert other.load_cues("abc") == [{'start': 1.0, 'duration': 2.0, 'text': 'hello'}]
+    assert other.load_cues("empty") == []
+    assert other.load_cues("unknown") is None
+
+
+def test_transcripts_keyed_by_rounded_window(store):
+    store.save_transcript("abc", 10.04, 15.0, "what a save")
+    assert store.transcript("abc", 10.0, 15.0) == "what a save"
+    assert store.transcript("abc", 12.0, 17.0) is None
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+from services.chat_context import ChatContext, ChatContextStore
+
+
+class FakeCaptions:
+    """Caption extractor stand-in that counts full-track loads."""
+
+    def __init__(self, captions):
+        self.captions = captions
+        self.fetched_at = 1.0
+        self.loads = 0
+
+    def track_version(self, video_id):
+        return ("store", self.fetched_at, len(self.captions))
+
+    async def fetch_captions(self, video_id):
+        self.loads += 1
+        return [dict(c) for c in self.captions]
+
+
+class FakeMetadata:
+    async def get_metadata(self, video_id):
+        return {'title': 'Final', 'description': ''}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "")
+    monkeypatch.setenv("CHAT_CONTEXT_CACHE", "off")
+    return ChatContextStore(FakeMetadata(), FakeCaptions([{'start': 61.0, 'duration': 2.0, 'text': 'Corner kick'}]))
+
+
+def test_unchanged_track_is_not_reloaded(store):
+    async def run():
+        first = await store.get("abc")
+        second = await store.get("abc")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert second is first
+    assert store.caption_extractor.loads == 1
+    assert store.builds == 1
+
+
+def test_refetched_track_rebuilds_the_context(store):
+    async def run():
+        first = await store.get("abc")
+        store.caption_extractor.captions = [{'start': 61.0, 'duration': 2.0, 'text': 'Goal!'}]
+        store.caption_extractor.fetched_at = 2.0
+        return first, await store.get("abc")
+
+    first, second = asyncio.run(run())
+    assert second is not first
+    assert second.transcript == "At 1:01: Goal!"
+    assert store.invalidations == 1
+
+
+def test_caption_lines_match_by_content():
+    context = ChatContext("abc", None, [{'start': 61.0, 'duration': 2.0, 'text': 'Corner kick'}], ())
+    context._lines[(61.0, 'Corner kick')] = "preformatted"
+    # A separate dict with the same cue (e.g. read back from the store) reuses the line
+    assert context.caption_lines([{'start': 61.0, 'duration': 2.0, 'text': 'Corner kick'}]) == ["preformatted"]
+    assert context.caption_lines([{'start': 5.0, 'text': 'Kick-off'}]) == ["At 0:05: Kick-off"]
@@ -0,0 +1,31 @@
+from services.circuit_breaker import CircuitBreaker
+
+
+def _half_open(monkeypatch) -> CircuitBreaker:
+    monkeypatch.setenv("CIRCUIT_OPEN_SECONDS", "0")
+    breaker = CircuitBreaker("test")
+    for _ in range(breaker.consecutive_threshold):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+def test_release_frees_the_probe_slot(monkeypatch):
+    breaker = _half_open(monkeypatch)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.base_open_seconds = 30
+    assert not breaker.allow()
+
+    breaker.release()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+def test_release_is_not_a_failure():
+    breaker = CircuitBreaker("test")
+    for _ in range(breaker.consecutive_threshold * 2):
+        assert breaker.allow()
+        breaker.release()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()["window_calls"] == 0
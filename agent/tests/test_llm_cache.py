@@ -0,0 +1,20 @@
+from services.llm_cache import LLMResponseCache
+
+
+def test_chat_answers_are_not_cached_by_default(monkeypatch):
+    monkeypatch.delenv("LLM_CACHE_TTL_CHAT", raising=False)
+    cache = LLMResponseCache(path="")
+    assert cache.ttl_for("chat") == 0
+    assert cache.ttl_for("analyze_vision") > 0
+
+    monkeypatch.setenv("LLM_CACHE_TTL_CHAT", "60")
+    assert cache.ttl_for("chat") == 60
+
+
+def test_key_covers_generation_config():
+    prompt = ["What just happened?"]
+    assert LLMResponseCache.make_key("m", prompt, {"temperature": 0.7}) != \
+        LLMResponseCache.make_key("m", prompt, {"temperature": 0.2})
+    # Whitespace-only differences share a key
+    assert LLMResponseCache.make_key("m", ["What  just happened? "], {"temperature": 0.7}) == \
+        LLMResponseCache.make_key("m", prompt, {"temperature": 0.7})
@@ -0,0 +1,116 @@
+import asyncio
+import types as pytypes
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+from services import circuit_breaker
+from services.circuit_breaker import CircuitBreaker, get_circuit_breaker
+from services.llm_gateway import LLMError, LLMGateway
+from services.rate_limiter import DeadlineExceeded
+
+
+class SlowModels:
+    """Stand-in for client.aio.models whose calls never answer in time."""
+
+    def __init__(self):
+        self.started = 0
+        self.cancelled = 0
+
+    async def generate_content(self, model, contents, config):
+        self.started += 1
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    monkeypatch.setenv("GEMINI_RPM", "100000")
+    monkeypatch.setenv("LLM_CACHE_PATH", "")
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    gateway = LLMGateway()
+    gateway.client = pytypes.SimpleNamespace(aio=pytypes.SimpleNamespace(models=SlowModels()))
+    return gateway
+
+
+async def _cancel_after(coro, seconds):
+    task = asyncio.ensure_future(coro)
+    await asyncio.sleep(seconds)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    await asyncio.sleep(0)
+
+
+@pytest.mark.parametrize("hedge", [False, True])
+def test_cancelled_caller_cancels_every_attempt(gateway, monkeypatch, hedge):
+    monkeypatch.setattr(gateway.hedging, "delay_for", lambda call_site: 0.05)
+    monkeypatch.setattr(gateway.hedging, "try_spend", lambda call_site: hedge)
+    models = gateway.client.aio.models
+
+    async def run():
+        # Cancelled while waiting on the primary (hedge=False) or on primary and hedge (hedge=True)
+        await _cancel_after(gateway.generate("hi", call_site="chat", cache=False), 0.1 if hedge else 0.02)
+        # Checked before asyncio.run() cancels whatever is left at shutdown
+        assert models.started == (2 if hedge else 1)
+        assert models.cancelled == models.started
+
+    asyncio.run(run())
+
+
+def test_cancelled_caller_is_not_a_breaker_failure(gateway):
+    breaker = get_circuit_breaker("gemini_text")
+
+    async def run():
+        for _ in range(breaker.consecutive_threshold * 2):
+            await _cancel_after(gateway.generate("hi", call_site="analogy", cache=False), 0.01)
+
+    asyncio.run(run())
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()["window_calls"] == 0
+
+
+@pytest.mark.parametrize("dropped", [True, False])
+def test_half_open_probe_slot_released_without_an_outcome(gateway, monkeypatch, dropped):
+    breaker = get_circuit_breaker("gemini_text")
+    breaker.state = CircuitBreaker.HALF_OPEN
+
+    if dropped:
+        async def acquire(*args, **kwargs):
+            raise DeadlineExceeded("dropped by the scheduler")
+
+        monkeypatch.setattr(gateway.scheduler, "acquire", acquire)
+        with pytest.raises(LLMError):
+            asyncio.run(gateway.generate("hi", call_site="analogy", cache=False))
+    else:
+        asyncio.run(_cancel_after(gateway.generate("hi", call_site="analogy", cache=False), 0.01))
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+def test_hedge_delay_starts_at_admission(gateway, monkeypatch):
+    monkeypatch.setattr(gateway.hedging, "delay_for", lambda call_site: 0.05)
+    spent = []
+    monkeypatch.setattr(gateway.hedging, "try_spend", lambda call_site: spent.append(call_site) or True)
+    queued = gateway.scheduler.acquire
+
+    async def acquire(*args, **kwargs):
+        # Queued for longer than the hedge delay before being admitted
+        await asyncio.sleep(0.2)
+        await queued(*args, **kwargs)
+
+    async def answer(model, contents, config):
+        await asyncio.sleep(0.02)
+        return pytypes.SimpleNamespace(text="ok", usage_metadata=None)
+
+    monkeypatch.setattr(gateway.scheduler, "acquire", acquire)
+    monkeypatch.setattr(gateway.client.aio.models, "generate_content", answer)
+
+    assert asyncio.run(gateway.generate("hi", call_site="chat", cache=False)) == "ok"
+    assert spent == []
@@ -0,0 +1,41 @@
+import time
+
+from services.perceptual_cache import PerceptualCache
+
+WINDOW = (0x0F0F0F0F0F0F0F0F, 0x123456789ABCDEF0, 0xFFFF0000FFFF0000, 0x0000FFFF0000FFFF)
+
+
+def _flip(value: int, bits: int) -> int:
+    return value ^ ((1 << bits) - 1)
+
+
+def test_every_frame_must_be_within_max_distance():
+    cache = PerceptualCache("test", max_distance=6, persist_dir="")
+    cache.set(WINDOW, "cached")
+
+    # One frame 20 bits off fits the old sum-over-window budget (4 * 6) but is a different play
+    one_frame_off = (WINDOW[0], _flip(WINDOW[1], 20), WINDOW[2], WINDOW[3])
+    assert cache.get(one_frame_off) is None
+
+    all_close = tuple(_flip(h, 5) for h in WINDOW)
+    assert cache.get(all_close) == "cached"
+
+
+def test_closest_qualifying_entry_wins():
+    cache = PerceptualCache("test", max_distance=6, persist_dir="")
+    cache.set((_flip(WINDOW[0], 4),), "four bits")
+    cache.set((_flip(WINDOW[0], 2),), "two bits")
+    assert cache.get((WINDOW[0],)) == "two bits"
+
+
+def test_persists_in_background_and_reloads(tmp_path):
+    cache = PerceptualCache("test", persist_dir=str(tmp_path))
+    cache._save_interval = 0.0
+    cache.set(WINDOW, "cached")
+
+    for _ in range(100):
+        if not cache._saving and (tmp_path / "phash_test.json").exists():
+            break
+        time.sleep(0.01)
+
+    assert PerceptualCache("test", persist_dir=str(tmp_path)).get(WINDOW) == "cached"
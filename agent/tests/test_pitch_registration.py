@@ -0,0 +1,53 @@
+import cv2
+import numpy as np
+
+from services.pitch_registration import PitchRegistration
+
+# Visible pitch as a broadcast camera sees it: far touchline short, near edge wide
+QUAD = np.float32([[160, 120], [480, 120], [620, 420], [20, 420]])
+UNIT = np.float32([[0, 0], [1, 0], [1, 1], [0, 1]])
+
+
+def _broadcast_frame():
+    image = np.full((480, 640, 3), (90, 90, 90), dtype=np.uint8)
+    cv2.fillConvexPoly(image, QUAD.astype(np.int32), (40, 150, 40))
+    return image
+
+
+def test_known_homography_round_trip():
+    truth = cv2.getPerspectiveTransform(QUAD, UNIT)
+    estimated = PitchRegistration().estimate_homography(_broadcast_frame())
+    assert estimated is not None
+
+    pitch_points = np.float32([[0.5, 0.5], [0.1, 0.9], [0.8, 0.2], [0.5, 0.0]])
+    pixels = cv2.perspectiveTransform(pitch_points.reshape(-1, 1, 2), np.linalg.inv(truth)).reshape(-1, 2)
+
+    round_trip = PitchRegistration.to_pitch(pixels, estimated)
+    assert np.allclose(round_trip, pitch_points, atol=0.02)
+
+
+def test_to_pitch_clips_points_off_the_pitch():
+    truth = cv2.getPerspectiveTransform(QUAD, UNIT)
+    projected = PitchRegistration.to_pitch(np.float32([[5, 470], [320, 270]]), truth)
+    assert projected.shape == (2, 2)
+    assert ((projected >= 0) & (projected <= 1)).all()
+    assert PitchRegistration.to_pitch(np.empty((0, 2)), truth).shape == (0, 2)
+
+
+def test_homography_is_reused_within_a_shot_and_dropped_at_a_cut():
+    registration = PitchRegistration()
+    frame = _broadcast_frame()
+
+    first = registration.get_homography(frame, video_id="match")
+    assert registration.get_homography(frame.copy(), video_id="match") is first
+    assert registration._shots["match"].frames_reused == 1
+
+    # Crowd close-up: the histogram drop marks a cut and there is no pitch to register
+    crowd = np.full_like(frame, (30, 60, 200))
+    assert registration.get_homography(crowd, video_id="match") is None
+
+
+def test_frame_without_enough_pitch_has_no_homography():
+    image = np.full((480, 640, 3), (90, 90, 90), dtype=np.uint8)
+    cv2.rectangle(image, (0, 0), (60, 60), (40, 150, 40), thickness=cv2.FILLED)
+    assert PitchRegistration().estimate_homography(image) is None
@@ -0,0 +1,48 @@
+import time
+
+from services.pose_estimator import PoseEstimator
+
+
+def _estimator():
+    """Estimator with stand-in graphs for every tier and the default latency priors."""
+    estimator = PoseEstimator()
+    estimator.graphs = {tier: object() for tier in PoseEstimator.TIERS}
+    return estimator
+
+
+def test_tier_follows_the_remaining_budget():
+    estimator = _estimator()
+    now = time.monotonic()
+
+    assert estimator.select_tier(now + 15.0) == "heavy"
+    assert estimator.select_tier(now + 1.5) == "full"
+    assert estimator.select_tier(now + 0.4) == "lite"
+    # Nothing fits: the lightest graph is still better than no pose
+    assert estimator.select_tier(now + 0.05) == "lite"
+    assert estimator.select_tier(None) == "heavy"
+
+
+def test_busy_graph_counts_against_the_budget():
+    estimator = _estimator()
+    estimator._in_flight["heavy"] = 1
+
+    assert estimator.select_tier(time.monotonic() + 3.0) == "full"
+    assert estimator.select_tier(None) == "full"
+
+
+def test_recorded_latency_moves_the_choice():
+    estimator = _estimator()
+    for _ in range(20):
+        estimator._record_latency("heavy", 1.0)
+
+    assert estimator.latency_stats()["heavy"] > 0.9
+    assert estimator.select_tier(time.monotonic() + 3.0) == "full"
+
+
+def test_missing_graphs_limit_the_tiers():
+    estimator = _estimator()
+    del estimator.graphs["heavy"]
+    assert estimator.select_tier(time.monotonic() + 15.0) == "full"
+
+    estimator.graphs = {}
+    assert estimator.select_tier(time.monotonic() + 15.0) == "lite"
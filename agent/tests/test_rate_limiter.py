@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import pytest
+
+from services.rate_limiter import DeadlineExceeded, GeminiScheduler
+
+
+def _drained(requests_per_minute=6000.0):
+    """Scheduler with an empty request bucket: waiters are admitted one per refill."""
+    scheduler = GeminiScheduler(requests_per_minute=requests_per_minute, tokens_per_minute=1_000_000)
+    scheduler.requests.level = 0.0
+    return scheduler
+
+
+def test_priority_classes_are_admitted_in_order_under_contention():
+    async def run():
+        scheduler = _drained()
+        order = []
+
+        async def call(priority, label):
+            await scheduler.acquire(priority, 100)
+            order.append(label)
+
+        # Lowest priority queues first; FIFO within a class
+        await asyncio.gather(
+            call("background", "background"),
+            call("analyze", "analyze 1"),
+            call("live", "live"),
+            call("analyze", "analyze 2"),
+            call("chat", "chat"),
+        )
+        return scheduler, order
+
+    scheduler, order = asyncio.run(run())
+    assert order == ["chat", "live", "analyze 1", "analyze 2", "background"]
+    assert scheduler.admitted == {"chat": 1, "live": 1, "analyze": 2, "background": 1}
+
+
+def test_expired_waiter_is_dropped_without_taking_quota():
+    async def run():
+        scheduler = _drained(requests_per_minute=60.0)
+        with pytest.raises(DeadlineExceeded):
+            await scheduler.acquire("live", 500, deadline=time.monotonic() + 0.05)
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.dropped["live"] == 1 and scheduler.admitted["live"] == 0
+    assert scheduler.tokens.level == scheduler.tokens.capacity
+    assert scheduler.stats()["queued"] == 0
+
+
+def test_cancelled_waiter_does_not_block_the_queue():
+    async def run():
+        scheduler = _drained()
+        stuck = asyncio.ensure_future(scheduler.acquire("chat", 100))
+        behind = asyncio.ensure_future(scheduler.acquire("live", 100))
+        await asyncio.sleep(0)
+        stuck.cancel()
+        await asyncio.wait_for(behind, timeout=1.0)
+        return scheduler, stuck
+
+    scheduler, stuck = asyncio.run(run())
+    assert stuck.cancelled()
+    assert scheduler.admitted == {"chat": 0, "live": 1, "analyze": 0, "background": 0}
+    assert scheduler.dropped["chat"] == 1
+
+
+def test_timeout_racing_admission_returns_the_quota():
+    async def run():
+        scheduler = _drained(requests_per_minute=60.0)
+        caller = asyncio.ensure_future(scheduler.acquire("chat", 100))
+        await asyncio.sleep(0)
+
+        # The bucket refills and _pump admits the waiter, then the caller's own
+        # timeout cancels it before it resumes: the same loop iteration
+        scheduler.requests.level = 1.0
+        scheduler._pump()
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.admitted["chat"] == 0 and scheduler.dropped["chat"] == 1
+    assert scheduler.requests.level == pytest.approx(1.0, abs=0.01)
+    assert scheduler.tokens.level == pytest.approx(scheduler.tokens.capacity)
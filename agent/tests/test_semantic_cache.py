@@ -0,0 +1,113 @@
+import pytest
+
+from services.semantic_cache import SemanticCache
+
+# Labelled commentary pairs the default threshold was tuned on
+PARAPHRASES = [
+    ("Madrid press high", "Real Madrid pressing high up the pitch"),
+    ("Liverpool counter-attack down the right", "Liverpool launch a counter attack down the right wing"),
+    ("The defence holds a high line", "Defence holding a high line"),
+    ("Arsenal build from the back", "Arsenal building out from the back"),
+    ("Chelsea sit deep in a low block", "Chelsea sitting deep in a compact low block"),
+    ("Bayern overload the left flank", "Bayern Munich overloading the left flank"),
+    ("City switch play to the far side", "Manchester City switching play to the far side"),
+    ("The striker scores from the penalty spot", "Striker scores from the spot"),
+    ("Keeper saves a low shot", "The goalkeeper saves a low shot"),
+    ("Inter press high after losing the ball", "Inter pressing high straight after losing the ball"),
+    ("Barcelona keep possession in midfield", "Barcelona keeping possession in midfield"),
+    ("Long ball over the top for the winger", "A long ball over the top for the winger to chase"),
+    ("Juventus defend a corner", "Juventus defending the corner kick"),
+    ("Tottenham play out from the back under pressure", "Tottenham playing out from the back under heavy pressure"),
+    ("Quick one-two on the edge of the box", "A quick one-two right on the edge of the box"),
+]
+
+# A different team, action, side or outcome, or added detail that changes the event
+DIFFERENT = [
+    ("Madrid press high", "Barcelona press high"),
+    ("Madrid press high", "Madrid sit deep"),
+    ("Arsenal build from the back", "Arsenal press from the front"),
+    ("Chelsea sit deep in a low block", "Chelsea push up with a high line"),
+    ("Barcelona score from a corner", "Barcelona concede from a corner"),
+    ("Keeper saves a low shot", "Striker misses a low shot"),
+    ("Bayern overload the left flank", "Bayern defend the left flank"),
+    ("City switch play to the far side", "City play a through ball"),
+    ("Liverpool counter-attack down the right", "Liverpool counter-attack down the left"),
+    ("Inter press high after losing the ball", "Milan press high after losing the ball"),
+    ("The striker scores from the penalty spot", "The striker scores a header from a corner"),
+    ("Long ball over the top for the winger", "Short pass into the feet of the winger"),
+    ("Juventus defend a corner", "Juventus take a corner"),
+    ("Dortmund win the ball back and break", "Dortmund lose the ball and Leipzig break"),
+    ("Arsenal build from the back", "Arsenal build from the back but lose the ball to a high press"),
+    ("Madrid press high", "Madrid press high and win it back"),
+    ("Corner kick swung into the box", "Corner kick swung into the box and headed clear by the defender"),
+    ("Free kick in a dangerous position", "Free kick in a dangerous position for the home side after a late tackle"),
+]
+
+# Paraphrases the cache knowingly misses (a noun swapped for a pronoun reads like a different word)
+KNOWN_MISSES = [
+    ("Dortmund win the ball back and break", "Dortmund win it back and break forward quickly"),
+]
+
+
+def _hit(stored: str, query: str) -> bool:
+    cache = SemanticCache("test")
+    cache.add(stored, "cached")
+    return cache.lookup(query) == "cached"
+
+
+@pytest.mark.parametrize("first, second", PARAPHRASES)
+def test_labelled_paraphrases_hit(first, second):
+    assert _hit(first, second) and _hit(second, first)
+
+
+@pytest.mark.parametrize("first, second", DIFFERENT + KNOWN_MISSES)
+def test_labelled_different_events_miss(first, second):
+    assert not _hit(first, second) and not _hit(second, first)
+
+
+def test_default_threshold_separates_the_labelled_pairs():
+    cache = SemanticCache("test")
+
+    def score(pair):
+        return SemanticCache.similarity(cache._words(pair[0]), cache._words(pair[1]))
+
+    # Outcome-filtered pairs are excluded: they miss whatever their score
+    different = [p for p in DIFFERENT if SemanticCache.outcomes(p[0]) == SemanticCache.outcomes(p[1])]
+    assert max(map(score, different)) < cache.threshold < min(map(score, PARAPHRASES))
+
+
+@pytest.fixture
+def cache():
+    cache = SemanticCache("test")
+    cache.add("Barcelona score! The striker slots it into the bottom corner.", "score")
+    cache.add("A stunning shot from the striker, saved by the goalkeeper.", "save")
+    return cache
+
+
+@pytest.mark.parametrize("text", [
+    "Barcelona concede! The striker slots it into the bottom corner.",
+    "A stunning shot from the striker, over the bar.",
+])
+def test_different_outcome_is_a_miss(cache, text):
+    assert cache.lookup(text) is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("barcelona scores!! The striker slots it into the bottom corner", "score"),
+    ("A stunning shot from the striker, saved by the keeper.", "save"),
+])
+def test_near_duplicate_is_a_hit(cache, text, expected):
+    assert cache.lookup(text) == expected
+
+
+def test_outcomes():
+    assert SemanticCache.outcomes("Offside flag up, and he is booked for dissent") == {"offside", "card"}
+    assert SemanticCache.outcomes("The goalkeeper comes off his line") == frozenset()
+
+
+def test_buckets_are_bounded():
+    cache = SemanticCache("test", bucket_size=8, max_entries=50)
+    for i in range(200):
+        cache.add(f"Corner kick number {i} swung into the box", i)
+    assert len(cache._entries) == 50
+    assert all(len(bucket) <= 8 for buckets in cache._buckets for bucket in buckets.values())
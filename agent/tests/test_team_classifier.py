@@ -0,0 +1,47 @@
+import numpy as np
+
+from services.team_classifier import TeamClassifier
+
+PITCH = (40, 150, 40)
+RED = (30, 30, 200)
+BLUE = (200, 60, 20)
+YELLOW = (0, 220, 240)
+
+
+def _frame(kits):
+    """Green frame with one 30x60 player per kit colour; returns (image, players)."""
+    image = np.zeros((200, 40 * len(kits) + 20, 3), dtype=np.uint8)
+    image[:] = PITCH
+    players = []
+    for i, kit in enumerate(kits):
+        x1, y1 = 10 + 40 * i, 70
+        image[y1:y1 + 60, x1:x1 + 30] = kit
+        players.append({'bbox': {'x1': x1, 'y1': y1, 'x2': x1 + 30, 'y2': y1 + 60}})
+    return image, players
+
+
+def test_two_kits_split_into_two_teams():
+    image, players = _frame([RED, BLUE] * 4)
+    labels = TeamClassifier().classify(image, players)
+
+    assert set(labels[0::2]) | set(labels[1::2]) == {0, 1}
+    assert len(set(labels[0::2])) == 1 and len(set(labels[1::2])) == 1
+    assert labels[0] != labels[1]
+
+
+def test_third_colour_is_an_outlier_against_the_learned_palette():
+    classifier = TeamClassifier()
+    image, players = _frame([RED, BLUE] * 4)
+    first = classifier.classify(image, players, video_id="match")
+
+    # Later frame of the same video: kits keep their labels, the referee fits neither
+    image, players = _frame([BLUE, YELLOW, RED])
+    labels = classifier.classify(image, players, video_id="match")
+    assert list(labels) == [first[1], TeamClassifier.OUTLIER, first[0]]
+
+
+def test_players_without_kit_pixels_are_outliers():
+    image, players = _frame([RED, BLUE, PITCH])
+    labels = TeamClassifier().classify(image, players)
+    assert labels[2] == TeamClassifier.OUTLIER
+    assert labels[0] != labels[1]
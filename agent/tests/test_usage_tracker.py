@@ -0,0 +1,24 @@
+import asyncio
+
+from services.usage_tracker import UsageTracker, tag_call
+
+
+def test_over_budget_has_no_side_effects(monkeypatch):
+    monkeypatch.setenv("USAGE_BUDGET_LIVE_COMMENTARY", "100")
+    tracker = UsageTracker()
+
+    async def run():
+        tag_call(endpoint="/api/live-commentary")
+        tracker.record("vision", "live_vision", input_tokens=150)
+        # The vision prompt and the gateway both check the same request
+        return [tracker.over_budget() for _ in range(3)]
+
+    # asyncio.run() copies the context, so the endpoint tag stays inside this test
+    assert asyncio.run(run()) == [True, True, True]
+    assert tracker.stats()["budget_downgrades"] == {}
+
+    tracker.record_downgrade("vision_prompt")
+    tracker.record_downgrade("gemini_model")
+    tracker.record_downgrade("gemini_model")
+    assert tracker.stats()["budget_downgrades"] == {"vision_prompt": 1, "gemini_model": 2}
+
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+from services.llm_gateway import LLMError
+from services.vision_batcher import VisionBatcher
+
+
+class FakeGateway:
+    """Answers batched calls with `answer(labels)` and single calls after `single_delay`."""
+
+    def __init__(self, answer=None, error=None, single_delay=0.0):
+        self.answer = answer
+        self.error = error
+        self.single_delay = single_delay
+        self.batched = []
+        self.singles = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate(self, contents, call_site, deadline=None, **kwargs):
+        if self.error:
+            raise self.error
+        if kwargs.get("response_schema"):
+            labels = [c.split(":")[0][len("Clip "):] for c in contents[1:] if isinstance(c, str) and c.startswith("Clip ")]
+            self.batched.append((labels, deadline))
+            return json.dumps({"clips": self.answer(labels)})
+
+        self.singles.append((contents[0], deadline))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.single_delay)
+        finally:
+            self.in_flight -= 1
+        return f"single: {contents[0]}"
+
+
+@pytest.fixture(autouse=True)
+def batch_env(monkeypatch):
+    monkeypatch.setenv("VISION_BATCH_MAX", "4")
+    monkeypatch.setenv("VISION_BATCH_WAIT_MS", "20")
+    monkeypatch.setenv("VISION_BATCH_DEADLINE_SLACK_MS", "500")
+
+
+def _submit_all(batcher, deadlines):
+    async def run():
+        return await asyncio.gather(
+            *[batcher.submit(f"prompt {i}", f"window {i}", [f"img {i}"], deadline=d) for i, d in enumerate(deadlines)],
+            return_exceptions=True,
+        )
+    return asyncio.run(run())
+
+
+def test_batched_answer_is_split_per_clip():
+    gateway = FakeGateway(answer=lambda labels: [{"clip": l, "commentary": f"answer {l}"} for l in labels])
+    results = _submit_all(VisionBatcher(gateway, "Describe it."), [None, None, None])
+
+    assert results == ["answer C1", "answer C2", "answer C3"]
+    assert len(gateway.batched) == 1 and not gateway.singles
+
+
+def test_missing_clips_are_retried_concurrently():
+    gateway = FakeGateway(answer=lambda labels: [{"clip": "C1", "commentary": "only the first"}], single_delay=0.2)
+    batcher = VisionBatcher(gateway, "Describe it.")
+
+    started = time.monotonic()
+    results = _submit_all(batcher, [None, None, None, None])
+    elapsed = time.monotonic() - started
+
+    assert results == ["only the first", "single: prompt 1", "single: prompt 2", "single: prompt 3"]
+    assert batcher.split_failures == 3
+    assert gateway.max_in_flight == 3
+    assert elapsed < 0.4
+
+
+def test_batch_error_reaches_every_caller():
+    gateway = FakeGateway(error=LLMError("live_vision skipped: gemini_vision circuit open"))
+    results = _submit_all(VisionBatcher(gateway, "Describe it."), [None, None])
+
+    assert all(isinstance(r, LLMError) for r in results)
+
+
+def test_tight_deadline_does_not_shrink_the_batch_deadline():
+    gateway = FakeGateway(answer=lambda labels: [{"clip": l, "commentary": f"answer {l}"} for l in labels])
+    now = time.monotonic()
+    deadlines = [now + 8.0, now + 0.3, now + 8.2, now + 8.1]
+    results = _submit_all(VisionBatcher(gateway, "Describe it."), deadlines)
+
+    # The tight window goes alone; the other three share one call under their own tightest deadline
+    assert gateway.singles == [("prompt 1", deadlines[1])]
+    assert [(len(labels), deadline) for labels, deadline in gateway.batched] == [(3, deadlines[0])]
+    assert results[1] == "single: prompt 1"
+    assert all(r.startswith("answer ") for i, r in enumerate(results) if i != 1)
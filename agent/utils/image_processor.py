@@ -1,8 +1,11 @@
 
 import base64
-from PIL import Image
+from PIL import Image, ImageDraw, ImageFont
 import io
-from typing import Optional
+from typing import List, Optional
+
+import cv2
+import numpy as np
 
 
 def compress_image(base64_image: str, max_size: int = 384, quality: int = 50) -> str:
@@ -59,3 +62,74 @@ def validate_image(base64_image: str) -> bool:
         return True
     except Exception:
         return False
+
+
+def decode_image(base64_image: str) -> Optional[np.ndarray]:
+    
+    try:
+        if "base64," in base64_image:
+            base64_image = base64_image.split("base64,")[1]
+
+        image_bytes = base64.b64decode(base64_image)
+        nparr = np.frombuffer(image_bytes, np.uint8)
+        return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    except Exception as e:
+        print(f"Image decode error: {e}")
+        return None
+
+
+def encode_jpeg(image: np.ndarray, max_size: int = 384, quality: int = 50) -> bytes:
+    
+    height, width = image.shape[:2]
+    scale = min(1.0, max_size / float(max(height, width)))
+    if scale < 1.0:
+        image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    success, buffer = cv2.imencode(".jpg", image, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    if not success:
+        raise ValueError("JPEG encoding failed")
+    return buffer.tobytes()
+
+
+def encode_mosaic(base64_images: List[str], labels: List[str], tile_size: int = 384, columns: int = 2, quality: int = 60) -> Optional[bytes]:
+    """
+    Packs frames into one JPEG grid (row-major, `columns` wide) with each label
+    burned into the top-left corner of its tile. Tiles are `tile_size` px wide and
+    keep the first frame's aspect ratio. Returns None if no frame can be decoded.
+    """
+    try:
+        frames = []
+        for b64 in base64_images:
+            if "base64," in b64:
+                b64 = b64.split("base64,")[1]
+            frames.append(Image.open(io.BytesIO(base64.b64decode(b64))).convert('RGB'))
+        if not frames:
+            return None
+
+        tile_w = tile_size
+        tile_h = max(1, round(tile_size * frames[0].height / frames[0].width))
+        columns = max(1, min(columns, len(frames)))
+        rows = (len(frames) + columns - 1) // columns
+        mosaic = Image.new('RGB', (tile_w * columns, tile_h * rows), (0, 0, 0))
+
+        draw = ImageDraw.Draw(mosaic)
+        font_size = max(12, tile_size // 16)
+        try:
+            font = ImageFont.load_default(size=font_size)
+        except TypeError:
+            # Pillow < 10.1 only has the fixed-size bitmap font
+            font = ImageFont.load_default()
+
+        for i, (frame, label) in enumerate(zip(frames, labels)):
+            x, y = (i % columns) * tile_w, (i // columns) * tile_h
+            mosaic.paste(frame.resize((tile_w, tile_h), Image.Resampling.LANCZOS), (x, y))
+            left, top, right, bottom = draw.textbbox((x + 6, y + 4), label, font=font)
+            draw.rectangle((left - 4, top - 3, right + 4, bottom + 3), fill=(0, 0, 0))
+            draw.text((x + 6, y + 4), label, fill=(255, 255, 0), font=font)
+
+        buffer = io.BytesIO()
+        mosaic.save(buffer, format="JPEG", quality=quality, optimize=True)
+        return buffer.getvalue()
+    except Exception as e:
+        print(f"Mosaic encoding error: {e}")
+        return None
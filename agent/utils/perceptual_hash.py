@@ -0,0 +1,40 @@
+import base64
+from typing import Iterable, Optional
+
+import cv2
+import numpy as np
+
+
+def dhash(image: np.ndarray, hash_size: int = 8) -> int:
+    
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    diff = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(diff.flatten()).tobytes(), "big")
+
+
+def dhash_base64(base64_image: str, hash_size: int = 8) -> Optional[int]:
+    
+    try:
+        if "base64," in base64_image:
+            base64_image = base64_image.split("base64,")[1]
+
+        nparr = np.frombuffer(base64.b64decode(base64_image), np.uint8)
+        # The JPEG decoder can downscale while decoding, which is all a hash needs
+        thumb = cv2.imdecode(nparr, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        if thumb is None:
+            return None
+        return dhash(thumb, hash_size)
+    except Exception as e:
+        print(f"Perceptual hash error: {e}")
+        return None
+
+
+def hamming_distances(query: Iterable[int], keys: np.ndarray) -> np.ndarray:
+    """Hamming distance per key and frame: shape (len(keys), frames)."""
+    q = np.asarray(list(query), dtype=np.uint64)
+    xor = np.bitwise_xor(keys, q[None, :])
+    bits = np.unpackbits(xor.view(np.uint8), axis=-1)
+    return bits.reshape(len(keys), len(q), -1).sum(axis=2)
@@ -0,0 +1,16 @@
+from typing import Optional
+
+
+STANDIN_PREFIX = "standin"
+DEFAULT_STANDIN_URL = "http://127.0.0.1:8765"
+
+
+def standin_base_url(api_key: Optional[str]) -> Optional[str]:
+    """
+    Base URL of the local stand-in server (benchmarks/standin_server.py) when an API
+    key is "standin" or "standin:<url>", otherwise None.
+    """
+    if not api_key or not api_key.startswith(STANDIN_PREFIX):
+        return None
+    url = api_key[len(STANDIN_PREFIX):].lstrip(":").strip()
+    return (url or DEFAULT_STANDIN_URL).rstrip("/")